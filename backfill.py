@@ -0,0 +1,223 @@
+"""Выгрузка истории статусов работ в сжатый JSON Lines.
+
+    python backfill.py --since 2020-01-01 --output history.jsonl.gz
+
+API не принимает верхнюю границу периода, поэтому для каждого
+пользователя делается один запрос from_date=--since с потоковым
+разбором тела. Пользователи выгружаются параллельно, не больше
+--workers одновременно. Работы пользователя сжимаются по мере чтения
+ответа и дописываются в файл одним gzip блоком, а завершение
+выгрузки пользователя отмечается в файле <output>.progress:
+прерванная выгрузка продолжается повторным запуском, запрашивая
+только невыгруженных пользователей.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import exceptions
+import homework
+import settings
+
+BACKFILL_SINCE = settings.env('BACKFILL_SINCE', '2019-01-01')
+WORKERS = int(settings.env('BACKFILL_WORKERS', 8))
+ATTEMPTS = 3
+PROGRESS_INTERVAL = 1.0
+
+
+def parse_since(value):
+    """Метка времени из даты ГГГГ-ММ-ДД или числа секунд."""
+    if value.isdigit():
+        return int(value)
+    moment = dt.datetime.strptime(value, '%Y-%m-%d')
+    return int(moment.replace(tzinfo=dt.timezone.utc).timestamp())
+
+
+def fetch_tenant(tenant, since):
+    """Работы пользователя, обновлённые после since, по одной."""
+    return homework.stream_api(since, tenant.headers)
+
+
+def export(fetch, tenant, since):
+    """Сжатый gzip блок с работами пользователя и их число.
+
+    Работы сжимаются по мере чтения ответа, поэтому в памяти хранится
+    только сжатый блок.
+    """
+    compressor = zlib.compressobj(wbits=31)
+    chunks = []
+    records = 0
+    for item in fetch(tenant, since):
+        line = json.dumps({'tenant': tenant.name, **item}, ensure_ascii=False)
+        chunks.append(compressor.compress((line + '\n').encode()))
+        records += 1
+    chunks.append(compressor.flush())
+    return b''.join(chunks), records
+
+
+def export_with_retries(fetch, tenant, since, attempts=ATTEMPTS):
+    """Выгружает пользователя, повторяя запрос после ошибок.
+
+    Ответ нельзя дочитать с места обрыва, поэтому повтор запрашивает
+    историю пользователя заново.
+    """
+    for attempt in range(attempts):
+        try:
+            return export(fetch, tenant, since)
+        except exceptions.CircuitBreakerOpen as error:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(max(error.retry_at - time.monotonic(), 0))
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+
+class Progress:
+    """Файл прогресса: выгруженные пользователи и размер выгрузки."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.offset = 0
+        self.records = 0
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self.done.add(entry['tenant'])
+                    self.offset = entry['offset']
+                    self.records += entry['records']
+
+    def mark(self, name, offset, records):
+        """Отмечает пользователя выгруженным."""
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(
+                {'tenant': name, 'offset': offset, 'records': records}
+            ) + '\n')
+        self.done.add(name)
+        self.offset = offset
+        self.records += records
+
+
+class Throughput:
+    """Печатает скорость выгрузки не чаще раза в interval секунд."""
+
+    def __init__(self, total, stream=sys.stderr, interval=PROGRESS_INTERVAL,
+                 clock=time.monotonic):
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.clock = clock
+        self.started = self.printed = clock()
+        self.jobs = 0
+        self.records = 0
+
+    def update(self, records):
+        """Учитывает выгруженного пользователя."""
+        self.jobs += 1
+        self.records += records
+        if self.clock() - self.printed >= self.interval:
+            self.print()
+
+    def print(self):
+        """Печатает число выгруженных пользователей, записей и скорость."""
+        now = self.printed = self.clock()
+        elapsed = max(now - self.started, 1e-9)
+        self.stream.write(
+            f'Пользователи {self.jobs}/{self.total}, '
+            f'записей {self.records}, '
+            f'{self.jobs / elapsed:.1f} пользователей/с, '
+            f'{self.records / elapsed:.1f} записей/с\n'
+        )
+        self.stream.flush()
+
+
+def run(tenants, since, output, fetch=fetch_tenant, workers=WORKERS,
+        report=None):
+    """Выгружает пользователей в output; возвращает число неудавшихся."""
+    progress = Progress(output + '.progress')
+    if os.path.exists(output):
+        os.truncate(output, progress.offset)
+    pending = [
+        tenant for tenant in tenants if tenant.name not in progress.done
+    ]
+    report = report or Throughput(len(pending))
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            open(output, 'ab') as file:
+        futures = {
+            executor.submit(export_with_retries, fetch, tenant, since): tenant
+            for tenant in pending
+        }
+        for future in as_completed(futures):
+            tenant = futures[future]
+            try:
+                block, records = future.result()
+            except Exception as error:
+                failed += 1
+                sys.stderr.write(
+                    f'Пользователь {tenant.name} не выгружен: {error}\n'
+                )
+                continue
+            file.write(block)
+            file.flush()
+            progress.mark(tenant.name, file.tell(), records)
+            report.update(records)
+    report.print()
+    return failed
+
+
+def load_tenants(path):
+    """Пользователи из файла и пользователь из переменных окружения."""
+    import engine
+
+    tenants = engine.load_tenants(path)
+    if homework.PRACTICUM_TOKEN:
+        tenants.insert(0, engine.Tenant(
+            'default', homework.PRACTICUM_TOKEN, homework.TELEGRAM_CHAT_ID
+        ))
+    engine.check_names(tenants)
+    return tenants
+
+
+def main(argv=None):
+    """Разбирает аргументы и выгружает историю; возвращает код выхода."""
+    import engine
+
+    parser = argparse.ArgumentParser(
+        description='Выгрузка истории статусов работ в JSON Lines.'
+    )
+    parser.add_argument('--output', default='history.jsonl.gz')
+    parser.add_argument('--tenants', default=engine.TENANTS_FILE)
+    parser.add_argument('--since', default=BACKFILL_SINCE,
+                        help='ГГГГ-ММ-ДД или метка времени')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args(argv)
+
+    tenants = load_tenants(args.tenants)
+    if not tenants:
+        parser.error('Нет пользователей для выгрузки')
+    failed = run(
+        tenants, parse_since(args.since), args.output, workers=args.workers
+    )
+    if failed:
+        sys.stderr.write(
+            f'Не выгружено пользователей: {failed}. Повторный запуск '
+            'продолжит выгрузку.\n'
+        )
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Сквозной замер: от get_api_answer до отправки в Telegram.
+
+Запускает заменители из stubs.py отдельным процессом и прогоняет через
+них настоящий движок с N пользователями. Результат пишется в JSON для
+сравнения между версиями:
+
+    python benchmarks/bench_e2e.py --tenants 500 --duration 30 \\
+        --output bench_e2e.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import delivery  # noqa: E402
+import engine  # noqa: E402
+import homework  # noqa: E402
+
+
+def start_stubs(args):
+    """Запускает заменители и возвращает процесс и их адреса."""
+    command = [
+        sys.executable, os.path.join(ROOT, 'benchmarks', 'stubs.py'),
+        '--latency', str(args.latency),
+        '--telegram-latency', str(args.telegram_latency),
+        '--error-rate', str(args.error_rate),
+        '--change-rate', str(args.change_rate),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    return process, json.loads(process.stdout.readline())
+
+
+def percentile(values, share):
+    """Перцентиль списка значений или None для пустого списка."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def drive(args, urls):
+    """Прогоняет движок через заменители в течение duration секунд."""
+    import telegram
+    from telegram.utils.request import Request
+
+    homework.ENDPOINT = urls['practicum']
+    bot = telegram.Bot(
+        token='123456:bench-token', base_url=urls['telegram'],
+        request=Request(con_pool_size=delivery.MAX_CONCURRENT_SENDS),
+    )
+    tenants = [
+        engine.Tenant(f'tenant-{number}', f'token-{number}', number)
+        for number in range(args.tenants)
+    ]
+    poller = engine.Engine(
+        tenants, bot, retry_time=args.retry_time, max_workers=args.workers
+    )
+    task = asyncio.ensure_future(poller.run())
+    await asyncio.sleep(args.duration)
+    poller.stop()
+    await task
+    return sum(tenant.polls for tenant in tenants)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--retry-time', type=float, default=5.0,
+                        help='базовый интервал опроса, с')
+    parser.add_argument('--workers', type=int, default=engine.MAX_WORKERS)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--telegram-latency', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--change-rate', type=float, default=10.0)
+    parser.add_argument('--output', default='bench_e2e.json')
+    args = parser.parse_args()
+
+    process, urls = start_stubs(args)
+    try:
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        polls = asyncio.run(drive(args, urls))
+        wall = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        with urllib.request.urlopen(urls['stats']) as response:
+            stubs = json.load(response)
+    finally:
+        process.terminate()
+        process.wait()
+
+    latencies = stubs.pop('latencies')
+    result = {
+        'timestamp': int(time.time()),
+        'python': platform.python_version(),
+        'parameters': vars(args),
+        'polls': polls,
+        'polls_per_second': polls / wall,
+        'notification_latency_p50': percentile(latencies, 0.5),
+        'notification_latency_p99': percentile(latencies, 0.99),
+        'cpu_seconds': cpu,
+        'cpu_share': cpu / wall,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'stubs': stubs,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(result, file, indent=2, ensure_ascii=False)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Замер пропускной способности движка опроса на одном ядре.
+
+Запросы к API и Telegram подменяются заглушками с заданной задержкой,
+поэтому замер показывает накладные расходы самого движка. У каждого
+пользователя свой токен; --subscribers задаёт число пользователей на
+токен (чаты наставников), их обслуживает один опрос.
+
+    python benchmarks/bench_engine.py --tenants 5000 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+import homework  # noqa: E402
+
+
+def make_fetch(latency):
+    """Заглушка запроса к API с задержкой ответа."""
+    def fetch(current_timestamp, headers):
+        if latency:
+            time.sleep(latency)
+        return {'homeworks': [], 'current_date': current_timestamp}
+    return fetch
+
+
+def send(bot, chat_id, message):
+    """Заглушка отправки сообщения в Telegram."""
+    return True
+
+
+async def measure(args):
+    tenants = [
+        engine.Tenant(
+            f'tenant-{number}', f'token-{number // args.subscribers}', number
+        )
+        for number in range(args.tenants)
+    ]
+    poller = engine.Engine(
+        tenants, bot=None, fetch=make_fetch(args.latency), send=send,
+        retry_time=args.retry_time, max_workers=args.workers,
+    )
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    task = asyncio.ensure_future(poller.run())
+    await asyncio.sleep(args.duration)
+    poller.stop()
+    await task
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    return sum(tenant.polls for tenant in tenants), wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=2000)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--retry-time', type=float, default=0.0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=engine.MAX_WORKERS)
+    parser.add_argument('--subscribers', type=int, default=1,
+                        help='пользователей на один токен')
+    args = parser.parse_args()
+
+    polls, wall, cpu = asyncio.run(measure(args))
+    cpu_per_poll = cpu / polls
+    print(f'пользователей:            {args.tenants}')
+    print(f'пользователей на токен:   {args.subscribers}')
+    print(f'опросов:                  {polls}')
+    print(f'опросов в секунду:        {polls / wall:.0f}')
+    print(f'CPU на опрос, мкс:        {cpu_per_poll * 1e6:.1f}')
+    print(
+        'пользователей на ядро '
+        f'при RETRY_TIME={homework.RETRY_TIME}: '
+        f'{homework.RETRY_TIME / cpu_per_poll * args.subscribers:.0f}'
+    )
+
+
+if __name__ == '__main__':
+    main()
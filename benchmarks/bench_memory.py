@@ -0,0 +1,109 @@
+"""Память движка в расчёте на одного пользователя.
+
+Создаёт --tenants пользователей с --homeworks работами у каждого и
+проводит их через engine.Engine.poll_once, как при обычном опросе:
+ответы декодируются из JSON, статусы попадают в индекс и хранилище
+storage.StateStore во временном каталоге, уведомления отправляются.
+Доля --errors пользователей получает ошибку API и хранит последний
+отчёт о ней. Печатает, сколько байт
+занимает состояние одного пользователя (tracemalloc).
+
+    python benchmarks/bench_memory.py --tenants 10000 --homeworks 15
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+import homework  # noqa: E402
+import storage  # noqa: E402
+
+
+def make_fetch(homeworks, errors):
+    statuses = list(homework.VERDICTS)
+
+    def fetch(current_timestamp, headers):
+        token = headers['Authorization']
+        number = int(token.rsplit('-', 1)[1])
+        if number % 100 < errors * 100:
+            raise ConnectionError(
+                'Произошёл сбой сети: 503 Service Unavailable, '
+                f'url={homework.ENDPOINT}, params={{"from_date": '
+                f'{current_timestamp}}}'
+            )
+        return json.loads(json.dumps({
+            'current_date': 1581604970,
+            'homeworks': [
+                {
+                    'id': number * 1000 + item,
+                    'status': statuses[(number + item) % len(statuses)],
+                    'homework_name': f'student{number}__hw{item:02}.zip',
+                    'reviewer_comment': 'Принято!',
+                    'date_updated': f'2020-02-{item % 28 + 1:02}T14:40:57Z',
+                    'lesson_name': f'Спринт {item}',
+                }
+                for item in range(homeworks)
+            ],
+        }))
+    return fetch
+
+
+def build(tenants, homeworks, errors, store):
+    users = [
+        engine.Tenant(f'user{number}', f'token-{number}', number)
+        for number in range(tenants)
+    ]
+    poller = engine.Engine(
+        users, bot=None, fetch=make_fetch(homeworks, errors),
+        send=lambda *args: True, store=store,
+    )
+
+    async def poll_all():
+        for tenant in users:
+            await poller.poll_once(tenant)
+            await poller.outbox.deliver_due(poller)
+        await poller.save()
+
+    asyncio.run(poll_all())
+    return poller
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=10000)
+    parser.add_argument('--homeworks', type=int, default=15)
+    parser.add_argument('--errors', type=float, default=0.1)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    directory = tempfile.mkdtemp()
+    warmup = storage.StateStore(os.path.join(directory, 'warmup.sqlite3'))
+    build(10, args.homeworks, args.errors, warmup)
+    warmup.close()
+    store = storage.StateStore(os.path.join(directory, 'state.sqlite3'))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    poller = build(args.tenants, args.homeworks, args.errors, store)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    store.close()
+    print(
+        f'{args.tenants} пользователей по {args.homeworks} работ: '
+        f'{used / 2 ** 20:.1f} МиБ, {used / args.tenants:.0f} байт '
+        'на пользователя'
+    )
+    return poller
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Разбор и сравнение ответов API из кассеты без обращения к сети.
+
+Кассета записывается ботом с PRACTICUM_TRANSPORT=record. Замер
+читает её ответы по порядку и проводит через этапы опроса:
+ChangeDetector.decode (хэш тела и JSON), проверку
+validation.Validator и сравнение с индексом пользователя.
+
+    python benchmarks/bench_replay.py --cassette practicum.cassette.gz
+
+Без --cassette замер выполняется на синтетической кассете из
+--responses ответов по --homeworks работ.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import change_detector  # noqa: E402
+import homework  # noqa: E402
+import status_index  # noqa: E402
+import transport  # noqa: E402
+import validation  # noqa: E402
+
+
+class Synthetic(transport.Transport):
+    """Ответы, похожие на ответы API: статусы работ постепенно меняются."""
+
+    def __init__(self, homeworks):
+        self.homeworks = homeworks
+        self.polls = 0
+        self.stats = transport.TransportStats()
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        statuses = list(homework.VERDICTS)
+        self.polls += 1
+        body = json.dumps({
+            'current_date': 1581604970 + self.polls,
+            'homeworks': [
+                {
+                    'id': number,
+                    'status': statuses[(number + self.polls) % 3],
+                    'homework_name': f'student__project_{number}.zip',
+                    'date_updated': '2020-02-13T14:40:57Z',
+                }
+                for number in range(self.homeworks)
+            ],
+        }).encode()
+        return transport.StoredResponse(url, 200, {}, body, 0.1)
+
+
+def record_synthetic(path, responses, homeworks):
+    recorder = transport.CassetteTransport(
+        path, 'record', Synthetic(homeworks)
+    )
+    headers = homework.build_headers('benchmark')
+    for number in range(responses):
+        recorder.get(
+            homework.ENDPOINT, params={'from_date': number}, headers=headers
+        )
+    recorder.close()
+
+
+def stages(responses):
+    """Время декодирования, проверки и сравнения по всем ответам."""
+    detector = change_detector.ChangeDetector(change_detector.DetectorStats())
+    index = status_index.HomeworkIndex()
+    totals = {'decode': 0.0, 'validate': 0.0, 'diff': 0.0}
+    homeworks = 0
+    for stored in responses:
+        started = time.perf_counter()
+        response = detector.decode(stored)
+        detector.commit()
+        decoded = time.perf_counter()
+        if response is change_detector.UNCHANGED:
+            totals['decode'] += decoded - started
+            continue
+        records, _ = validation.VALIDATOR.response(response)
+        validated = time.perf_counter()
+        [changed] = status_index.diff_all([index], records)
+        for record in changed:
+            index.add(record)
+        finished = time.perf_counter()
+        totals['decode'] += decoded - started
+        totals['validate'] += validated - decoded
+        totals['diff'] += finished - validated
+        homeworks += len(records)
+    return homeworks, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cassette')
+    parser.add_argument('--responses', type=int, default=200)
+    parser.add_argument('--homeworks', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.cassette
+        if path is None:
+            path = os.path.join(directory, 'synthetic.cassette.gz')
+            record_synthetic(path, args.responses, args.homeworks)
+        size = os.path.getsize(path)
+        started = time.perf_counter()
+        responses = [response for _, response in transport.read_cassette(path)]
+        loaded = time.perf_counter() - started
+
+    body = sum(len(response.content) for response in responses)
+    print(
+        f'Кассета: {len(responses)} ответов, {size / 2 ** 20:.2f} МиБ '
+        f'сжато, {body / 2 ** 20:.2f} МиБ тел, чтение {loaded:.2f} с'
+    )
+    homeworks, totals = stages(responses)
+    total = sum(totals.values())
+    for name, seconds in totals.items():
+        print(f'{name}: {seconds:.3f} с')
+    print(
+        f'итого: {len(responses) / total:.0f} ответов/с, '
+        f'{homeworks / total:.0f} работ/с'
+    )
+
+
+if __name__ == '__main__':
+    main()
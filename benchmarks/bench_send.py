@@ -0,0 +1,77 @@
+"""Задержка send_chat_message до и после отказа от get_chat_member.
+
+Бот Telegram подменяется заглушкой, каждый вызов API которой
+занимает --latency секунд.
+
+    python benchmarks/bench_send.py --latency 0.05 --messages 20
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+
+
+class SlowBot:
+    """Заглушка бота с задержкой каждого вызова API."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def call(self):
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def send_message(self, chat_id=None, text=None):
+        self.call()
+
+    def get_chat_member(self, chat_id, user_id):
+        self.call()
+        return types.SimpleNamespace(
+            user=types.SimpleNamespace(username='student')
+        )
+
+    def get_chat(self, chat_id):
+        self.call()
+        return types.SimpleNamespace(username='student')
+
+
+def legacy_send(bot, chat_id, message):
+    """Прежняя отправка: имя запрашивается после каждого сообщения."""
+    bot.send_message(chat_id=chat_id, text=message)
+    username = bot.get_chat_member(chat_id, chat_id).user.username
+    logging.info(f'Пользователю @{username} отправлено сообщение: {message}')
+    return True
+
+
+def measure(send, bot, messages):
+    started = time.perf_counter()
+    for number in range(messages):
+        send(bot, 1, f'сообщение {number}')
+    return (time.perf_counter() - started) / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--messages', type=int, default=20)
+    args = parser.parse_args()
+
+    for name, send in (('до', legacy_send),
+                       ('после', homework.send_chat_message)):
+        bot = SlowBot(args.latency)
+        latency = measure(send, bot, args.messages)
+        print(
+            f'{name:>6}: {latency * 1000:.1f} мс на сообщение, '
+            f'вызовов API {bot.calls}'
+        )
+
+
+if __name__ == '__main__':
+    main()
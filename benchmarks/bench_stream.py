@@ -0,0 +1,92 @@
+"""Память и время до первой работы при разборе длинной истории.
+
+Сравнивает response.json() с check_response и потоковый разбор
+homework_stream.HomeworkStream на ответе с --homeworks работами,
+который читается фрагментами по --chunk байт с задержкой --latency
+секунд на фрагмент (имитация медленной сети).
+
+    python benchmarks/bench_stream.py --homeworks 100000 --latency 0.001
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+import homework_stream  # noqa: E402
+
+
+def make_body(homeworks):
+    return json.dumps({
+        'current_date': 1581604970,
+        'homeworks': [
+            {
+                'id': number,
+                'status': 'approved',
+                'homework_name': f'student__project_{number}.zip',
+                'reviewer_comment': 'Всё нравится, работа принята.',
+                'date_updated': '2020-02-13T14:40:57Z',
+                'lesson_name': 'Итоговый проект',
+            }
+            for number in range(homeworks)
+        ],
+    }).encode()
+
+
+def chunks(body, size, latency):
+    for start in range(0, len(body), size):
+        if latency:
+            time.sleep(latency)
+        yield body[start:start + size]
+
+
+def full(body_chunks):
+    body = b''.join(body_chunks)
+    yield from homework.check_response(json.loads(body))
+
+
+def streamed(body_chunks):
+    return homework_stream.HomeworkStream(body_chunks)
+
+
+def measure(parse, body, size, latency):
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    count = 0
+    for item in parse(chunks(body, size, latency)):
+        homework.parse_status(item)
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, first, total, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--homeworks', type=int, default=100000)
+    parser.add_argument('--chunk', type=int, default=64 * 1024)
+    parser.add_argument('--latency', type=float, default=0.001)
+    args = parser.parse_args()
+
+    body = make_body(args.homeworks)
+    print(f'Тело ответа: {len(body) / 2 ** 20:.1f} МиБ')
+    for name, parse in (('json', full), ('поток', streamed)):
+        count, first, total, peak = measure(
+            parse, body, args.chunk, args.latency
+        )
+        print(
+            f'{name}: {count} работ, первая через {first * 1000:.1f} мс, '
+            f'всего {total:.2f} с, пик памяти {peak / 2 ** 20:.1f} МиБ'
+        )
+
+
+if __name__ == '__main__':
+    main()
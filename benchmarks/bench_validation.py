@@ -0,0 +1,76 @@
+"""Проверка ответа API: check_response и parse_status против Validator.
+
+Сравнивает прежнюю проверку (check_response, затем homework_key и
+parse_status для каждой работы) с пакетной validation.Validator и
+render для ответа из --homeworks работ.
+
+    python benchmarks/bench_validation.py --homeworks 1000 --repeat 200
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+import validation  # noqa: E402
+
+
+def make_response(homeworks):
+    statuses = list(homework.VERDICTS)
+    return {
+        'current_date': 1581604970,
+        'homeworks': [
+            {
+                'id': number,
+                'status': statuses[number % len(statuses)],
+                'homework_name': f'student__project_{number}.zip',
+                'date_updated': '2020-02-13T14:40:57Z',
+            }
+            for number in range(homeworks)
+        ],
+    }
+
+
+def homework_key(item):
+    """Прежний ключ работы в индексе: id, а без него название."""
+    key = item.get('id')
+    if key is None:
+        key = item.get('homework_name')
+    if key is None:
+        homework.parse_status(item)
+    return str(key)
+
+
+def per_item(response):
+    for item in homework.check_response(response):
+        homework_key(item)
+        homework.parse_status(item)
+
+
+def batch(response):
+    records, _ = validation.VALIDATOR.response(response)
+    for record in records:
+        validation.render(record)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--homeworks', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    response = make_response(args.homeworks)
+    for name, check in (('по одной', per_item), ('пакетом', batch)):
+        seconds = min(timeit.repeat(
+            lambda: check(response), number=args.repeat, repeat=3
+        )) / args.repeat
+        print(
+            f'{name}: {seconds * 1000:.3f} мс на ответ, '
+            f'{seconds / args.homeworks * 1e6:.3f} мкс на работу'
+        )
+
+
+if __name__ == '__main__':
+    main()
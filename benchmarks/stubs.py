@@ -0,0 +1,216 @@
+"""Локальные заменители API Практикума и Bot API Telegram для замеров.
+
+Запускается отдельным процессом, чтобы не влиять на замер CPU бота:
+
+    python benchmarks/stubs.py --latency 0.05 --change-rate 20
+
+В stdout печатается строка JSON с адресами серверов. Сводка по
+отправленным сообщениям и задержке уведомлений доступна по адресу
+``<practicum>/stats``.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PATH = '/api/user_api/homework_statuses/'
+STATUS_CYCLE = ('reviewing', 'rejected', 'reviewing', 'approved')
+HOMEWORK_NAME = re.compile(r'"(hw-\d+-\d+)"')
+
+
+class World:
+    """Состояние заменителей: работы пользователей и доставленные сообщения."""
+
+    def __init__(self, homeworks_per_tenant, seed):
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.homeworks_per_tenant = homeworks_per_tenant
+        self.tenants = {}
+        self.changed_at = {}
+        self.requests = 0
+        self.errors = 0
+        self.messages = 0
+        self.notifications = 0
+        self.latencies = []
+
+    def register(self, token):
+        """Пользователь появляется при первом запросе с его токеном."""
+        with self.lock:
+            return self.tenants.setdefault(token, {})
+
+    def change(self):
+        """Меняет статус случайной работы случайного пользователя."""
+        with self.lock:
+            if not self.tenants:
+                return
+            token = self.random.choice(list(self.tenants))
+            works = self.tenants[token]
+            number = self.random.randrange(self.homeworks_per_tenant)
+            name = f'hw-{token.rsplit("-", 1)[-1]}-{number}'
+            step = works[name]['step'] + 1 if name in works else 0
+            now = time.time()
+            works[name] = {
+                'id': hash(name) & 0xffffffff,
+                'homework_name': name,
+                'status': STATUS_CYCLE[step % len(STATUS_CYCLE)],
+                'step': step,
+                'updated': int(now),
+                'date_updated': datetime.fromtimestamp(
+                    now, timezone.utc
+                ).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            }
+            self.changed_at[name] = now
+
+    def homeworks(self, token, from_date):
+        """Работы пользователя, изменившиеся начиная с from_date."""
+        works = self.register(token)
+        with self.lock:
+            self.requests += 1
+            return [
+                {
+                    key: value for key, value in work.items()
+                    if key not in ('step', 'updated')
+                }
+                for work in works.values() if work['updated'] >= from_date
+            ]
+
+    def delivered(self, text):
+        """Учитывает сообщение, доставленное в Telegram."""
+        now = time.time()
+        with self.lock:
+            self.messages += 1
+            for name in HOMEWORK_NAME.findall(text):
+                self.notifications += 1
+                if name in self.changed_at:
+                    self.latencies.append(now - self.changed_at[name])
+
+    def stats(self):
+        """Сводка для отчёта о замере."""
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'messages': self.messages,
+                'notifications': self.notifications,
+                'latencies': list(self.latencies),
+            }
+
+
+def make_handler(world, options):
+    """Обработчик, обслуживающий оба заменителя."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/stats':
+                return self.reply(HTTPStatus.OK, world.stats())
+            if url.path != API_PATH:
+                return self.reply(HTTPStatus.NOT_FOUND, {})
+            if options.latency:
+                time.sleep(options.latency)
+            if world.random.random() < options.error_rate:
+                with world.lock:
+                    world.errors += 1
+                return self.reply(
+                    HTTPStatus.INTERNAL_SERVER_ERROR, {'code': 'error'}
+                )
+            token = self.headers.get('Authorization', '').split()[-1]
+            from_date = int(parse_qs(url.query).get('from_date', ['0'])[0])
+            self.reply(HTTPStatus.OK, {
+                'homeworks': world.homeworks(token, from_date),
+                'current_date': int(time.time()),
+            })
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            raw = self.rfile.read(length)
+            try:
+                data = json.loads(raw or b'{}')
+            except ValueError:
+                data = {
+                    key: values[0]
+                    for key, values in parse_qs(raw.decode()).items()
+                }
+            method = self.path.rsplit('/', 1)[-1]
+            if options.telegram_latency:
+                time.sleep(options.telegram_latency)
+            chat = {'id': int(data.get('chat_id', 0)), 'type': 'private',
+                    'username': 'student'}
+            if method == 'sendMessage':
+                world.delivered(data.get('text', ''))
+                result = {'message_id': 1, 'date': int(time.time()),
+                          'chat': chat, 'text': data.get('text', '')}
+            elif method == 'getChat':
+                result = chat
+            else:
+                result = []
+            self.reply(HTTPStatus.OK, {'ok': True, 'result': result})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def change_forever(world, rate):
+    """Меняет статусы работ с заданной средней частотой в секунду."""
+    while rate > 0:
+        time.sleep(world.random.expovariate(rate))
+        world.change()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='задержка ответа API, с')
+    parser.add_argument('--telegram-latency', type=float, default=0.02,
+                        help='задержка ответа Telegram, с')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='доля ответов API с кодом 500')
+    parser.add_argument('--change-rate', type=float, default=10.0,
+                        help='изменений статусов в секунду на всех')
+    parser.add_argument('--homeworks', type=int, default=5,
+                        help='работ у каждого пользователя')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+
+    world = World(options.homeworks, options.seed)
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', 0), make_handler(world, options)
+    )
+    server.daemon_threads = True
+    threading.Thread(
+        target=change_forever, args=(world, options.change_rate),
+        daemon=True,
+    ).start()
+    address = f'http://127.0.0.1:{server.server_address[1]}'
+    print(json.dumps({
+        'practicum': f'{address}{API_PATH}',
+        'telegram': f'{address}/bot',
+        'stats': f'{address}/stats',
+    }), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""Автоматический выключатель запросов к API Практикума."""
+import logging
+import random
+import threading
+import time
+from http import HTTPStatus
+
+import exceptions
+import metrics
+import settings
+
+FAILURE_THRESHOLD = int(settings.env('BREAKER_FAILURE_THRESHOLD', 5))
+BASE_DELAY = float(settings.env('BREAKER_BASE_DELAY', 30))
+MAX_DELAY = float(settings.env('BREAKER_MAX_DELAY', 30 * 60))
+PROBE_WAIT = float(settings.env('BREAKER_PROBE_WAIT', 15))
+MAX_EXPONENT = 16
+THROTTLE_STATUSES = (HTTPStatus.TOO_MANY_REQUESTS,
+                     HTTPStatus.SERVICE_UNAVAILABLE)
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+STATE = metrics.REGISTRY.register(metrics.Gauge(
+    'practicum_breaker_state',
+    'Состояние выключателя: 0 — закрыт, 1 — пробный запрос, 2 — открыт.',
+))
+OPENINGS = metrics.REGISTRY.register(metrics.Counter(
+    'practicum_breaker_openings_total',
+    'Сколько раз выключатель приостанавливал запросы к API.',
+))
+
+
+def parse_retry_after(value, now=None):
+    """Секунды из заголовка Retry-After (число или HTTP дата) или None."""
+    from email.utils import parsedate_to_datetime
+
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if now is None:
+        now = time.time()
+    return max(moment.timestamp() - now, 0.0)
+
+
+class CircuitBreaker:
+    """Общий для всех пользователей выключатель запросов к API.
+
+    После FAILURE_THRESHOLD ошибок подряд выключатель размыкается на
+    экспоненциально растущее время со случайным разбросом или на время
+    из Retry-After. Затем проходит один пробный запрос: при успехе
+    опрос возобновляется, при ошибке выключатель снова размыкается.
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, base_delay=BASE_DELAY,
+                 max_delay=MAX_DELAY, probe_wait=PROBE_WAIT,
+                 clock=time.monotonic, rand=random.random):
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.probe_wait = probe_wait
+        self.clock = clock
+        self.random = rand
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Возвращает выключатель в исходное замкнутое состояние."""
+        self.state = CLOSED
+        self.failures = 0
+        self.openings = 0
+        self.open_until = 0.0
+        self.probe_started = None
+        STATE.set(STATE_VALUES[CLOSED])
+
+    def set_clock(self, clock):
+        """Переключает выключатель на часы clock; возвращает прежние.
+
+        Оставшаяся пауза и начало пробного запроса переносятся на новые
+        часы, поэтому переключение не меняет состояния выключателя.
+        """
+        with self.lock:
+            previous = self.clock
+            offset = clock() - previous()
+            self.open_until += offset
+            if self.probe_started is not None:
+                self.probe_started += offset
+            self.clock = clock
+        return previous
+
+    def set_state(self, state):
+        """Меняет состояние, записывая переход в лог и метрики."""
+        if state == self.state:
+            return
+        logging.warning(
+            'Выключатель запросов к API: %s -> %s', self.state, state
+        )
+        self.state = state
+        STATE.set(STATE_VALUES[state])
+
+    def before_call(self):
+        """Разрешает запрос или выбрасывает CircuitBreakerOpen."""
+        with self.lock:
+            if self.state == CLOSED:
+                return
+            now = self.clock()
+            if self.state == OPEN and now >= self.open_until:
+                self.set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and (
+                self.probe_started is None
+                or now - self.probe_started > self.probe_wait
+            ):
+                self.probe_started = now
+                return
+            retry_at = max(self.open_until, now + self.probe_wait)
+        raise exceptions.CircuitBreakerOpen(
+            'Запросы к API временно приостановлены', retry_at
+        )
+
+    def record_success(self):
+        """Учитывает успешный запрос."""
+        with self.lock:
+            self.failures = 0
+            self.openings = 0
+            self.probe_started = None
+            self.set_state(CLOSED)
+
+    def record_failure(self, retry_after=None):
+        """Учитывает неудачный запрос; retry_after — пауза от сервера.
+
+        Выключатель размыкается заново только из замкнутого состояния
+        по достижении порога или после неудачного пробного запроса.
+        Ошибки запросов, начатых до размыкания, только учитываются:
+        иначе одновременные ошибки всех обработчиков сразу довели бы
+        паузу до max_delay.
+        """
+        with self.lock:
+            self.failures += 1
+            if self.state == OPEN or (
+                self.state == HALF_OPEN and self.probe_started is None
+            ):
+                return
+            if (self.state == CLOSED and self.failures < self.threshold
+                    and retry_after is None):
+                return
+            if retry_after is None:
+                delay = min(
+                    self.max_delay,
+                    self.base_delay * 2 ** min(self.openings, MAX_EXPONENT),
+                )
+                delay *= 0.5 + self.random() / 2
+            else:
+                delay = min(retry_after, self.max_delay)
+            self.openings += 1
+            self.open_until = self.clock() + delay
+            self.probe_started = None
+            OPENINGS.inc()
+            logging.warning(
+                'Запросы к API приостановлены на %.0f с после %d ошибок',
+                delay, self.failures,
+            )
+            self.set_state(OPEN)
+
+    def record_response(self, response):
+        """Учитывает ответ API по коду ответа."""
+        status = response.status_code
+        if status in THROTTLE_STATUSES:
+            headers = getattr(response, 'headers', None) or {}
+            self.record_failure(parse_retry_after(headers.get('Retry-After')))
+        elif status >= HTTPStatus.INTERNAL_SERVER_ERROR:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+PRACTICUM = CircuitBreaker()
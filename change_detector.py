@@ -0,0 +1,128 @@
+"""Пропуск разбора ответов API, в которых список работ не изменился."""
+import hashlib
+import json
+import re
+import threading
+from http import HTTPStatus
+
+import homework
+import tracing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+UNCHANGED = None
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*-?\d+')
+
+
+def json_loads(body):
+    """Декодирует JSON быстрым orjson, если он установлен."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def body_digest(body):
+    """Хэш тела ответа без поля current_date, меняющегося каждый опрос."""
+    return hashlib.blake2b(
+        CURRENT_DATE.sub(b'', body), digest_size=16
+    ).digest()
+
+
+class DetectorStats:
+    """Счётчики опросов, пропущенных без разбора ответа."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.polls = 0
+        self.not_modified = 0
+        self.same_body = 0
+        self.decoded = 0
+
+    def count(self, name):
+        """Увеличивает счётчик с указанным именем."""
+        with self.lock:
+            self.polls += 1
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        """Возвращает копию счётчиков в виде словаря."""
+        with self.lock:
+            return {
+                'polls': self.polls,
+                'not_modified': self.not_modified,
+                'same_body': self.same_body,
+                'decoded': self.decoded,
+                'skipped': self.not_modified + self.same_body,
+            }
+
+
+STATS = DetectorStats()
+
+
+class ChangeDetector:
+    """Определяет неизменившиеся ответы API для одного пользователя.
+
+    Сначала используются условные заголовки If-None-Match и
+    If-Modified-Since, если сервер их поддерживает, затем сравнивается
+    хэш тела ответа. Состояние фиксируется вызовом commit() только после
+    успешной обработки ответа, чтобы неотправленное уведомление было
+    повторено на следующем опросе.
+    """
+
+    __slots__ = ('etag', 'last_modified', 'digest', 'pending', 'stats')
+
+    def __init__(self, stats=STATS):
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+        self.pending = None
+        self.stats = stats
+
+    def fetch(self, current_timestamp, headers):
+        """Запрашивает API; возвращает UNCHANGED, если изменений нет."""
+        return homework.request_api(
+            current_timestamp, self.conditional_headers(headers), self.decode
+        )
+
+    def conditional_headers(self, headers):
+        """Добавляет к заголовкам условия по сохранённым валидаторам."""
+        if self.etag is None and self.last_modified is None:
+            return headers
+        headers = dict(headers)
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def decode(self, response):
+        """Разбирает ответ, если он отличается от обработанного ранее."""
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            self.stats.count('not_modified')
+            return UNCHANGED
+        homework.check_status(response)
+        digest = body_digest(response.content)
+        self.pending = (
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            digest,
+        )
+        if digest == self.digest:
+            self.stats.count('same_body')
+            return UNCHANGED
+        self.stats.count('decoded')
+        with tracing.span('decode'):
+            return json_loads(response.content)
+
+    def reset(self):
+        """Забывает обработанный ответ: следующий будет разобран заново."""
+        self.etag = self.last_modified = self.digest = self.pending = None
+
+    def commit(self):
+        """Запоминает последний ответ как успешно обработанный."""
+        if self.pending is not None:
+            self.etag, self.last_modified, self.digest = self.pending
+            self.pending = None
@@ -0,0 +1,81 @@
+"""Кэш сведений о чатах Telegram для записи в лог."""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+
+CHAT_INFO_TTL = float(settings.env('CHAT_INFO_TTL', 24 * 60 * 60))
+# Сколько секунд помнить неудачный запрос сведений о чате.
+CHAT_INFO_FAILURE_TTL = float(settings.env('CHAT_INFO_FAILURE_TTL', 600))
+# Сведений о чате нет в кэше или они устарели.
+MISSING = object()
+
+
+class ChatInfoCache:
+    """Имена пользователей чатов с ограниченным временем жизни.
+
+    Отправка сообщения никогда не ждёт запроса сведений о чате:
+    при промахе кэша запрос выполняется в фоновом потоке, а в лог
+    попадает идентификатор чата. Чаты без имени пользователя (группы)
+    кэшируются так же, а неудачные запросы — на failure_ttl секунд,
+    чтобы каждая отправка не запрашивала сведения заново.
+    """
+
+    def __init__(self, ttl=CHAT_INFO_TTL, clock=time.monotonic,
+                 failure_ttl=CHAT_INFO_FAILURE_TTL):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.clock = clock
+        self.entries = {}
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='chat-info'
+        )
+
+    def get(self, chat_id):
+        """Имя пользователя из кэша.
+
+        None — у чата нет имени или узнать его не удалось, MISSING —
+        сведений о чате нет в кэше.
+        """
+        entry = self.entries.get(chat_id)
+        if entry is None or entry[1] < self.clock():
+            return MISSING
+        return entry[0]
+
+    def describe(self, bot, chat_id):
+        """Подпись чата для лога; при промахе запускает фоновый запрос."""
+        username = self.get(chat_id)
+        if username is MISSING:
+            self.refresh_in_background(bot, chat_id)
+        elif username is not None:
+            return f'@{username}'
+        return f'чата {chat_id}'
+
+    def refresh_in_background(self, bot, chat_id):
+        """Запрашивает сведения о чате, если запрос ещё не выполняется."""
+        with self.lock:
+            if chat_id in self.pending:
+                return
+            self.pending.add(chat_id)
+        self.executor.submit(self.refresh, bot, chat_id)
+
+    def refresh(self, bot, chat_id):
+        """Запрашивает имя пользователя чата и кладёт его в кэш."""
+        try:
+            username = bot.get_chat(chat_id).username
+            self.entries[chat_id] = (username, self.clock() + self.ttl)
+        except Exception as error:
+            logging.warning(
+                'Не удалось получить сведения о чате %s: %s', chat_id, error
+            )
+            self.entries[chat_id] = (None, self.clock() + self.failure_ttl)
+        finally:
+            with self.lock:
+                self.pending.discard(chat_id)
+
+
+CACHE = ChatInfoCache()
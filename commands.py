@@ -0,0 +1,157 @@
+"""Команды бота /status, /history и /refresh."""
+import asyncio
+import logging
+import time
+from collections import deque
+
+import homework
+import settings
+import sharding
+
+UPDATES_TIMEOUT = int(settings.env('TELEGRAM_UPDATES_TIMEOUT', 10))
+REFRESH_COOLDOWN = float(settings.env('REFRESH_COOLDOWN', 60))
+UNKNOWN_CHAT = 'Этот чат не подписан на уведомления о домашних работах.'
+UNKNOWN_COMMAND = 'Доступные команды: /status, /history, /refresh.'
+NO_HOMEWORKS = 'Статусы работ пока неизвестны.'
+COMMAND_FAILED = 'Не удалось выполнить команду, повторите её позже.'
+HOMEWORK_LINE = '{homework_name}: {verdict}'
+
+
+def describe(homework_name, status):
+    """Строка с названием работы и вердиктом по её статусу."""
+    return HOMEWORK_LINE.format(
+        homework_name=homework_name,
+        verdict=homework.VERDICTS.get(status, status),
+    )
+
+
+class CommandServer:
+    """Получает обновления бота длинным опросом и отвечает на команды.
+
+    /status и /history отвечают из индекса статусов и хранилища без
+    запроса к API Практикума, /refresh будит опрос пользователя не чаще
+    раза в REFRESH_COOLDOWN секунд.
+    """
+
+    def __init__(self, bot, timeout=UPDATES_TIMEOUT,
+                 cooldown=REFRESH_COOLDOWN, clock=time.monotonic):
+        self.bot = bot
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.clock = clock
+        self.offset = None
+        self.latencies = deque(maxlen=1000)
+        self.handlers = {
+            '/status': self.status,
+            '/history': self.history,
+            '/refresh': self.refresh,
+        }
+
+    async def run(self, engine):
+        """Обрабатывает команды, пока движок не остановлен.
+
+        Из нескольких обработчиков команды принимает только держатель
+        аренды sharding.COMMANDS_KEY.
+        """
+        while not engine.stopping.is_set():
+            shard = engine.shard
+            if shard is not None and not shard.owns(sharding.COMMANDS_KEY):
+                await asyncio.sleep(shard.interval)
+                continue
+            try:
+                updates = await engine.call(
+                    self.bot.get_updates, self.offset, 100, self.timeout
+                )
+            except Exception as error:
+                logging.error('Не удалось получить обновления: %s', error)
+                await asyncio.sleep(self.timeout)
+                continue
+            for update in updates:
+                self.offset = update.update_id + 1
+                await self.handle_safely(engine, update)
+
+    async def handle_safely(self, engine, update):
+        """Обрабатывает обновление; ошибка не останавливает движок.
+
+        Обновление уже подтверждено сдвигом offset, поэтому вместо
+        повторной обработки пользователь получает COMMAND_FAILED и
+        может повторить команду сам.
+        """
+        try:
+            await self.handle(engine, update)
+        except Exception as error:
+            logging.error(
+                'Ошибка обработки обновления %s: %s', update.update_id, error
+            )
+            message = update.effective_message
+            if message is None:
+                return
+            try:
+                await engine.send_now(message.chat_id, COMMAND_FAILED)
+            except Exception as send_error:
+                logging.error(
+                    'Не удалось сообщить об ошибке команды: %s', send_error
+                )
+
+    async def handle(self, engine, update):
+        """Отвечает на одно обновление с командой."""
+        message = update.effective_message
+        if message is None or not message.text:
+            return
+        received = self.clock()
+        command = message.text.split()[0].split('@')[0].lower()
+        chat_id = message.chat_id
+        tenants = engine.tenants_by_chat(chat_id)
+        handler = self.handlers.get(command)
+        if not tenants:
+            reply = UNKNOWN_CHAT
+        elif handler is None:
+            reply = UNKNOWN_COMMAND
+        elif len(tenants) == 1:
+            reply = await handler(engine, tenants[0])
+        else:
+            # Чат подписан на несколько токенов: ответ по каждому
+            # из них под именем пользователя.
+            reply = '\n\n'.join([
+                f'{tenant.name}:\n{await handler(engine, tenant)}'
+                for tenant in tenants
+            ])
+        await engine.send_now(chat_id, reply)
+        latency = self.clock() - received
+        self.latencies.append(latency)
+        logging.info('Команда %s обработана за %.3f с', command, latency)
+
+    async def status(self, engine, tenant):
+        """Текущие статусы всех работ пользователя."""
+        if engine.shard is not None and not engine.shard.owns_tenant(tenant):
+            # Токен опрашивает другой обработчик: статусы в памяти
+            # устарели, актуальные записаны им в хранилище.
+            await engine.reload([tenant])
+        lines = [
+            describe(name, status)
+            for name, status, _ in tenant.index.items()
+        ]
+        return '\n'.join(lines) or NO_HOMEWORKS
+
+    async def history(self, engine, tenant):
+        """Последние изменения статусов, новые первыми."""
+        if engine.store is not None:
+            records = await engine.call(engine.store.history, tenant.name)
+        else:
+            records = list(tenant.history or ())
+        lines = [
+            f'{date_updated or "—"} {describe(name, status)}'
+            for name, status, date_updated in records
+        ]
+        return '\n'.join(lines) or NO_HOMEWORKS
+
+    async def refresh(self, engine, tenant):
+        """Внеочередной опрос API для пользователя."""
+        now = self.clock()
+        if tenant.refreshed_at is not None:
+            wait = tenant.refreshed_at + self.cooldown - now
+            if wait > 0:
+                return f'Повторите запрос через {int(wait) + 1} с.'
+        tenant.refreshed_at = now
+        engine.refresh(tenant)
+        return 'Статусы будут проверены в ближайшие секунды.'
@@ -0,0 +1,211 @@
+"""Очередь отправки сообщений в Telegram с ограничением частоты."""
+import asyncio
+import logging
+import time
+from collections import deque
+
+import settings
+
+# Ограничения Telegram: около одного сообщения в секунду в чат
+# и не более 30 сообщений в секунду на бота.
+CHAT_RATE = float(settings.env('TELEGRAM_CHAT_RATE', 1))
+CHAT_BURST = float(settings.env('TELEGRAM_CHAT_BURST', 3))
+GLOBAL_RATE = float(settings.env('TELEGRAM_GLOBAL_RATE', 25))
+GLOBAL_BURST = float(settings.env('TELEGRAM_GLOBAL_BURST', 25))
+COALESCE_WINDOW = float(settings.env('TELEGRAM_COALESCE_WINDOW', 1))
+MAX_CONCURRENT_SENDS = int(settings.env('TELEGRAM_MAX_CONCURRENT_SENDS', 8))
+MAX_MESSAGE_LENGTH = 4096
+SEPARATOR = '\n\n'
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        """Добавляет накопившиеся с прошлого вызова токены."""
+        elapsed = max(now - self.updated, 0)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """Сколько секунд ждать до появления токена."""
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        """Забирает один токен."""
+        self.refill(now)
+        self.tokens -= 1
+
+
+class DeliveryStats:
+    """Глубина очереди, число отправок и задержка доставки."""
+
+    def __init__(self, window=1000):
+        self.sent = 0
+        self.failed = 0
+        self.merged = 0
+        self.depth = 0
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self):
+        """Возвращает копию счётчиков и перцентили задержки."""
+        latencies = sorted(self.latencies)
+
+        def percentile(share):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1,
+                                 int(len(latencies) * share))]
+
+        return {
+            'depth': self.depth,
+            'sent': self.sent,
+            'failed': self.failed,
+            'merged': self.merged,
+            'latency_p50': percentile(0.5),
+            'latency_p99': percentile(0.99),
+        }
+
+
+class DeliveryQueue:
+    """Очередь исходящих сообщений с объединением по чатам.
+
+    Сообщения одного чата, поставленные в очередь в пределах окна
+    window, отправляются одним сообщением. Частота отправки
+    ограничивается ведром токенов для каждого чата и общим ведром бота.
+    """
+
+    def __init__(self, send, chat_rate=CHAT_RATE, chat_burst=CHAT_BURST,
+                 global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+                 window=COALESCE_WINDOW, concurrency=MAX_CONCURRENT_SENDS,
+                 clock=time.monotonic):
+        self.send = send
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.window = window
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_burst, clock())
+        self.chat_buckets = {}
+        self.pending = {}
+        self.stats = DeliveryStats()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.changed = asyncio.Event()
+        self.inflight = set()
+        self.closing = False
+
+    def submit(self, chat_id, message):
+        """Ставит сообщение в очередь.
+
+        Возвращает Future с результатом отправки.
+        """
+        future = asyncio.get_event_loop().create_future()
+        self.pending.setdefault(chat_id, []).append(
+            (message, future, self.clock())
+        )
+        self.stats.depth += 1
+        self.changed.set()
+        return future
+
+    def close(self):
+        """Завершает работу после отправки всех сообщений в очереди."""
+        self.closing = True
+        self.changed.set()
+
+    def bucket(self, chat_id, now):
+        """Ведро токенов чата, создаётся при первой отправке."""
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def next_ready(self, now):
+        """Чат, который можно отправить раньше всех, и момент отправки."""
+        best_chat, best_at = None, None
+        for chat_id, messages in self.pending.items():
+            ready_at = max(
+                messages[0][2] + self.window,
+                now + self.bucket(chat_id, now).delay(now),
+            )
+            if best_at is None or ready_at < best_at:
+                best_chat, best_at = chat_id, ready_at
+        return best_chat, best_at
+
+    def take(self, chat_id):
+        """Забирает из очереди сообщения чата, помещающиеся в одно."""
+        messages = self.pending[chat_id]
+        batch, length = [], 0
+        while messages:
+            extra = len(messages[0][0]) + (len(SEPARATOR) if batch else 0)
+            if batch and length + extra > MAX_MESSAGE_LENGTH:
+                break
+            batch.append(messages.pop(0))
+            length += extra
+        if not messages:
+            del self.pending[chat_id]
+        self.stats.depth -= len(batch)
+        return batch
+
+    async def run(self):
+        """Отправляет сообщения, пока очередь не закрыта и не пуста."""
+        while not (self.closing and not self.pending):
+            now = self.clock()
+            chat_id, ready_at = self.next_ready(now)
+            if chat_id is None or ready_at > now:
+                await self.wait(None if chat_id is None else ready_at - now)
+                continue
+            global_delay = self.global_bucket.delay(now)
+            if global_delay > 0:
+                await asyncio.sleep(global_delay)
+                continue
+            self.global_bucket.consume(now)
+            self.bucket(chat_id, now).consume(now)
+            await self.semaphore.acquire()
+            task = asyncio.ensure_future(
+                self.dispatch(chat_id, self.take(chat_id))
+            )
+            self.inflight.add(task)
+            task.add_done_callback(self.inflight.discard)
+        if self.inflight:
+            await asyncio.gather(*self.inflight)
+
+    async def wait(self, timeout):
+        """Ждёт новых сообщений, но не дольше timeout секунд."""
+        self.changed.clear()
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def dispatch(self, chat_id, batch):
+        """Отправляет объединённое сообщение и сообщает результат."""
+        try:
+            text = SEPARATOR.join(message for message, _, _ in batch)
+            try:
+                result = bool(await self.send(chat_id, text))
+            except Exception as error:
+                logging.error('Ошибка отправки в чат %s: %s', chat_id, error)
+                result = False
+            now = self.clock()
+            if result:
+                self.stats.sent += 1
+                self.stats.merged += len(batch) - 1
+            else:
+                self.stats.failed += 1
+            for _, future, enqueued in batch:
+                self.stats.latencies.append(now - enqueued)
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.semaphore.release()
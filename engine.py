@@ -0,0 +1,852 @@
+"""Асинхронный движок опроса API Практикума для множества пользователей."""
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import breaker
+import change_detector
+import delivery
+import exceptions
+import homework
+import metrics
+import outbox
+import scheduler
+import settings
+import status_index
+import storage
+import tracing
+import transport
+import validation
+
+TENANTS_FILE = settings.env(
+    'TENANTS_FILE', os.path.join(homework.BASE_DIR, 'tenants.json')
+)
+MAX_WORKERS = int(settings.env('ENGINE_MAX_WORKERS', 64))
+# Сколько первых опросов в секунду допускается при запуске движка.
+STARTUP_RATE = float(settings.env('ENGINE_STARTUP_RATE', 50))
+# За сколько секунд пользователи возвращаются к опросу после
+# восстановления API.
+RESUME_SPREAD = float(settings.env('ENGINE_RESUME_SPREAD', 60))
+
+
+class Tenant:
+    """Пользователь бота: токен Практикума, чат и состояние опроса.
+
+    Состояние хранится компактно, чтобы в процессе помещались сотни
+    тысяч пользователей: вместо текста последнего отчёта об ошибке —
+    его отпечаток report_digest(), заголовки запроса строятся при
+    опросе, история в памяти создаётся только без хранилища. Своей
+    корутины и события ожидания у пользователя нет: момент опроса
+    хранит общая куча движка.
+    """
+
+    __slots__ = (
+        'name', 'practicum_token', 'chat_id',
+        'current_timestamp', 'last_report', 'polls', 'detector',
+        'schedule', 'index', 'history', 'refreshed_at',
+    )
+
+    def __init__(self, name, practicum_token, chat_id,
+                 current_timestamp=None):
+        self.name = name
+        self.practicum_token = practicum_token
+        self.chat_id = chat_id
+        if current_timestamp is None:
+            current_timestamp = int(time.time())
+        self.current_timestamp = current_timestamp
+        self.last_report = None
+        self.polls = 0
+        self.detector = change_detector.ChangeDetector()
+        self.schedule = scheduler.PollSchedule(homework.RETRY_TIME)
+        self.index = status_index.HomeworkIndex()
+        self.history = None
+        self.refreshed_at = None
+
+    @property
+    def headers(self):
+        """Заголовки авторизации запроса к API."""
+        return homework.build_headers(self.practicum_token)
+
+    def remember_history(self, record):
+        """Добавляет отправленный статус в историю в памяти."""
+        if self.history is None:
+            self.history = deque(maxlen=storage.HISTORY_LIMIT)
+        self.history.appendleft(
+            (record.name, record.status, record.date_updated)
+        )
+
+    def __repr__(self):
+        return f'Tenant({self.name!r}, chat_id={self.chat_id!r})'
+
+
+def load_tenants(path):
+    """Функция читает список пользователей из JSON файла.
+
+    Файл содержит список объектов с ключами ``name``,
+    ``practicum_token`` и ``chat_id``. Отсутствующий файл
+    означает пустой список.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as file:
+        records = json.load(file)
+    if not isinstance(records, list):
+        raise TypeError('Список пользователей не является списком')
+    tenants = [
+        Tenant(
+            record.get('name', str(record['chat_id'])),
+            record['practicum_token'],
+            record['chat_id'],
+        )
+        for record in records
+    ]
+    check_names(tenants)
+    return tenants
+
+
+def check_names(tenants):
+    """Функция проверяет, что имена пользователей не повторяются.
+
+    По имени хранятся курсор, статусы и уведомления пользователя, а
+    без name оно равно chat_id. Чату, подписанному на несколько
+    токенов, имена нужно задать явно, иначе состояние одного токена
+    затирало бы состояние другого.
+    """
+    seen = set()
+    for tenant in tenants:
+        if tenant.name in seen:
+            raise ValueError(
+                f'Имя пользователя {tenant.name!r} повторяется; задайте '
+                'разные name для каждого токена'
+            )
+        seen.add(tenant.name)
+
+
+# Токен в заголовке авторизации, если он попал в текст ошибки.
+OAUTH_TOKEN = re.compile(r'OAuth\s+[^\s\'",}]+')
+
+
+def sanitize(message, practicum_token=None):
+    """Текст ошибки без токенов Практикума."""
+    message = OAUTH_TOKEN.sub('OAuth ***', message)
+    if practicum_token:
+        message = message.replace(practicum_token, '***')
+    return message
+
+
+def report_digest(message):
+    """Отпечаток отчёта об ошибке: 64-битное число вместо текста."""
+    return int.from_bytes(
+        hashlib.blake2b(message.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+def parse_report(saved):
+    """Отпечаток из хранилища: шестнадцатеричный или полный текст.
+
+    Прежние версии записывали в хранилище текст отчёта целиком.
+    """
+    if saved is None:
+        return None
+    if len(saved) == 16:
+        try:
+            return int(saved, 16)
+        except ValueError:
+            pass
+    return report_digest(saved)
+
+
+async def wait_event(event, timeout):
+    """Ждёт события не дольше timeout секунд; True, если оно наступило."""
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+def subscriptions(tenants):
+    """Группирует пользователей по токену Практикума.
+
+    Возвращает словарь {токен: [пользователи]}; первый пользователь
+    группы опрашивает API за всех подписчиков токена.
+    """
+    groups = {}
+    for tenant in tenants:
+        groups.setdefault(tenant.practicum_token, []).append(tenant)
+    return groups
+
+
+class Engine:
+    """Опрашивает API для всех пользователей в одном процессе.
+
+    Момент следующего опроса каждого токена Практикума хранится в общей
+    куче scheduler.TimerHeap. Диспетчер dispatch() просыпается только к
+    ближайшему моменту и передаёт наступившие токены max_workers
+    обработчикам, поэтому планирование опроса стоит O(log n), а число
+    одновременных опросов ограничено. Пользователей можно добавлять и
+    удалять без перезапуска: add_tenant(), remove_tenant() и сигнал
+    SIGHUP, перечитывающий tenants_file.
+
+    Изменения записываются в outbox.Outbox каждого подписанного
+    на токен чата и отправляются отдельной задачей, не задерживая опрос.
+    Блокирующие запросы к API и Telegram выполняются в общем пуле
+    потоков.
+
+    Часы clock, ожидание sleep(событие, таймаут) и пул executor можно
+    подменить: так simulation.run_virtual выполняет движок в
+    виртуальном времени. По часам clock на время run() работают и
+    outbox, и выключатель breaker.PRACTICUM.
+    """
+
+    def __init__(self, tenants, bot, fetch=None, send=None,
+                 retry_time=None, max_workers=MAX_WORKERS, store=None,
+                 shard=None, clock=time.monotonic, sleep=wait_event,
+                 executor=None, tenants_file=None):
+        self.tenants = list(tenants)
+        self.tenants_file = tenants_file
+        self.file_names = set()
+        if tenants_file is not None:
+            loaded = load_tenants(tenants_file)
+            self.tenants.extend(loaded)
+            self.file_names = {tenant.name for tenant in loaded}
+        check_names(self.tenants)
+        self.named = {tenant.name: tenant for tenant in self.tenants}
+        # Пользователи без сохранённого состояния: их индекс заполнит
+        # первая синхронизация sync().
+        self.unsynced = set(self.named)
+        self.subscribers = subscriptions(self.tenants)
+        self.bot = bot
+        self.fetch = fetch
+        self.send = send or homework.send_chat_message
+        if retry_time is None:
+            retry_time = homework.RETRY_TIME
+        self.retry_time = retry_time
+        self.max_workers = max_workers
+        self.pool = executor
+        self.executor = None
+        self.stopping = None
+        self.clock = clock
+        self.sleep = sleep
+        self.store = store
+        self.outbox = outbox.Outbox(store, clock=clock)
+        self.queue = None
+        self.services = []
+        self.chats = {}
+        for tenant in self.tenants:
+            self.chats.setdefault(str(tenant.chat_id), []).append(tenant)
+        self.shard = shard
+        self.busy = set()
+        self.timers = scheduler.TimerHeap()
+        self.wakeup = None
+        self.due = None
+        self.rerun = set()
+        self.reloading = None
+
+    async def run(self):
+        """Запускает опрос всех пользователей до вызова stop()."""
+        self.stopping = asyncio.Event()
+        self.wakeup = asyncio.Event()
+        self.due = asyncio.Queue()
+        self.executor = self.pool or ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='engine',
+        )
+        leaders = [group[0] for group in self.subscribers.values()]
+        spread = min(self.retry_time, len(leaders) / STARTUP_RATE)
+        now = self.clock()
+        for tenant in self.tenants:
+            tenant.schedule.base = self.retry_time
+        for leader in leaders:
+            self.timers.push(leader, leader.schedule.start(now, spread))
+        if self.store is not None:
+            self.restore()
+        logging.info(
+            'Запускаем опрос для %d пользователей, токенов: %d',
+            len(self.tenants), len(leaders),
+        )
+        if tracing.PROFILE_ON_START:
+            tracing.PROFILER.trigger()
+        self.queue = delivery.DeliveryQueue(self.send_now, clock=self.clock)
+        sender = asyncio.ensure_future(self.queue.run())
+        breaker_clock = breaker.PRACTICUM.set_clock(self.clock)
+        try:
+            await asyncio.gather(
+                self.flush_forever(),
+                self.outbox.run(self),
+                *(service(self) for service in self.services),
+                *([self.shard.run(self)] if self.shard is not None else []),
+                self.dispatch(),
+                *(self.poll_worker() for _ in range(self.max_workers))
+            )
+            self.queue.close()
+            await sender
+        finally:
+            breaker.PRACTICUM.set_clock(breaker_clock)
+            sender.cancel()
+            self.executor.shutdown(wait=False)
+            if self.store is not None:
+                self.store.flush()
+            logging.info(
+                'Статистика соединений: %s',
+                transport.default_transport().stats.snapshot(),
+            )
+            logging.info(
+                'Пропущено неизменившихся ответов: %s',
+                change_detector.STATS.snapshot(),
+            )
+            logging.info(
+                'Очередь отправки: %s', self.queue.stats.snapshot()
+            )
+            logging.info(
+                'Неотправленные уведомления: %s',
+                self.outbox.stats.snapshot(),
+            )
+
+    def restore(self, tenants=None, saved=None):
+        """Восстанавливает курсоры и статусы пользователей из хранилища."""
+        if saved is None:
+            saved = self.store.load()
+        restored = 0
+        for tenant in self.tenants if tenants is None else tenants:
+            if tenant.name not in saved:
+                continue
+            restored += 1
+            self.unsynced.discard(tenant.name)
+            current_timestamp, last_report, statuses = saved[tenant.name]
+            tenant.current_timestamp = current_timestamp
+            tenant.last_report = parse_report(last_report)
+            tenant.index = status_index.HomeworkIndex(statuses)
+            tenant.schedule.record_success(tenant.index.active_statuses())
+        if tenants is None:
+            self.outbox.load(self.store.load_events())
+        logging.info('Восстановлено состояние %d пользователей', restored)
+
+    async def reload(self, tenants):
+        """Перечитывает состояние и уведомления пользователей.
+
+        Из хранилища читаются только строки этих пользователей.
+        """
+        if self.store is not None:
+            names = [tenant.name for tenant in tenants]
+            self.restore(tenants, await self.call(self.store.load, names))
+            self.outbox.load(
+                await self.call(self.store.load_events, names), names
+            )
+
+    async def acquire(self, leaders):
+        """Начинает опрос токенов, перешедших от другого обработчика.
+
+        Состояние подписчиков перечитывается из хранилища, куда его
+        записал прежний обработчик, и опрос выполняется сразу. Их
+        неотправленные уведомления outbox отправляет, не дожидаясь
+        своей паузы.
+        """
+        tenants = [
+            tenant for leader in leaders for tenant in self.group(leader)
+        ]
+        await self.reload(tenants)
+        for leader in leaders:
+            self.refresh(leader)
+        self.outbox.resume(tenant.name for tenant in tenants)
+
+    async def save(self):
+        """Записывает накопленное состояние в хранилище."""
+        if self.store is not None:
+            await self.call(self.store.flush)
+
+    async def flush_forever(self):
+        """Периодически записывает накопленное состояние в хранилище."""
+        if self.store is None:
+            return
+        while not self.stopping.is_set():
+            await self.sleep(self.stopping, storage.FLUSH_INTERVAL)
+            try:
+                await self.call(self.store.flush)
+            except Exception as error:
+                logging.error('Не удалось сохранить состояние: %s', error)
+
+    def remember(self, tenant, homeworks):
+        """Передаёт в хранилище курсор и отправленные статусы.
+
+        homeworks — записи validation.HomeworkRecord.
+        """
+        if self.store is None:
+            return
+        self.store.save_cursor(
+            tenant.name, tenant.current_timestamp,
+            None if tenant.last_report is None
+            else f'{tenant.last_report:016x}',
+        )
+        for record in homeworks:
+            self.store.save_status(
+                tenant.name, record.key, record.status, record.date_updated,
+                record.name,
+            )
+
+    def stop(self):
+        """Останавливает опрос, прерывая ожидание диспетчера."""
+        if self.stopping is not None:
+            self.stopping.set()
+            self.wakeup.set()
+
+    def tenants_by_chat(self, chat_id):
+        """Пользователи, уведомления которых приходят в чат.
+
+        Чат может быть подписан на несколько токенов, например чат
+        наставника.
+        """
+        return list(self.chats.get(str(chat_id), ()))
+
+    def group(self, tenant):
+        """Подписчики токена пользователя; первый из них опрашивает API."""
+        return self.subscribers.get(tenant.practicum_token) or [tenant]
+
+    def is_leader(self, tenant):
+        """Опрашивает ли пользователь API за подписчиков своего токена."""
+        group = self.subscribers.get(tenant.practicum_token)
+        return bool(group) and group[0] is tenant
+
+    def refresh(self, tenant):
+        """Назначает пользователю внеочередной опрос.
+
+        Если токен опрашивается прямо сейчас, опрос повторяется сразу
+        после текущего; если он уже ждёт обработчика, ничего не нужно.
+        """
+        leader = self.group(tenant)[0]
+        if self.wakeup is None:
+            return
+        if leader.name in self.busy:
+            self.rerun.add(leader.name)
+        elif leader in self.timers:
+            self.timers.push(leader, self.clock())
+            self.wakeup.set()
+
+    def install_signal_handlers(self):
+        """SIGTERM и SIGINT останавливают движок, SIGUSR1 — опрос всех.
+
+        SIGUSR2 снимает профиль процесса (tracing.PROFILER), SIGHUP
+        перечитывает список пользователей из tenants_file.
+        """
+        loop = asyncio.get_event_loop()
+        handlers = (
+            (signal.SIGTERM, self.stop),
+            (signal.SIGINT, self.stop),
+            (getattr(signal, 'SIGUSR1', None), self.refresh_all),
+            (getattr(signal, 'SIGUSR2', None), tracing.PROFILER.trigger),
+            (getattr(signal, 'SIGHUP', None), self.start_reload_tenants),
+        )
+        for signum, handler in handlers:
+            if signum is None:
+                continue
+            try:
+                loop.add_signal_handler(signum, handler)
+            except (NotImplementedError, RuntimeError):
+                logging.warning('Сигнал %s не поддерживается', signum)
+
+    def refresh_all(self):
+        """Будит всех пользователей для внеочередного опроса."""
+        for tenant in self.tenants:
+            self.refresh(tenant)
+
+    async def dispatch(self):
+        """Передаёт обработчикам токены, момент опроса которых наступил.
+
+        Ждёт ближайшего момента из кучи или пробуждения: внеочередного
+        опроса, нового пользователя, более раннего момента.
+        """
+        while not self.stopping.is_set():
+            self.wakeup.clear()
+            now = self.clock()
+            for leader in self.timers.pop_due(now):
+                if self.shard is None or self.shard.owns_tenant(leader):
+                    self.due.put_nowait(leader)
+                else:
+                    self.reschedule(leader)
+            earliest = self.timers.earliest()
+            timeout = self.retry_time
+            if earliest is not None:
+                timeout = min(timeout, max(earliest - self.clock(), 0))
+            await self.sleep(self.wakeup, timeout)
+        for _ in range(self.max_workers):
+            self.due.put_nowait(None)
+
+    async def poll_worker(self):
+        """Обработчик: опрашивает токены из очереди диспетчера."""
+        while True:
+            leader = await self.due.get()
+            if leader is None:
+                return
+            if self.stopping.is_set() or not self.is_leader(leader):
+                continue
+            if self.shard is None or self.shard.owns_tenant(leader):
+                self.busy.add(leader.name)
+                try:
+                    await self.poll_once(leader)
+                finally:
+                    self.busy.discard(leader.name)
+            if self.is_leader(leader):
+                self.reschedule(leader)
+
+    def reschedule(self, leader):
+        """Назначает токену следующий опрос по его расписанию."""
+        deadline = leader.schedule.next_deadline(self.clock())
+        if leader.name in self.rerun:
+            self.rerun.discard(leader.name)
+            deadline = self.clock()
+        self.timers.push(leader, deadline)
+        if deadline <= self.timers.earliest():
+            self.wakeup.set()
+
+    async def add_tenant(self, tenant):
+        """Добавляет пользователя без перезапуска движка."""
+        await self.add_tenants([tenant])
+
+    async def add_tenants(self, tenants):
+        """Добавляет пользователей без перезапуска движка.
+
+        Пользователь с тем же именем заменяется. Состояние новых
+        пользователей читается из хранилища одним запросом. Новый токен
+        опрашивается сразу; у уже опрашиваемого токена сбрасывается
+        ChangeDetector опрашивающего и назначается внеочередной опрос,
+        иначе ответ совпал бы с прежним и подписчик не получил бы свои
+        статусы.
+        """
+        for tenant in tenants:
+            previous = self.named.get(tenant.name)
+            if previous is not None:
+                self.remove_tenant(previous)
+            tenant.schedule.base = self.retry_time
+            self.tenants.append(tenant)
+            self.named[tenant.name] = tenant
+            self.unsynced.add(tenant.name)
+            self.chats.setdefault(str(tenant.chat_id), []).append(tenant)
+            group = self.subscribers.setdefault(tenant.practicum_token, [])
+            group.append(tenant)
+            group[0].detector.reset()
+        if self.store is not None and tenants:
+            await self.reload(tenants)
+        for tenant in tenants:
+            logging.info('Добавлен пользователь %s', tenant.name)
+            if self.wakeup is None:
+                continue
+            if self.is_leader(tenant):
+                tenant.schedule.start(self.clock())
+                self.timers.push(tenant, self.clock())
+                self.wakeup.set()
+            else:
+                self.refresh(tenant)
+
+    def remove_tenant(self, tenant):
+        """Удаляет пользователя без перезапуска движка.
+
+        Если он опрашивал API за подписчиков токена, опрос переходит
+        к следующему подписчику в тот же момент.
+        """
+        if self.named.get(tenant.name) is not tenant:
+            return False
+        del self.named[tenant.name]
+        self.unsynced.discard(tenant.name)
+        self.tenants.remove(tenant)
+        chat = self.chats.get(str(tenant.chat_id), [])
+        if tenant in chat:
+            chat.remove(tenant)
+            if not chat:
+                del self.chats[str(tenant.chat_id)]
+        leader = self.is_leader(tenant)
+        group = self.subscribers[tenant.practicum_token]
+        group.remove(tenant)
+        if group:
+            group[0].detector.reset()
+        else:
+            del self.subscribers[tenant.practicum_token]
+        deadline = self.timers.deadline(tenant)
+        self.timers.remove(tenant)
+        self.rerun.discard(tenant.name)
+        metrics.LAST_SUCCESS.remove(tenant.name)
+        if leader and group and self.wakeup is not None:
+            if deadline is None:
+                deadline = self.clock()
+            self.timers.push(group[0], deadline)
+            self.wakeup.set()
+        logging.info('Удалён пользователь %s', tenant.name)
+        return True
+
+    async def reload_tenants(self):
+        """Применяет изменения tenants_file без перезапуска.
+
+        Новые пользователи добавляются, пользователи со сменившимся
+        токеном или чатом заменяются, исчезнувшие из файла удаляются.
+        """
+        if self.tenants_file is None:
+            return
+        try:
+            loaded = await self.call(load_tenants, self.tenants_file)
+        except Exception as error:
+            logging.error('Не удалось прочитать пользователей: %s', error)
+            return
+        names = {tenant.name for tenant in loaded}
+        clash = names & (set(self.named) - self.file_names)
+        if clash:
+            logging.error(
+                'Имена из файла пользователей уже заняты: %s',
+                ', '.join(sorted(clash)),
+            )
+            return
+        for name in self.file_names - names:
+            if name in self.named:
+                self.remove_tenant(self.named[name])
+        changed = []
+        for tenant in loaded:
+            current = self.named.get(tenant.name)
+            if current is None or (
+                current.practicum_token != tenant.practicum_token
+                or current.chat_id != tenant.chat_id
+            ):
+                changed.append(tenant)
+        await self.add_tenants(changed)
+        self.file_names = names
+        logging.info('Пользователей после перечитывания: %d', len(self.named))
+
+    def start_reload_tenants(self):
+        """Перечитывает tenants_file в фоне (обработчик SIGHUP)."""
+        self.reloading = asyncio.ensure_future(self.reload_tenants())
+
+    async def call(self, func, *args):
+        """Выполняет блокирующую функцию в пуле потоков движка.
+
+        Функция получает копию контекста корутины, чтобы её этапы
+        попадали в трассировку текущего цикла.
+        """
+        loop = asyncio.get_event_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(context.run, func, *args)
+        )
+
+    async def poll_once(self, tenant):
+        """Один цикл опроса токена: запрос, проверка ответа и рассылка.
+
+        Ответ запрашивается один раз с самым ранним курсором среди
+        подписчиков токена и сравнивается с индексом каждого из них.
+        Подписчикам без сохранённого состояния перед этим заполняется
+        индекс вызовом sync(). Время этапов записывается в
+        tracing.Trace цикла.
+        """
+        with tracing.cycle('poll', tenant.name):
+            tenant.polls += 1
+            subscribers = self.group(tenant)
+            fetch = self.fetch or tenant.detector.fetch
+            try:
+                unsynced = [
+                    subscriber for subscriber in subscribers
+                    if subscriber.name in self.unsynced
+                ]
+                if unsynced and self.fetch is None:
+                    with tracing.span('sync'):
+                        await self.sync(tenant, unsynced)
+                since = min(
+                    subscriber.current_timestamp for subscriber in subscribers
+                )
+                if self.fetch is None and not since:
+                    with tracing.span('fetch'):
+                        response, events, errors = await self.call(
+                            self.fetch_history, tenant, subscribers
+                        )
+                else:
+                    with tracing.span('fetch'):
+                        response = await self.call(
+                            fetch, since, tenant.headers
+                        )
+                    if response is change_detector.UNCHANGED:
+                        logging.info('Изменений нет')
+                        tenant.schedule.record_success()
+                        for subscriber in subscribers:
+                            metrics.LAST_SUCCESS.touch(subscriber.name)
+                        return
+                    with tracing.span('validate'):
+                        records, errors = validation.VALIDATOR.response(
+                            response
+                        )
+                    with tracing.span('diff'):
+                        events = status_index.diff_all(
+                            [subscriber.index for subscriber in subscribers],
+                            records,
+                        )
+                current_date = (
+                    None if errors else response.get('current_date')
+                )
+                with tracing.span('enqueue'):
+                    for subscriber, changed in zip(subscribers, events):
+                        self.fan_out(subscriber, changed, current_date)
+                if errors:
+                    raise exceptions.InvalidHomeworks(errors)
+                tenant.detector.commit()
+                tenant.schedule.record_success(
+                    tenant.index.active_statuses()
+                )
+            except exceptions.CircuitBreakerOpen as error:
+                logging.info('Опрос отложен: %s', error)
+                tenant.schedule.postpone(
+                    error.retry_at,
+                    min(tenant.schedule.interval(), RESUME_SPREAD),
+                )
+            except exceptions.EmptyValuesFromAPI as error:
+                metrics.count_error(error)
+                logging.info('Пустой ответ от API. Ошибка: %s', error)
+            except Exception as error:
+                await self.report_error(tenant, error)
+
+    def fan_out(self, tenant, events, current_date):
+        """Записывает изменения подписчика в outbox и сдвигает его курсор.
+
+        Курсор не ждёт отправки уведомлений: их доставит outbox.
+        current_date равен None, если в ответе были некорректные работы:
+        корректные записываются, но курсор и последний отчёт об ошибке
+        не меняются.
+        """
+        if current_date is not None:
+            tenant.last_report = None
+        if events:
+            self.enqueue(tenant, events)
+        else:
+            logging.info('Изменений нет')
+        if current_date is None:
+            return
+        if current_date != tenant.current_timestamp:
+            tenant.current_timestamp = current_date
+            self.remember(tenant, ())
+        metrics.LAST_SUCCESS.touch(tenant.name)
+
+    async def sync(self, tenant, subscribers):
+        """Заполняет индексы подписчиков без сохранённого состояния.
+
+        Вся история токена (from_date=0) читается потоком. Работы,
+        обновлённые до курсора подписчика, записываются в индекс и
+        хранилище без уведомлений, чтобы /status знал их, а следующие
+        ответы API сравнивались с ними. О более поздних работах сообщит
+        обычный опрос с курсора. Подписчику с нулевым курсором
+        синхронизация не нужна: обычный опрос и так прочитает всю
+        историю.
+        """
+        pending = [
+            subscriber for subscriber in subscribers
+            if subscriber.current_timestamp
+        ]
+        if pending:
+            _, events, errors = await self.call(
+                self.fetch_history, tenant, pending
+            )
+            if errors:
+                logging.warning(
+                    'Некорректных работ в истории: %d', len(errors)
+                )
+            for subscriber, records in zip(pending, events):
+                known = [
+                    record for record in records
+                    if (validation.updated_at(record) or 0)
+                    < subscriber.current_timestamp
+                ]
+                with (self.store.atomic() if self.store is not None
+                      else nullcontext()):
+                    for record in known:
+                        subscriber.index.add(record)
+                    self.remember(subscriber, known)
+                logging.info(
+                    'Синхронизировано работ пользователя %s: %d',
+                    subscriber.name, len(known),
+                )
+        for subscriber in subscribers:
+            self.unsynced.discard(subscriber.name)
+
+    def fetch_history(self, tenant, subscribers):
+        """Читает всю историю работ потоком и сравнивает её с индексами.
+
+        Выполняется в пуле потоков: тело ответа с from_date=0 разбирается
+        по мере чтения, в памяти остаются только изменившиеся работы.
+        Используется первой синхронизацией sync() и опросом с нулевым
+        курсором.
+        """
+        stream = homework.stream_api(0, tenant.headers)
+        errors = []
+        events = status_index.diff_all(
+            [subscriber.index for subscriber in subscribers],
+            validation.VALIDATOR.records(stream, errors),
+        )
+        return stream, events, errors
+
+    async def send_now(self, chat_id, message):
+        """Отправляет сообщение в чат в пуле потоков движка."""
+        return await self.call(self.send, self.bot, chat_id, message)
+
+    async def notify(self, chat_id, message):
+        """Отправляет сообщение через очередь, если она запущена."""
+        if self.queue is None:
+            return await self.send_now(chat_id, message)
+        return await self.queue.submit(chat_id, message)
+
+    def may_deliver(self, event):
+        """Отправляет ли обработчик уведомление outbox.OutboxEvent.
+
+        Уведомления отправляет обработчик, опрашивающий токен
+        пользователя: у остальных они могут быть уже отправлены.
+        """
+        if self.shard is None:
+            return True
+        tenant = self.named.get(event.tenant)
+        return tenant is not None and self.shard.owns_tenant(tenant)
+
+    def enqueue(self, tenant, events):
+        """Записывает уведомления о новых статусах работ в outbox.
+
+        events — записи validation.HomeworkRecord. Уведомления, статусы
+        в индексе и хранилище меняются вместе, в одной транзакции
+        хранилища, поэтому после сбоя статус не потеряется и не будет
+        отправлен повторно. Текст уведомления не хранится: его строит
+        validation.render() при отправке. История в памяти нужна
+        командам только без хранилища.
+        """
+        logging.info('Изменились статусы %d работ', len(events))
+        with self.store.atomic() if self.store is not None else nullcontext():
+            for record in events:
+                self.outbox.put(tenant, record)
+                tenant.index.add(record)
+                if self.store is None:
+                    tenant.remember_history(record)
+            self.remember(tenant, events)
+
+    async def report_error(self, tenant, error):
+        """Сообщает подписчикам о сбое, не повторяя одинаковые сообщения.
+
+        Вместо текста прошлого сообщения подписчик хранит его отпечаток.
+        Сообщение получают все чаты токена и общий лог, поэтому токен
+        из него вырезается.
+        """
+        message = sanitize(
+            f'Сбой в работе программы: {error}', tenant.practicum_token
+        )
+        digest = report_digest(message)
+        logging.error(message)
+        metrics.count_error(error)
+        tenant.detector.reset()
+        tenant.schedule.record_error()
+        subscribers = [
+            subscriber for subscriber in self.group(tenant)
+            if subscriber.last_report != digest
+        ]
+        await asyncio.gather(*(
+            self.notify(subscriber.chat_id, message)
+            for subscriber in subscribers
+        ))
+        for subscriber in subscribers:
+            subscriber.last_report = digest
@@ -43,3 +43,21 @@ class NoCorrectCodeRequest(Exception):
     """Исключение не верный код ответа."""
 
     pass
+
+
+class CircuitBreakerOpen(Exception):
+    """Исключение запросы к API временно приостановлены."""
+
+    def __init__(self, message, retry_at):
+        super().__init__(message)
+        self.retry_at = retry_at
+
+
+class InvalidHomeworks(CheckResponseException):
+    """Исключение в ответе API есть некорректные работы."""
+
+    def __init__(self, errors):
+        super().__init__('Некорректные работы в ответе API: ' + '; '.join(
+            f'№{error.position}: {error.message}' for error in errors
+        ))
+        self.errors = errors
@@ -1,32 +1,52 @@
-import os
-import sys
-import requests
-
-from http import HTTPStatus
-import time
+import enum
 import logging
-import telegram
+import time
+from http import HTTPStatus
 
+import breaker
+import chat_info
 import exceptions
-from dotenv import load_dotenv
+import metrics
+import settings
+import tracing
 
-load_dotenv()
+SETTINGS = settings.get()
 
-PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+PRACTICUM_TOKEN = SETTINGS.practicum_token
+TELEGRAM_TOKEN = SETTINGS.telegram_token
+TELEGRAM_CHAT_ID = SETTINGS.telegram_chat_id
 
 
-RETRY_TIME = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+RETRY_TIME = SETTINGS.retry_time
+ENDPOINT = SETTINGS.endpoint
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = SETTINGS.base_dir
+
+
+class Status(str, enum.Enum):
+    """Статус проверки работы.
+
+    Члены перечисления равны строкам API и хэшируются как они, поэтому
+    индексы, хранилище и сравнения со строками работают без изменений,
+    а вместо отдельной строки на каждую работу хранится ссылка на один
+    из трёх объектов.
+    """
+
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+    APPROVED = 'approved'
+    REVIEWING = 'reviewing'
+    REJECTED = 'rejected'
+
 
 VERDICTS = {
-    'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
-    'reviewing': 'Работа взята на проверку ревьюером.',
-    'rejected': 'Работа проверена: у ревьюера есть замечания.'
+    Status.APPROVED: 'Работа проверена: ревьюеру всё понравилось. Ура!',
+    Status.REVIEWING: 'Работа взята на проверку ревьюером.',
+    Status.REJECTED: 'Работа проверена: у ревьюера есть замечания.'
 }
+# Член Status по строке из ответа API или хранилища.
+STATUSES = {status.value: status for status in Status}
 STATUS_IS_CHANGED = (
     'Изменился статус проверки работы "{homework_name}". {verdict}'
 )
@@ -34,57 +54,148 @@ STATUS_IS_CHANGED = (
 
 def send_message(bot, message):
     """Функция отправляет сообщение в Telegram чат."""
+    return send_chat_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+@metrics.SEND_LATENCY.time()
+def send_chat_message(bot, chat_id, message):
+    """Функция отправляет сообщение в указанный Telegram чат."""
+    from telegram.error import TelegramError
+
     try:
         logging.info('Отправляем сообщение в телеграм')
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-        user_username = bot.get_chat_member(
-            TELEGRAM_CHAT_ID, TELEGRAM_CHAT_ID).user.username
+        started = time.perf_counter()
+        bot.send_message(chat_id=chat_id, text=message)
         logging.info(
-            f'Пользователю @{user_username} отправлено сообщение: {message}'
+            'Пользователю %s отправлено сообщение за %.3f с: %s',
+            chat_info.CACHE.describe(bot, chat_id),
+            time.perf_counter() - started, message,
         )
         return True
 
-    except telegram.error.TelegramError as error:
-        logging.error(f'Сообщение: {message} не удалось отправить')
-        logging.error(f'Ошибка: {error}')
+    except TelegramError as error:
+        logging.error('Сообщение: %s не удалось отправить', message)
+        logging.error('Ошибка: %s', error)
         return False
 
 
 def get_api_answer(current_timestamp):
     """Функция делает запрос к единственному эндпоинту."""
+    return request_api(current_timestamp, HEADERS)
+
+
+@metrics.API_LATENCY.time()
+def request_api(current_timestamp, headers, decode=None, stream=False):
+    """Функция делает запрос к эндпоинту с заголовками пользователя.
+
+    Если передан decode, разбор ответа выполняет он, иначе ответ
+    проверяется check_status и декодируется из JSON. При stream=True
+    тело ответа не загружается целиком до вызова decode.
+    """
     timestamp = current_timestamp
     api_with_homework = {
         'url': ENDPOINT,
-        'headers': HEADERS,
+        'headers': headers,
         'params': {'from_date': timestamp}
     }
+    if stream:
+        api_with_homework['stream'] = True
+    breaker.PRACTICUM.before_call()
     try:
         logging.info(
-            'Делаем запрос к {url} с параметрами: {params}'.format(
-                **api_with_homework
-            )
+            'Делаем запрос к %s с параметрами: %s',
+            api_with_homework['url'], api_with_homework['params'],
         )
-        response = requests.get(**api_with_homework)
+        response = send_request(api_with_homework)
         logging.info('Ответ от сервера получен успешно')
-        if response.status_code != HTTPStatus.OK:
-            logging.error(f'Ошибка {response.status_code}')
-            raise exceptions.NoCorrectCodeRequest(
-                f'Ошибка: {response.status_code}, '
-                f'причина: {response.reason}, '
-                f'текст: {response.text}'
-            )
+        if decode is not None:
+            return decode(response)
+        check_status(response)
         return response.json()
     except Exception as error:
-        raise ConnectionError(
-            'Произошёл сбой сети: {error}, '
-            'url={url}'
-            'headers={headers}, '
-            'params={params}'.format(
-                error=error, **api_with_homework
-            )
+        raise network_error(error, ENDPOINT, api_with_homework['params'])
+
+
+def network_error(error, url, params):
+    """Функция оборачивает сбой запроса в ConnectionError.
+
+    Заголовки с токеном в текст не попадают: он уходит в общий лог и
+    во все чаты, подписанные на токен.
+    """
+    return ConnectionError(
+        f'Произошёл сбой сети: {error}, url={url}, params={params}'
+    )
+
+
+def read_body(response, current_timestamp, chunk_size):
+    """Функция отдаёт тело ответа частями.
+
+    Тело потокового ответа читается уже после возврата из
+    request_api, поэтому сбой чтения здесь так же учитывается
+    выключателем и оборачивается в ConnectionError.
+    """
+    try:
+        yield from response.iter_content(chunk_size)
+    except Exception as error:
+        breaker.PRACTICUM.record_failure()
+        raise network_error(
+            error, ENDPOINT, {'from_date': current_timestamp}
+        )
+
+
+def stream_api(current_timestamp, headers):
+    """Функция запрашивает работы с потоковым разбором тела ответа.
+
+    Возвращает homework_stream.HomeworkStream: работы проверяются и
+    отдаются по одной по мере чтения, поэтому память не растёт с длиной
+    истории. Используется для запросов всей истории: первой
+    синхронизации пользователя без сохранённого состояния и выгрузки
+    в backfill.py.
+    """
+    import homework_stream
+
+    def decode(response):
+        check_status(response)
+        return homework_stream.HomeworkStream(
+            read_body(
+                response, current_timestamp, homework_stream.CHUNK_SIZE
+            ),
+            response.close,
         )
 
+    return request_api(current_timestamp, headers, decode, stream=True)
+
+
+def send_request(api_with_homework):
+    """Функция выполняет запрос и сообщает его исход выключателю."""
+    import transport
 
+    try:
+        response = transport.default_transport().get(**api_with_homework)
+    except Exception:
+        breaker.PRACTICUM.record_failure()
+        raise
+    breaker.PRACTICUM.record_response(response)
+    elapsed = getattr(response, 'elapsed', None)
+    if elapsed is not None:
+        # Время до получения заголовков ответа: соединение, TLS и
+        # обработка запроса сервером, без чтения тела.
+        tracing.annotate('response', elapsed.total_seconds())
+    return response
+
+
+def check_status(response):
+    """Функция проверяет код ответа API."""
+    if response.status_code != HTTPStatus.OK:
+        logging.error('Ошибка %s', response.status_code)
+        raise exceptions.NoCorrectCodeRequest(
+            f'Ошибка: {response.status_code}, '
+            f'причина: {response.reason}, '
+            f'текст: {response.text}'
+        )
+
+
+@metrics.PARSE_DURATION.time('check_response')
 def check_response(response):
     """Функция проверяет ответ API на корректность."""
     logging.info('Список домашних работ успешно получен')
@@ -102,6 +213,12 @@ def check_response(response):
     return homework
 
 
+def build_headers(practicum_token):
+    """Функция формирует заголовки авторизации для токена Практикума."""
+    return {'Authorization': f'OAuth {practicum_token}'}
+
+
+@metrics.PARSE_DURATION.time('parse_status')
 def parse_status(homework):
     """Функция извлекает cтатус домашней работы."""
     if 'homework_name' not in homework:
@@ -136,66 +253,85 @@ def check_tokens():
     for name, token in environment_variables:
         if token is None:
             flag = False
-            logging.critical('Отсутствует токен переменной {name}')
+            logging.critical('Отсутствует токен переменной %s', name)
     return flag
 
 
 def main():
     """Описание основной логики работы бота."""
     if not check_tokens():
-        logging.CRITICAL(
+        logging.critical(
             'Отсутствуют обязательные переменные окружения!'
         )
         raise KeyError('Ошибка в ТОКЕНАХ')
 
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
-    current_report = {}
-    prev_report = {}
-
-    while True:
-        try:
-            response = get_api_answer(current_timestamp)
-            homeworks = check_response(response)
-            if homeworks:
-                message = parse_status(homeworks[0])
-                current_report['message'] = message
-            else:
-                current_report['message'] = 'Нет новых статусов'
-            if current_report != prev_report:
-                logging.info('Статус домашней работы изменился')
-                if send_message(bot, current_report['message']):
-                    prev_report = current_report.copy()
-                    current_timestamp = response.get(
-                        "current_date",
-                        current_timestamp
-                    )
-            else:
-                logging.info('Изменений нет')
-
-        except exceptions.EmptyValuesFromAPI as error:
-            logging.info(f'Пустой ответ от API. Ошибка: {error}')
-        except Exception as error:
-            current_report['message'] = f'Сбой в работе программы: {error}'
-            logging.error(f'Сбой в работе программы: {error}')
-            if current_report != prev_report:
-                send_message(bot, f'Сбой в работе программы: {error}')
-                prev_report = current_report.copy()
-        finally:
-            time.sleep(RETRY_TIME)
+    import sharding
 
+    if sharding.WORKERS > 1:
+        sharding.supervise(sharding.WORKERS, worker_main)
+    else:
+        run_bot()
 
-if __name__ == '__main__':
-    logging.basicConfig(
-        level=logging.INFO,
-        format=(
-            '%(asctime)s, %(name)s, %(filename)s, '
-            '%(funcName)s[%(lineno)d], %(levelname)s, '
-            '%(message)s'
-        ),
-        handlers=[
-            logging.StreamHandler(stream=sys.stdout),
-            logging.FileHandler(f'{BASE_DIR}/outlook.log')
-        ]
+
+def worker_main(index):
+    """Обработчик номер index из нескольких, делящих пользователей."""
+    import log_config
+    import sharding
+
+    log_config.setup_logging(f'{BASE_DIR}/outlook.{index}.log')
+    leases = sharding.LeaseTable()
+    try:
+        run_bot(
+            sharding.Shard(leases),
+            metrics_port=metrics.METRICS_PORT and (
+                int(metrics.METRICS_PORT) + index
+            ),
+        )
+    finally:
+        leases.close()
+
+
+def run_bot(shard=None, metrics_port=metrics.METRICS_PORT):
+    """Запускает движок опроса для всех пользователей или доли shard."""
+    import asyncio
+
+    import commands
+    import delivery
+    import engine
+    import storage
+    import telegram
+    from telegram.utils.request import Request
+
+    # Отправки из очереди, длинный опрос команд и запросы сведений
+    # о чатах выполняются одновременно, каждому нужно своё соединение.
+    bot = telegram.Bot(
+        token=TELEGRAM_TOKEN,
+        request=Request(con_pool_size=delivery.MAX_CONCURRENT_SENDS + 2),
+    )
+    tenants = [engine.Tenant('default', PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)]
+    store = storage.StateStore(storage.STATE_DB)
+    poller = engine.Engine(
+        tenants, bot, store=store, shard=shard,
+        tenants_file=engine.TENANTS_FILE,
     )
+    poller.services.append(commands.CommandServer(bot).run)
+    if metrics_port:
+        metrics.register_engine(poller)
+        metrics.start_server(metrics_port)
+    try:
+        asyncio.run(run_engine(poller))
+    finally:
+        store.close()
+
+
+async def run_engine(poller):
+    """Запускает движок с обработкой сигналов остановки."""
+    poller.install_signal_handlers()
+    await poller.run()
+
+
+if __name__ == '__main__':
+    import log_config
+
+    log_config.setup_logging(f'{BASE_DIR}/outlook.log')
     main()
@@ -0,0 +1,129 @@
+"""Потоковый разбор списка работ из больших ответов API."""
+import codecs
+import json
+import re
+
+import exceptions
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+_decoder = json.JSONDecoder()
+
+
+class HomeworkStream:
+    """Итератор по работам из тела ответа, читаемого частями.
+
+    Разбирается только верхний уровень объекта ответа: элементы массива
+    homeworks отдаются по одному по мере чтения, остальные поля
+    (например, current_date) сохраняются в fields. В памяти находятся
+    только текущая работа и непрочитанный остаток фрагмента тела.
+    Формат ответа проверяется так же, как в homework.check_response,
+    сами работы проверяет validation.Validator.
+    """
+
+    def __init__(self, chunks, close=None):
+        self.chunks = iter(chunks)
+        self.close = close
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.fields = {}
+        self.count = 0
+        self.has_homeworks = False
+
+    def __iter__(self):
+        try:
+            yield from self.parse()
+        finally:
+            if self.close is not None:
+                self.close()
+
+    def get(self, key, default=None):
+        """Поле ответа вне списка работ, известное после его чтения."""
+        return self.fields.get(key, default)
+
+    def fill(self):
+        """Дочитывает следующий фрагмент тела; False в конце тела."""
+        if self.eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            self.buffer += self.decoder.decode(b'', final=True)
+            return False
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Следующий значащий символ или пустая строка в конце тела."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        """Пропускает один из ожидаемых разделителей и возвращает его."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                f'Некорректный JSON в ответе API: ожидался один из '
+                f'символов {chars!r}, получено {char!r}'
+            )
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Декодирует очередное значение, дочитывая тело при необходимости."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # Число в конце фрагмента может продолжаться в следующем.
+            if end < len(self.buffer) or not self.fill():
+                self.pos = end
+                return value
+
+    def parse(self):
+        """Отдаёт работы по одной, заполняя fields остальными полями."""
+        if self.peek() != '{':
+            raise TypeError('Ответ API отличен от словаря')
+        self.pos += 1
+        if self.peek() == '}':
+            self.pos += 1
+        else:
+            while True:
+                key = self.value()
+                self.expect(':')
+                if key == 'homeworks' and not self.has_homeworks:
+                    yield from self.homeworks()
+                else:
+                    self.fields[key] = self.value()
+                if self.expect(',}') == '}':
+                    break
+        if not self.has_homeworks:
+            raise exceptions.EmptyValuesFromAPI('Пустой ответ от API')
+
+    def homeworks(self):
+        """Отдаёт элементы массива homeworks."""
+        if self.peek() != '[':
+            raise TypeError('Список домашних работ не является списком')
+        self.pos += 1
+        self.has_homeworks = True
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            item = self.value()
+            self.count += 1
+            yield item
+            if self.expect(',]') == ']':
+                return
@@ -0,0 +1,112 @@
+"""Асинхронная запись логов с ротацией файлов и ограничением частоты."""
+import atexit
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import (
+    QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+)
+
+import settings
+
+LOG_FORMAT = (
+    '%(asctime)s, %(name)s, %(filename)s, '
+    '%(funcName)s[%(lineno)d], %(levelname)s, '
+    '%(message)s'
+)
+LOG_MAX_BYTES = int(settings.env('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(settings.env('LOG_BACKUP_COUNT', 5))
+# Ротация по времени (значение when для TimedRotatingFileHandler,
+# например 'midnight') вместо ротации по размеру.
+LOG_ROTATE_WHEN = settings.env('LOG_ROTATE_WHEN')
+LOG_RATE_LIMIT = int(settings.env('LOG_RATE_LIMIT', 10))
+LOG_RATE_INTERVAL = float(settings.env('LOG_RATE_INTERVAL', 60))
+LOG_QUEUE_SIZE = int(settings.env('LOG_QUEUE_SIZE', 10000))
+
+
+class RateLimitFilter(logging.Filter):
+    """Пропускает не больше limit одинаковых записей за interval секунд.
+
+    Записи сравниваются по шаблону сообщения, поэтому повторяющиеся
+    на каждом опросе строки ограничиваются независимо от аргументов.
+    Предупреждения и ошибки пропускаются всегда.
+    """
+
+    def __init__(self, limit=LOG_RATE_LIMIT, interval=LOG_RATE_INTERVAL,
+                 clock=time.monotonic):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self.clock = clock
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        now = self.clock()
+        key = (record.msg, record.levelno)
+        with self.lock:
+            started, count, suppressed = self.windows.get(key, (now, 0, 0))
+            if now - started >= self.interval:
+                started, count = now, 0
+            if count >= self.limit:
+                self.windows[key] = (started, count, suppressed + 1)
+                return False
+            self.windows[key] = (started, count + 1, 0)
+        if suppressed:
+            record.msg = (
+                f'{record.msg} (пропущено похожих записей: {suppressed})'
+            )
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """Передаёт запись в очередь без форматирования в вызывающем потоке."""
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Переполнение очереди не должно останавливать опрос.
+            pass
+
+
+def file_handler(path):
+    """Обработчик файла лога с ротацией по размеру или по времени."""
+    if LOG_ROTATE_WHEN:
+        return TimedRotatingFileHandler(
+            path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT,
+            encoding='utf-8',
+        )
+    return RotatingFileHandler(
+        path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8',
+    )
+
+
+def setup_logging(path, level=logging.INFO):
+    """Настраивает корневой логгер на запись через фоновый поток.
+
+    Возвращает запущенный QueueListener; он останавливается при выходе
+    из программы, дописав оставшиеся в очереди записи.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler(stream=sys.stdout), file_handler(path)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = LazyQueueHandler(records)
+    queue_handler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers[:] = [queue_handler]
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
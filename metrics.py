@@ -0,0 +1,302 @@
+"""Метрики бота в текстовом формате Prometheus."""
+import bisect
+import functools
+import logging
+import threading
+import time
+
+import settings
+
+METRICS_PORT = settings.env('METRICS_PORT')
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+DURATION_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05
+)
+
+
+def escape(value):
+    """Экранирует значение метки."""
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def labels(name, value):
+    """Текст меток для одной метки или пустая строка."""
+    if name is None:
+        return ''
+    return f'{{{name}="{escape(value)}"}}'
+
+
+class Counter:
+    """Счётчик с одной необязательной меткой."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, label=None):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, label_value=None, amount=1):
+        """Увеличивает счётчик."""
+        with self.lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def samples(self):
+        """Строки со значениями метрики."""
+        with self.lock:
+            values = list(self.values.items())
+        return [
+            f'{self.name}{labels(self.label, key)} {value}'
+            for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    """Значение, которое может как расти, так и уменьшаться."""
+
+    kind = 'gauge'
+
+    def set(self, value, label_value=None):
+        """Устанавливает значение."""
+        with self.lock:
+            self.values[label_value] = value
+
+    def remove(self, label_value=None):
+        """Убирает значение с меткой label_value из вывода."""
+        with self.lock:
+            self.values.pop(label_value, None)
+
+
+class AgeGauge(Gauge):
+    """Возраст события в секундах, вычисляемый в момент чтения метрик."""
+
+    def __init__(self, name, documentation, label=None, clock=time.time):
+        super().__init__(name, documentation, label)
+        self.clock = clock
+
+    def touch(self, label_value=None):
+        """Отмечает, что событие произошло сейчас."""
+        self.set(self.clock(), label_value)
+
+    def samples(self):
+        now = self.clock()
+        with self.lock:
+            values = list(self.values.items())
+        return [
+            f'{self.name}{labels(self.label, key)} {now - value:.3f}'
+            for key, value in values
+        ]
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, label=None):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label = label
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, label_value=None):
+        """Учитывает одно наблюдение."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = [
+                    [0] * (len(self.buckets) + 1), 0.0
+                ]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        """Строки с корзинами, суммой и числом наблюдений."""
+        lines = []
+        with self.lock:
+            series = [
+                (key, list(counts), total)
+                for key, (counts, total) in self.series.items()
+            ]
+        for key, counts, total in series:
+            prefix = '' if self.label is None else (
+                f'{self.label}="{escape(key)}",'
+            )
+            cumulative = 0
+            bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{self.name}_sum{labels(self.label, key)} {total}')
+            lines.append(
+                f'{self.name}_count{labels(self.label, key)} {cumulative}'
+            )
+        return lines
+
+    def time(self, label_value=None):
+        """Декоратор, замеряющий время выполнения функции."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - started, label_value)
+            return wrapper
+        return decorator
+
+
+class Registry:
+    """Набор метрик и функций, дописывающих строки при чтении."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        """Добавляет метрику и возвращает её."""
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Добавляет функцию, возвращающую строки метрик."""
+        self.collectors.append(collector)
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        for collector in self.collectors:
+            try:
+                lines.extend(collector())
+            except Exception as error:
+                logging.error('Ошибка сбора метрик: %s', error)
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+API_LATENCY = REGISTRY.register(Histogram(
+    'practicum_request_seconds',
+    'Время запроса к API Практикума.',
+    LATENCY_BUCKETS,
+))
+PARSE_DURATION = REGISTRY.register(Histogram(
+    'homework_parse_seconds',
+    'Время проверки ответа API и разбора статуса.',
+    DURATION_BUCKETS, label='function',
+))
+SEND_LATENCY = REGISTRY.register(Histogram(
+    'telegram_send_seconds',
+    'Время отправки сообщения в Telegram.',
+    LATENCY_BUCKETS,
+))
+ERRORS = REGISTRY.register(Counter(
+    'homework_errors_total',
+    'Исключения в цикле опроса по классам.',
+    label='exception',
+))
+LAST_SUCCESS = REGISTRY.register(AgeGauge(
+    'tenant_last_success_age_seconds',
+    'Секунды с последнего успешного опроса пользователя.',
+    label='tenant',
+))
+
+
+def count_error(error):
+    """Учитывает исключение по классу исходной ошибки.
+
+    request_api оборачивает любые ошибки в ConnectionError, поэтому
+    учитывается самое глубокое исключение в цепочке.
+    """
+    while error.__cause__ or error.__context__:
+        error = error.__cause__ or error.__context__
+    ERRORS.inc(type(error).__name__)
+
+
+def stats_collector(name, stats):
+    """Превращает словарь snapshot() в строки метрик-датчиков."""
+    def collect():
+        return [
+            f'{name}_{key} {value}'
+            for key, value in stats.snapshot().items()
+        ]
+    return collect
+
+
+def register_engine(engine):
+    """Добавляет к метрикам счётчики транспорта, кэша ответов и очередей."""
+    import change_detector
+    import transport
+
+    REGISTRY.add_collector(stats_collector(
+        'practicum_transport', transport.default_transport().stats
+    ))
+    REGISTRY.add_collector(stats_collector(
+        'practicum_responses', change_detector.STATS
+    ))
+
+    def collect_delivery():
+        if engine.queue is None:
+            return []
+        return stats_collector('telegram_delivery', engine.queue.stats)()
+
+    REGISTRY.add_collector(collect_delivery)
+    REGISTRY.add_collector(
+        stats_collector('telegram_outbox', engine.outbox.stats)
+    )
+
+
+def handler_class(registry):
+    """Класс обработчика, отдающего метрики по адресу /metrics.
+
+    http.server импортируется только при запуске сервера метрик.
+    """
+    from http import HTTPStatus
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            body = registry.render().encode()
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return MetricsHandler
+
+
+def start_server(port, host='0.0.0.0', registry=REGISTRY):
+    """Запускает HTTP сервер метрик в фоновом потоке."""
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, int(port)), handler_class(registry))
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    logging.info('Метрики доступны на порту %s', server.server_address[1])
+    return server
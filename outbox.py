@@ -0,0 +1,243 @@
+"""Очередь уведомлений между опросом API и отправкой в Telegram."""
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+import scheduler
+import settings
+import tracing
+import validation
+
+RETRY_BASE = float(settings.env('OUTBOX_RETRY_BASE', 5))
+RETRY_MAX = float(settings.env('OUTBOX_RETRY_MAX', 3600))
+MAX_ATTEMPTS = int(settings.env('OUTBOX_MAX_ATTEMPTS', 50))
+IDLE_INTERVAL = 1.0
+PARKED_RECHECK = 30.0
+
+
+class OutboxEvent(namedtuple('OutboxEvent', (
+    'key', 'tenant', 'chat_id', 'name', 'status', 'date_updated',
+    'attempts', 'next_attempt_at',
+))):
+    """Уведомление об изменении статуса работы, ожидающее отправки."""
+
+    __slots__ = ()
+
+
+def event_key(tenant_name, record):
+    """Ключ идемпотентности: одно уведомление на пользователя и статус."""
+    return (
+        f'{tenant_name}:{record.key}:{record.status}:{record.date_updated}'
+    )
+
+
+class OutboxStats:
+    """Счётчики отправленных, повторённых и отброшенных уведомлений."""
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+        self.sent = 0
+        self.retried = 0
+        self.dropped = 0
+
+    def snapshot(self):
+        """Возвращает копию счётчиков в виде словаря."""
+        return {
+            'pending': len(self.outbox.events),
+            'sent': self.sent,
+            'retried': self.retried,
+            'dropped': self.dropped,
+        }
+
+
+class Outbox:
+    """Уведомления, записанные при опросе и отправляемые отдельно.
+
+    Опрос только записывает уведомление (вместе со статусом работы и
+    курсором, в одной транзакции хранилища) и сразу сдвигает курсор.
+    run() отправляет уведомления через очередь движка и повторяет
+    неудачные с экспоненциально растущей паузой, поэтому недоступность
+    Telegram не замедляет опрос, а перезапуск не теряет уведомления.
+    Ключ идемпотентности не даёт записать одно уведомление дважды.
+
+    Повторы назначаются по часам движка clock, а в хранилище время
+    next_attempt_at записывается по настенным часам wall_clock: оно
+    должно оставаться верным и после перезапуска процесса.
+
+    Моменты отправки ожидающих уведомлений хранятся в
+    scheduler.TimerHeap, поэтому пробуждение run() не перебирает все
+    уведомления и не замедляется, пока копятся неотправленные.
+    """
+
+    def __init__(self, store=None, base_delay=RETRY_BASE,
+                 max_delay=RETRY_MAX, max_attempts=MAX_ATTEMPTS,
+                 clock=time.time, wall_clock=time.time):
+        self.store = store
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.events = {}
+        self.timers = scheduler.TimerHeap()
+        self.inflight = set()
+        self.changed = None
+        self.stats = OutboxStats(self)
+
+    def __len__(self):
+        return len(self.events)
+
+    def save(self, event):
+        """Записывает уведомление в хранилище по настенным часам."""
+        if self.store is None:
+            return
+        offset = self.wall_clock() - self.clock()
+        self.store.save_event(event._replace(
+            next_attempt_at=event.next_attempt_at + offset
+        ))
+
+    def put(self, tenant, record):
+        """Записывает уведомление; False, если оно уже записано."""
+        key = event_key(tenant.name, record)
+        if key in self.events:
+            return False
+        event = OutboxEvent(
+            key, tenant.name, tenant.chat_id, record.name, record.status,
+            record.date_updated, 0, self.clock(),
+        )
+        self.events[key] = event
+        self.timers.push(key, event.next_attempt_at)
+        self.save(event)
+        if self.changed is not None:
+            self.changed.set()
+        return True
+
+    def load(self, events, tenants=None):
+        """Добавляет уведомления из хранилища.
+
+        Если указаны имена tenants, уведомления этих пользователей в
+        памяти заменяются сохранёнными: их мог отправить другой
+        обработчик. Время next_attempt_at переводится с настенных часов
+        на часы движка.
+        """
+        offset = self.clock() - self.wall_clock()
+        if tenants is not None:
+            tenants = set(tenants)
+            for key, event in list(self.events.items()):
+                if event.tenant in tenants and key not in self.inflight:
+                    del self.events[key]
+                    self.timers.remove(key)
+        for row in events:
+            event = OutboxEvent(*row)
+            if event.key in self.events:
+                continue
+            event = event._replace(
+                next_attempt_at=event.next_attempt_at + offset
+            )
+            self.events[event.key] = event
+            self.timers.push(event.key, event.next_attempt_at)
+
+    def resume(self, tenants):
+        """Возвращает уведомлениям пользователей tenants их время отправки.
+
+        Вызывается, когда обработчик начинает опрашивать их токены:
+        отложенные до этого уведомления отправляются, не дожидаясь
+        PARKED_RECHECK.
+        """
+        tenants = set(tenants)
+        for key, event in self.events.items():
+            if event.tenant in tenants and key not in self.inflight:
+                self.timers.push(key, event.next_attempt_at)
+        if self.changed is not None:
+            self.changed.set()
+
+    def due(self, now, allowed=None):
+        """Забирает уведомления, время отправки которых наступило.
+
+        Забранные уведомления отмечаются отправляемыми. Уведомление,
+        которое allowed запрещает отправлять (его токен опрашивает
+        другой обработчик), проверяется снова через PARKED_RECHECK
+        секунд.
+        """
+        batch = []
+        for key in self.timers.pop_due(now):
+            event = self.events[key]
+            if allowed is None or allowed(event):
+                self.inflight.add(key)
+                batch.append(event)
+            else:
+                self.timers.push(key, now + PARKED_RECHECK)
+        return batch
+
+    def next_attempt(self):
+        """Ближайший момент отправки или None."""
+        return self.timers.earliest()
+
+    async def deliver(self, engine, event):
+        """Отправляет уведомление и удаляет его или назначает повтор."""
+        try:
+            with tracing.cycle('deliver', event.tenant):
+                with tracing.span('render'):
+                    message = validation.render(event)
+                with tracing.span('send'):
+                    delivered = await engine.notify(event.chat_id, message)
+        except Exception as error:
+            logging.error(
+                'Ошибка отправки уведомления %s: %s', event.key, error
+            )
+            delivered = False
+        finally:
+            self.inflight.discard(event.key)
+        if delivered:
+            self.events.pop(event.key, None)
+            self.stats.sent += 1
+            if self.store is not None:
+                self.store.delete_event(event.key)
+            return True
+        attempts = event.attempts + 1
+        if attempts >= self.max_attempts:
+            logging.error(
+                'Уведомление %s не отправлено за %d попыток, отбрасываем',
+                event.key, attempts,
+            )
+            self.events.pop(event.key, None)
+            self.stats.dropped += 1
+            if self.store is not None:
+                self.store.delete_event(event.key)
+            return False
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        event = event._replace(
+            attempts=attempts, next_attempt_at=self.clock() + delay
+        )
+        self.events[event.key] = event
+        self.timers.push(event.key, event.next_attempt_at)
+        self.stats.retried += 1
+        self.save(event)
+        return False
+
+    async def deliver_due(self, engine):
+        """Отправляет все наступившие уведомления; число отправленных."""
+        batch = self.due(self.clock(), engine.may_deliver)
+        results = await asyncio.gather(
+            *(self.deliver(engine, event) for event in batch)
+        )
+        return sum(results)
+
+    async def run(self, engine):
+        """Отправляет уведомления, пока движок не остановлен."""
+        self.changed = asyncio.Event()
+        tasks = set()
+        while not engine.stopping.is_set():
+            self.changed.clear()
+            for event in self.due(self.clock(), engine.may_deliver):
+                task = asyncio.ensure_future(self.deliver(engine, event))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            timeout = IDLE_INTERVAL
+            next_attempt = self.next_attempt()
+            if next_attempt is not None:
+                timeout = min(timeout, max(next_attempt - self.clock(), 0))
+            await engine.sleep(self.changed, timeout)
+        if tasks:
+            await asyncio.gather(*tasks)
@@ -0,0 +1,200 @@
+"""Адаптивное расписание опроса API без накопления дрейфа."""
+import bisect
+import heapq
+import itertools
+import math
+import random
+
+# Множители базового интервала RETRY_TIME для статусов из VERDICTS:
+# работу на ревью опрашиваем чаще, принятую — реже.
+STATUS_FACTORS = {
+    'reviewing': 0.2,
+    'rejected': 1.0,
+    'approved': 2.0,
+}
+DEFAULT_FACTOR = 1.0
+MAX_BACKOFF_EXPONENT = 3
+JITTER = 0.1
+# Метка перенесённой или удалённой записи TimerHeap.
+REMOVED = object()
+
+
+class PollSchedule:
+    """Расписание опросов одного пользователя.
+
+    Моменты опроса отсчитываются от предыдущего запланированного
+    момента, а не от конца опроса, поэтому время запроса и отправки
+    не сдвигает период. Интервал зависит от множителя последних
+    известных статусов работ и числа ошибок подряд, к каждому моменту
+    добавляется случайный сдвиг, чтобы пользователи не опрашивали API
+    одновременно.
+    """
+
+    __slots__ = (
+        'base', 'anchor', 'factor', 'errors', 'jitter', 'random',
+        'not_before',
+    )
+
+    def __init__(self, base, jitter=JITTER, rand=random.random):
+        self.base = base
+        self.anchor = None
+        self.factor = DEFAULT_FACTOR
+        self.errors = 0
+        self.jitter = jitter
+        self.random = rand
+        self.not_before = None
+
+    def record_success(self, statuses=()):
+        """Учитывает успешный опрос и статусы полученных работ."""
+        self.errors = 0
+        factor = min(
+            (STATUS_FACTORS.get(status, DEFAULT_FACTOR)
+             for status in statuses),
+            default=None,
+        )
+        if factor is not None:
+            self.factor = factor
+
+    def record_error(self):
+        """Учитывает неудачный опрос."""
+        self.errors += 1
+
+    def postpone(self, until, spread):
+        """Откладывает опрос до until плюс случайная доля spread секунд.
+
+        Так пользователи, ожидавшие восстановления API, возвращаются
+        к опросу не одновременно.
+        """
+        self.not_before = until + spread * self.random()
+
+    def interval(self):
+        """Интервал до следующего опроса без учёта случайного сдвига."""
+        interval = self.base * self.factor
+        if self.errors:
+            interval *= 2 ** min(self.errors, MAX_BACKOFF_EXPONENT)
+        return interval
+
+    def start(self, now, spread=0.0):
+        """Назначает первый опрос не позже чем через spread секунд."""
+        self.anchor = now + spread * self.random()
+        return self.anchor
+
+    def next_deadline(self, now):
+        """Возвращает момент следующего опроса по монотонным часам."""
+        interval = self.interval()
+        if self.anchor is None or interval <= 0:
+            self.anchor = now
+            return now + max(interval, 0)
+        self.anchor += interval
+        if self.anchor <= now:
+            missed = math.floor((now - self.anchor) / interval) + 1
+            self.anchor += missed * interval
+        shift = interval * self.jitter * (2 * self.random() - 1)
+        deadline = max(now, self.anchor + shift)
+        if self.not_before is not None:
+            deadline = max(deadline, self.not_before)
+            self.not_before = None
+        return deadline
+
+    def idle_deadlines(self, now, until):
+        """Моменты опросов, пока статусы и ошибки не меняются.
+
+        Как повторные next_deadline(предыдущий момент), начиная с now,
+        до первого момента не раньше until, но пачкой, без пересчёта
+        интервала на каждом шаге; используется моделью simulation.
+        Если опрос отложен postpone(), возвращается один момент.
+        """
+        interval = self.interval()
+        postponed = self.not_before is not None
+        first = self.next_deadline(now)
+        if first >= until or postponed or interval <= 0:
+            return [first]
+        if self.jitter >= 0.5:
+            deadlines = [first]
+            while deadlines[-1] < until:
+                deadlines.append(self.next_deadline(deadlines[-1]))
+            return deadlines
+        # При сдвиге меньше половины интервала моменты идут по порядку
+        # и не упираются в предыдущий, поэтому считаются формулой.
+        anchor = self.anchor
+        spread = interval * self.jitter
+        rand = self.random
+        count = math.ceil((until - anchor + spread) / interval)
+        deadlines = [first]
+        deadlines.extend(
+            anchor + step * interval + spread * (2 * rand() - 1)
+            for step in range(1, count + 1)
+        )
+        last = bisect.bisect_left(deadlines, until)
+        del deadlines[last + 1:]
+        self.anchor = anchor + last * interval
+        return deadlines
+
+
+class TimerHeap:
+    """Моменты следующего опроса всех пользователей в одной куче.
+
+    push() назначает или переносит момент ключа, pop_due() забирает
+    наступившие, earliest() возвращает ближайший. Перенесённая или
+    удалённая запись не ищется в куче, а помечается и отбрасывается
+    при извлечении, поэтому каждая операция стоит O(log n). Когда
+    помеченных записей становится больше живых, куча пересобирается.
+    """
+
+    __slots__ = ('heap', 'entries', 'counter')
+
+    def __init__(self):
+        self.heap = []
+        self.entries = {}
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def push(self, key, deadline):
+        """Назначает ключу момент deadline вместо прежнего."""
+        self.remove(key)
+        entry = [deadline, next(self.counter), key]
+        self.entries[key] = entry
+        heapq.heappush(self.heap, entry)
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.compact()
+
+    def remove(self, key):
+        """Убирает ключ из кучи; False, если его там не было."""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[2] = REMOVED
+        return True
+
+    def deadline(self, key):
+        """Назначенный ключу момент или None."""
+        entry = self.entries.get(key)
+        return None if entry is None else entry[0]
+
+    def earliest(self):
+        """Ближайший назначенный момент или None для пустой кучи."""
+        heap = self.heap
+        while heap and heap[0][2] is REMOVED:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now):
+        """Забирает из кучи ключи, момент которых не позже now."""
+        due = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            _, _, key = heapq.heappop(heap)
+            if key is not REMOVED:
+                del self.entries[key]
+                due.append(key)
+        return due
+
+    def compact(self):
+        """Пересобирает кучу без помеченных записей."""
+        self.heap = [entry for entry in self.heap if entry[2] is not REMOVED]
+        heapq.heapify(self.heap)
@@ -0,0 +1,71 @@
+"""Настройки бота из переменных окружения и файла .env."""
+import os
+from collections import namedtuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENV_FILE = os.path.join(BASE_DIR, '.env')
+
+_dotenv = None
+
+
+def dotenv_values():
+    """Значения из файла .env, прочитанные один раз.
+
+    В отличие от load_dotenv, os.environ не изменяется: переменные
+    окружения процесса имеют приоритет над файлом.
+    """
+    global _dotenv
+    if _dotenv is None:
+        if os.path.exists(ENV_FILE):
+            from dotenv import dotenv_values as read_env_file
+
+            _dotenv = {
+                key: value for key, value in read_env_file(ENV_FILE).items()
+                if value is not None
+            }
+        else:
+            _dotenv = {}
+    return _dotenv
+
+
+def env(name, default=None):
+    """Значение переменной из окружения, затем из .env, иначе default."""
+    value = os.environ.get(name)
+    if value is None:
+        value = dotenv_values().get(name, default)
+    return value
+
+
+class Settings(namedtuple('Settings', (
+    'practicum_token', 'telegram_token', 'telegram_chat_id',
+    'endpoint', 'retry_time', 'base_dir',
+))):
+    """Неизменяемые основные настройки бота."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_env(cls):
+        """Читает настройки из окружения и .env."""
+        return cls(
+            practicum_token=env('PRACTICUM_TOKEN'),
+            telegram_token=env('TELEGRAM_TOKEN'),
+            telegram_chat_id=env('TELEGRAM_CHAT_ID'),
+            endpoint=env(
+                'PRACTICUM_ENDPOINT',
+                'https://practicum.yandex.ru/api/user_api/homework_statuses/',
+            ),
+            retry_time=int(env('RETRY_TIME', 600)),
+            base_dir=BASE_DIR,
+        )
+
+
+_settings = None
+
+
+def get():
+    """Настройки процесса, прочитанные при первом обращении."""
+    global _settings
+    if _settings is None:
+        _settings = Settings.from_env()
+    return _settings
@@ -0,0 +1,275 @@
+"""Распределение пользователей между процессами-обработчиками.
+
+Токены Практикума распределяются между живыми обработчиками
+согласованным хэшированием. Обработчики отмечаются в таблице аренд
+SQLite: запись обработчика и его аренды токенов продлеваются каждые
+HEARTBEAT_INTERVAL секунд и истекают через LEASE_TTL секунд, если
+процесс завершился. Токен опрашивает только держатель его аренды,
+поэтому при запуске и остановке обработчиков токены переходят между
+ними без двойного опроса.
+"""
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import settings
+import storage
+
+WORKERS = int(settings.env('WORKERS', 1))
+SHARD_DB = settings.env('SHARD_DB', storage.STATE_DB)
+LEASE_TTL = float(settings.env('SHARD_LEASE_TTL', 15))
+HEARTBEAT_INTERVAL = float(settings.env('SHARD_HEARTBEAT_INTERVAL', 5))
+REPLICAS = 64
+COMMANDS_KEY = 'commands'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS shard_workers (
+    worker TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shard_leases (
+    key TEXT PRIMARY KEY,
+    worker TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+'''
+
+
+def digest(value):
+    """64-битный хэш строки для кольца."""
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+def shard_key(practicum_token):
+    """Ключ токена в таблице аренд; сам токен в базу не пишется."""
+    return 'token:' + hashlib.blake2b(
+        practicum_token.encode(), digest_size=8
+    ).hexdigest()
+
+
+class HashRing:
+    """Кольцо согласованного хэширования с виртуальными узлами.
+
+    При добавлении или удалении обработчика переходит только доля
+    ключей, приходившаяся на него.
+    """
+
+    def __init__(self, members, replicas=REPLICAS):
+        points = sorted(
+            (digest(f'{member}#{replica}'), member)
+            for member in members for replica in range(replicas)
+        )
+        self.hashes = [point for point, _ in points]
+        self.members = [member for _, member in points]
+
+    def owner(self, key):
+        """Обработчик, которому принадлежит ключ, или None."""
+        if not self.hashes:
+            return None
+        index = bisect.bisect(self.hashes, digest(key)) % len(self.hashes)
+        return self.members[index]
+
+
+class LeaseTable:
+    """Аренды обработчиков и токенов в общей базе SQLite."""
+
+    def __init__(self, path=SHARD_DB, worker=None, ttl=LEASE_TTL,
+                 clock=time.time):
+        self.worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def heartbeat(self, keys, release=()):
+        """Продлевает аренды и захватывает свободные ключи своей доли.
+
+        Ключи release, больше не принадлежащие обработчику по кольцу,
+        освобождаются; остальные такие ключи продлеваются до следующего
+        вызова, чтобы текущий опрос успел завершиться. Возвращает пару
+        (захваченные ключи своей доли, ключи, ожидающие освобождения).
+        """
+        now = self.clock()
+        expires_at = now + self.ttl
+        with self.lock:
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.execute(
+                    'INSERT OR REPLACE INTO shard_workers VALUES (?, ?)',
+                    (self.worker, expires_at),
+                )
+                connection.execute(
+                    'DELETE FROM shard_workers WHERE expires_at < ?', (now,)
+                )
+                connection.execute(
+                    'DELETE FROM shard_leases WHERE expires_at < ?', (now,)
+                )
+                ring = HashRing(
+                    row[0] for row in
+                    connection.execute('SELECT worker FROM shard_workers')
+                )
+                holders = dict(
+                    connection.execute('SELECT key, worker FROM shard_leases')
+                )
+                owned, draining = set(), set()
+                for key in keys:
+                    holder = holders.get(key)
+                    if ring.owner(key) == self.worker:
+                        if holder not in (None, self.worker):
+                            continue
+                        owned.add(key)
+                    elif holder != self.worker:
+                        continue
+                    elif key in release:
+                        connection.execute(
+                            'DELETE FROM shard_leases WHERE key = ?', (key,)
+                        )
+                        continue
+                    else:
+                        draining.add(key)
+                    connection.execute(
+                        'INSERT OR REPLACE INTO shard_leases VALUES (?, ?, ?)',
+                        (key, self.worker, expires_at),
+                    )
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        return owned, draining
+
+    def release(self):
+        """Освобождает все аренды обработчика при остановке."""
+        with self.lock:
+            with self.connection:
+                self.connection.execute(
+                    'DELETE FROM shard_leases WHERE worker = ?', (self.worker,)
+                )
+                self.connection.execute(
+                    'DELETE FROM shard_workers WHERE worker = ?',
+                    (self.worker,),
+                )
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        self.connection.close()
+
+
+class Shard:
+    """Доля токенов обработчика, обновляемая фоновой задачей движка."""
+
+    def __init__(self, leases, interval=HEARTBEAT_INTERVAL,
+                 clock=time.time):
+        self.leases = leases
+        self.interval = interval
+        self.clock = clock
+        self.owned = set()
+        self.draining = set()
+        self.valid_until = 0.0
+
+    def owns(self, key):
+        """Принадлежит ли ключ обработчику по действующей аренде."""
+        return key in self.owned and self.clock() < self.valid_until
+
+    def owns_tenant(self, tenant):
+        """Опрашивает ли обработчик токен пользователя."""
+        return self.owns(shard_key(tenant.practicum_token))
+
+    async def run(self, engine):
+        """Обновляет аренды, пока движок работает, и освобождает их."""
+        try:
+            while not engine.stopping.is_set():
+                await self.sync(engine)
+                await engine.sleep(engine.stopping, self.interval)
+        finally:
+            self.owned = set()
+            await engine.save()
+            await engine.call(self.leases.release)
+
+    async def sync(self, engine):
+        """Продлевает аренды и сообщает движку о захваченных токенах."""
+        leaders = {
+            shard_key(token): group[0]
+            for token, group in engine.subscribers.items()
+        }
+        release = {
+            key for key in self.draining
+            if key not in leaders or leaders[key].name not in engine.busy
+        }
+        if release:
+            await engine.save()
+        started = self.clock()
+        try:
+            owned, self.draining = await engine.call(
+                self.leases.heartbeat, [*leaders, COMMANDS_KEY], release
+            )
+        except Exception as error:
+            logging.error('Не удалось обновить аренды: %s', error)
+            return
+        acquired = owned - self.owned
+        # Токены без перечитанного состояния нельзя опрашивать, а их
+        # уведомления — отправлять: уведомления прежнего обработчика
+        # ушли бы повторно. Поэтому они считаются своими только после
+        # engine.acquire().
+        pending = {key for key in acquired if key in leaders}
+        self.owned = owned - pending
+        self.valid_until = started + self.leases.ttl
+        if acquired or release:
+            logging.info(
+                'Обработчик %s: токенов %d, получено %d, передано %d',
+                self.leases.worker, len(owned), len(acquired), len(release),
+            )
+        if not pending:
+            return
+        try:
+            await engine.acquire([leaders[key] for key in pending])
+        except Exception as error:
+            # Следующая синхронизация получит токены заново.
+            logging.error('Не удалось принять токены: %s', error)
+            return
+        self.owned = self.owned | pending
+
+
+def supervise(count, target, interval=1.0):
+    """Запускает count процессов target(номер) и перезапускает упавшие.
+
+    SIGTERM и SIGINT завершают обработчики, те освобождают аренды.
+    """
+    import multiprocessing
+    import signal
+
+    context = multiprocessing.get_context('spawn')
+    stopping = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stopping.set())
+    processes = {}
+    while not stopping.is_set():
+        for index in range(count):
+            process = processes.get(index)
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                logging.warning(
+                    'Обработчик %d завершился с кодом %s, перезапускаем',
+                    index, process.exitcode,
+                )
+            processes[index] = context.Process(
+                target=target, args=(index,), name=f'worker-{index}'
+            )
+            processes[index].start()
+        stopping.wait(interval)
+    for process in processes.values():
+        process.terminate()
+    for process in processes.values():
+        process.join()
@@ -0,0 +1,260 @@
+"""Моделирование опроса API в виртуальном времени.
+
+    python simulation.py --tenants 100000 --days 1
+
+Модуль даёт два инструмента. run_virtual() выполняет движок
+engine.Engine в цикле asyncio с виртуальными часами: когда все
+корутины ждут, время перескакивает к ближайшему таймеру, поэтому
+сценарии из часов опроса проходят за миллисекунды и повторяются
+одинаково. simulate() — дискретно-событийная модель расписания для
+10^5 пользователей: смены статусов работ генерируются моделью ревью,
+моменты опроса считает scheduler.PollSchedule, а в отчёт попадают
+число опросов, нагрузка на API и задержка уведомлений.
+"""
+import argparse
+import asyncio
+import heapq
+import math
+import random
+import selectors
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import Executor, Future
+
+import engine
+import scheduler
+
+DAY = 24 * 60 * 60
+# Модель ревью: сколько работ в день сдаёт пользователь, сколько часов
+# в среднем длится ревью и исправление, какая доля работ возвращается.
+SUBMISSIONS_PER_DAY = 0.3
+REVIEW_HOURS = 12.0
+FIX_HOURS = 24.0
+REJECT_SHARE = 0.4
+
+
+class VirtualClock:
+    """Виртуальные часы: время идёт только по команде цикла."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    """Селектор, который вместо ожидания сдвигает виртуальные часы.
+
+    Готовые события возвращаются сразу; если их нет, цикл asyncio
+    ждал бы timeout секунд до ближайшего таймера — часы сдвигаются
+    на это время без реального ожидания.
+    """
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        ready = super().select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            return super().select(None)
+        self.clock.now += timeout
+        return ready
+
+
+class VirtualLoop(asyncio.SelectorEventLoop):
+    """Цикл asyncio, время которого берётся из VirtualClock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        super().__init__(VirtualSelector(clock))
+
+    def time(self):
+        return self.clock.now
+
+
+class InlineExecutor(Executor):
+    """Пул, выполняющий функцию сразу в потоке цикла.
+
+    Без настоящих потоков порядок событий в виртуальном времени
+    не зависит от планировщика ОС.
+    """
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+        return future
+
+
+def run_virtual(coroutine, clock=None):
+    """Выполняет корутину в виртуальном времени и возвращает результат.
+
+    Движок для такого запуска создаётся с clock=clock и
+    executor=InlineExecutor().
+    """
+    loop = VirtualLoop(clock or VirtualClock())
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def homework_changes(rand, duration, submissions=SUBMISSIONS_PER_DAY,
+                     review_hours=REVIEW_HOURS, fix_hours=FIX_HOURS,
+                     reject_share=REJECT_SHARE):
+    """Смены статусов работ одного пользователя за duration секунд.
+
+    Работы сдаются пуассоновским потоком, ревью и исправление длятся
+    случайное время с экспоненциальным распределением. Возвращает
+    отсортированный список (момент, номер работы, статус).
+    """
+    changes = []
+    submitted = 0.0
+    number = 0
+    while True:
+        submitted += rand.expovariate(submissions / DAY)
+        if submitted >= duration:
+            break
+        moment = submitted
+        while moment < duration:
+            changes.append((moment, number, 'reviewing'))
+            moment += rand.expovariate(1 / (review_hours * 3600))
+            if moment >= duration:
+                break
+            if rand.random() >= reject_share:
+                changes.append((moment, number, 'approved'))
+                break
+            changes.append((moment, number, 'rejected'))
+            moment += rand.expovariate(1 / (fix_hours * 3600))
+        number += 1
+    changes.sort()
+    return changes
+
+
+class Report(namedtuple('Report', (
+    'tenants', 'days', 'polls', 'changes', 'mean_rps', 'peak_rps',
+    'delay_mean', 'delay_p50', 'delay_p95', 'delay_max', 'wall_seconds',
+))):
+    """Итоги моделирования."""
+
+    __slots__ = ()
+
+    def format(self):
+        """Отчёт в несколько строк."""
+        return '\n'.join((
+            f'пользователей: {self.tenants}, дней: {self.days:g}, '
+            f'расчёт {self.wall_seconds:.2f} с',
+            f'опросов: {self.polls} '
+            f'({self.polls / self.tenants / self.days:.1f} '
+            'на пользователя в день)',
+            f'нагрузка на API: в среднем {self.mean_rps:.1f} запросов/с, '
+            f'пик за минуту {self.peak_rps:.1f} запросов/с',
+            f'смен статусов: {self.changes}, задержка уведомления: '
+            f'средняя {self.delay_mean:.0f} с, '
+            f'медиана {self.delay_p50:.0f} с, '
+            f'95% {self.delay_p95:.0f} с, максимум {self.delay_max:.0f} с',
+        ))
+
+
+def percentile(ordered, share):
+    """Значение доли share отсортированного списка или 0."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def simulate(tenants, days, retry_time=600, seed=0,
+             make_schedule=scheduler.PollSchedule):
+    """Моделирует опрос tenants пользователей в течение days дней.
+
+    Каждый пользователь опрашивается по своему make_schedule(retry_time)
+    так же, как в engine.Engine: первый опрос распределяется по
+    startup-окну, после опроса расписание получает статусы работ.
+    Задержка уведомления — время от смены статуса до опроса, который
+    её увидел. Возвращает Report.
+    """
+    started = time.perf_counter()
+    rand = random.Random(seed)
+    duration = days * DAY
+    changes = [homework_changes(rand, duration) for _ in range(tenants)]
+    positions = [0] * tenants
+    statuses = [{} for _ in range(tenants)]
+    schedules = []
+    spread = min(retry_time, tenants / engine.STARTUP_RATE)
+    heap = []
+    for index in range(tenants):
+        schedule = make_schedule(retry_time, rand=rand.random)
+        schedules.append(schedule)
+        heap.append((schedule.start(0.0, spread), index))
+    heapq.heapify(heap)
+    load = [0] * (math.ceil(duration / 60) + 1)
+    delays = []
+    polls = 0
+    while heap[0][0] < duration:
+        now, index = heap[0]
+        polls += 1
+        load[int(now // 60)] += 1
+        schedule = schedules[index]
+        pending = changes[index]
+        position = positions[index]
+        if position < len(pending) and pending[position][0] <= now:
+            known = statuses[index]
+            while position < len(pending) and pending[position][0] <= now:
+                moment, number, status = pending[position]
+                delays.append(now - moment)
+                known[number] = status
+                position += 1
+            positions[index] = position
+            schedule.record_success(known.values())
+        # Опросы до следующей смены статуса ничего не меняют: их
+        # моменты считаются пачкой, в кучу попадает только последний.
+        until = pending[position][0] if position < len(pending) else duration
+        deadlines = schedule.idle_deadlines(now, until)
+        last = deadlines[-1]
+        for deadline in deadlines[:-1]:
+            load[int(deadline // 60)] += 1
+        polls += len(deadlines) - 1
+        heapq.heapreplace(heap, (last, index))
+    delays.sort()
+    return Report(
+        tenants=tenants,
+        days=days,
+        polls=polls,
+        changes=len(delays),
+        mean_rps=polls / duration,
+        peak_rps=max(load) / 60,
+        delay_mean=sum(delays) / len(delays) if delays else 0.0,
+        delay_p50=percentile(delays, 0.5),
+        delay_p95=percentile(delays, 0.95),
+        delay_max=delays[-1] if delays else 0.0,
+        wall_seconds=time.perf_counter() - started,
+    )
+
+
+def main(argv=None):
+    """Разбирает аргументы и печатает отчёт моделирования."""
+    parser = argparse.ArgumentParser(
+        description='Моделирование расписания опроса API.'
+    )
+    parser.add_argument('--tenants', type=int, default=100_000)
+    parser.add_argument('--days', type=float, default=1)
+    parser.add_argument('--retry-time', type=float, default=600)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = simulate(
+        args.tenants, args.days, retry_time=args.retry_time, seed=args.seed
+    )
+    print(report.format())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Индекс последних статусов домашних работ пользователя."""
+from collections import Counter
+
+import homework
+import validation
+
+
+def diff_all(indexes, records):
+    """Изменения статусов для нескольких индексов за один проход.
+
+    records — validation.HomeworkRecord; они перебираются один раз,
+    поэтому подходят и потоковые ответы. Для каждого индекса
+    возвращается список записей с новым статусом.
+    """
+    events = [{} for _ in indexes]
+    for record in records:
+        for index, changed in zip(indexes, events):
+            known = index.entries.get(record.key)
+            if (known is None or known.status != record.status
+                    or known.date_updated != record.date_updated):
+                changed.setdefault(record.key, record)
+    return [list(changed.values()) for changed in events]
+
+
+class HomeworkIndex:
+    """Последний статус и date_updated каждой работы пользователя.
+
+    diff_all() сравнивает только работы из очередного ответа API с их
+    записями в индексе, поэтому стоимость опроса не зависит от длины
+    истории. Изменения применяются к индексу вызовом add() в одной
+    транзакции с записью уведомления в outbox.
+
+    Работа хранится одной записью validation.HomeworkRecord, ключ
+    которой служит и ключом словаря; запись из ответа API сохраняется
+    как есть, а подписчики одного токена делят её между собой. Статусы
+    из хранилища заменяются членами homework.Status.
+    """
+
+    __slots__ = ('entries', 'counts')
+
+    def __init__(self, entries=None):
+        self.entries = {}
+        self.counts = Counter()
+        for key, (status, date_updated, name) in (entries or {}).items():
+            status = homework.STATUSES.get(status, status)
+            self.commit(key, status, date_updated, name)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, record):
+        """Запоминает отправленный статус записи HomeworkRecord."""
+        previous = self.entries.get(record.key)
+        if previous is not None:
+            self.counts[previous.status] -= 1
+        self.entries[record.key] = record
+        self.counts[record.status] += 1
+
+    def commit(self, key, status, date_updated=None, name=None):
+        """Запоминает отправленный статус работы."""
+        if name is None:
+            previous = self.entries.get(key)
+            name = key if previous is None else previous.name
+        self.add(validation.HomeworkRecord(key, name, status, date_updated))
+
+    def items(self):
+        """Тройки (название, статус, date_updated) всех работ."""
+        for record in self.entries.values():
+            yield record.name, record.status, record.date_updated
+
+    def status(self, key):
+        """Последний известный статус работы или None."""
+        record = self.entries.get(key)
+        return record and record.status
+
+    def active_statuses(self):
+        """Статусы, которые есть хотя бы у одной работы."""
+        return [status for status, count in self.counts.items() if count]
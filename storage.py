@@ -0,0 +1,254 @@
+"""Хранилище состояния опроса в SQLite с пакетной записью."""
+import logging
+import os
+import sqlite3
+import threading
+
+import homework
+import settings
+
+STATE_DB = settings.env(
+    'STATE_DB', os.path.join(homework.BASE_DIR, 'state.sqlite3')
+)
+FLUSH_INTERVAL = float(settings.env('STATE_FLUSH_INTERVAL', 5))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tenants (
+    name TEXT PRIMARY KEY,
+    current_timestamp INTEGER NOT NULL,
+    prev_message TEXT
+);
+CREATE TABLE IF NOT EXISTS homework_statuses (
+    tenant TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    date_updated TEXT,
+    homework_name TEXT,
+    PRIMARY KEY (tenant, homework)
+);
+CREATE TABLE IF NOT EXISTS status_history (
+    tenant TEXT NOT NULL,
+    homework_name TEXT,
+    status TEXT NOT NULL,
+    date_updated TEXT
+);
+CREATE INDEX IF NOT EXISTS status_history_tenant
+    ON status_history (tenant);
+CREATE TABLE IF NOT EXISTS outbox (
+    key TEXT PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    chat_id,
+    homework_name TEXT,
+    status TEXT NOT NULL,
+    date_updated TEXT,
+    attempts INTEGER NOT NULL,
+    next_attempt_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_tenant ON outbox (tenant);
+'''
+HISTORY_LIMIT = 10
+# Имён в одном запросе с фильтром по пользователям.
+MAX_PARAMETERS = 500
+
+
+class StateStore:
+    """Курсор from_date и последние отправленные статусы пользователей.
+
+    Изменения накапливаются в памяти и записываются одной транзакцией
+    при вызове flush(). База работает в режиме WAL, поэтому сбой
+    процесса оставляет её в состоянии последней завершённой записи.
+    Изменения внутри atomic() попадают в одну транзакцию целиком.
+    """
+
+    def __init__(self, path=STATE_DB):
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.migrate()
+        self.dirty_tenants = {}
+        self.dirty_statuses = {}
+        self.new_history = []
+        self.dirty_events = {}
+
+    def atomic(self):
+        """Контекст, изменения внутри которого не разделит flush()."""
+        return self.lock
+
+    def migrate(self):
+        """Добавляет колонки, появившиеся после создания базы."""
+        columns = {
+            row[1] for row in
+            self.connection.execute('PRAGMA table_info(homework_statuses)')
+        }
+        if 'homework_name' not in columns:
+            with self.connection:
+                self.connection.execute(
+                    'ALTER TABLE homework_statuses '
+                    'ADD COLUMN homework_name TEXT'
+                )
+
+    def load(self, tenants=None):
+        """Читает состояние всех или только указанных пользователей.
+
+        Возвращает словарь имя -> (current_timestamp, last_report,
+        {работа: (статус, date_updated, название)}); last_report —
+        отпечаток последнего отчёта об ошибке или, в базах прежних
+        версий, его текст.
+        """
+        with self.lock:
+            saved = {
+                name: (current_timestamp, last_report, {})
+                for name, current_timestamp, last_report
+                in self.select('SELECT * FROM tenants', 'name', tenants)
+            }
+            rows = self.select(
+                'SELECT tenant, homework, status, date_updated, homework_name '
+                'FROM homework_statuses', 'tenant', tenants,
+            )
+            for tenant, key, status, date_updated, name in rows:
+                if tenant in saved:
+                    saved[tenant][2][key] = (status, date_updated, name)
+        return saved
+
+    def select(self, query, column, names=None, order=''):
+        """Строки запроса, при names — только с column из names.
+
+        Имена передаются пачками, чтобы не превысить предел SQLite на
+        число параметров запроса.
+        """
+        if names is None:
+            return self.connection.execute(f'{query} {order}').fetchall()
+        names = list(dict.fromkeys(names))
+        rows = []
+        for start in range(0, len(names), MAX_PARAMETERS):
+            batch = names[start:start + MAX_PARAMETERS]
+            marks = ', '.join('?' * len(batch))
+            rows.extend(self.connection.execute(
+                f'{query} WHERE {column} IN ({marks}) {order}', batch
+            ))
+        return rows
+
+    def save_cursor(self, tenant, current_timestamp, last_report):
+        """Запоминает курсор и отпечаток последнего отчёта об ошибке."""
+        with self.lock:
+            self.dirty_tenants[tenant] = (
+                tenant, current_timestamp, last_report
+            )
+
+    def save_status(self, tenant, key, status, date_updated=None,
+                    homework_name=None):
+        """Запоминает отправленный статус работы и добавляет его в историю."""
+        with self.lock:
+            self.dirty_statuses[tenant, key] = (
+                tenant, key, status, date_updated, homework_name
+            )
+            self.new_history.append(
+                (tenant, homework_name or key, status, date_updated)
+            )
+
+    def save_event(self, event):
+        """Запоминает уведомление outbox.OutboxEvent."""
+        with self.lock:
+            self.dirty_events[event.key] = tuple(event)
+
+    def delete_event(self, key):
+        """Удаляет отправленное уведомление."""
+        with self.lock:
+            self.dirty_events[key] = None
+
+    def load_events(self, tenants=None):
+        """Неотправленные уведомления всех или указанных пользователей."""
+        with self.lock:
+            rows = {
+                row[0]: row for row in self.select(
+                    'SELECT * FROM outbox', 'tenant', tenants,
+                    'ORDER BY next_attempt_at',
+                )
+            }
+            for key, event in self.dirty_events.items():
+                rows.pop(key, None)
+                if event is not None:
+                    rows[key] = event
+        rows = list(rows.values())
+        if tenants is not None:
+            tenants = set(tenants)
+            rows = [row for row in rows if row[1] in tenants]
+        return rows
+
+    def history(self, tenant, limit=HISTORY_LIMIT):
+        """Последние отправленные статусы пользователя, новые первыми.
+
+        Возвращает список (название, статус, date_updated) с учётом
+        ещё не записанных изменений.
+        """
+        with self.lock:
+            pending = [
+                record[1:] for record in reversed(self.new_history)
+                if record[0] == tenant
+            ]
+            rows = self.connection.execute(
+                'SELECT homework_name, status, date_updated '
+                'FROM status_history WHERE tenant = ? '
+                'ORDER BY rowid DESC LIMIT ?',
+                (tenant, limit),
+            ).fetchall()
+        return (pending + rows)[:limit]
+
+    def flush(self):
+        """Записывает накопленные изменения одной транзакцией."""
+        with self.lock:
+            if not (self.dirty_tenants or self.dirty_statuses
+                    or self.dirty_events):
+                return 0
+            tenants = list(self.dirty_tenants.values())
+            statuses = list(self.dirty_statuses.values())
+            history = self.new_history
+            events = [
+                event for event in self.dirty_events.values()
+                if event is not None
+            ]
+            delivered = [
+                (key,) for key, event in self.dirty_events.items()
+                if event is None
+            ]
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO tenants VALUES (?, ?, ?)',
+                    tenants,
+                )
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO homework_statuses '
+                    '(tenant, homework, status, date_updated, homework_name) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    statuses,
+                )
+                self.connection.executemany(
+                    'INSERT INTO status_history VALUES (?, ?, ?, ?)',
+                    history,
+                )
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO outbox '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    events,
+                )
+                self.connection.executemany(
+                    'DELETE FROM outbox WHERE key = ?', delivered
+                )
+            self.dirty_events.clear()
+            self.dirty_tenants.clear()
+            self.dirty_statuses.clear()
+            self.new_history = []
+        logging.debug(
+            'Сохранено состояние: %d пользователей, %d статусов',
+            len(tenants), len(statuses),
+        )
+        return len(tenants) + len(statuses)
+
+    def close(self):
+        """Записывает изменения и закрывает базу."""
+        self.flush()
+        with self.lock:
+            self.connection.close()
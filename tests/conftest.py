@@ -1,9 +1,20 @@
 import sys
 from os.path import abspath, dirname
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 
 pytest_plugins = [
     'tests.fixtures.fixture_data'
 ]
+
+
+@pytest.fixture(autouse=True)
+def closed_breaker():
+    import breaker
+
+    breaker.PRACTICUM.reset()
+    yield
+    breaker.PRACTICUM.reset()
@@ -0,0 +1,127 @@
+import gzip
+import io
+import json
+
+import backfill
+import engine
+import homework
+import homework_stream
+
+DAY = 24 * 60 * 60
+
+
+def tenant(name='student'):
+    return engine.Tenant(name, 'token', 42, current_timestamp=0)
+
+
+def item(number, updated):
+    return {
+        'id': number,
+        'homework_name': f'hw{number}',
+        'status': 'approved',
+        'date_updated': updated,
+    }
+
+
+class FakeFetch:
+
+    def __init__(self, items, fail=()):
+        self.items = items
+        self.fail = set(fail)
+        self.calls = []
+
+    def __call__(self, tenant, since):
+        self.calls.append((tenant.name, since))
+        for record in self.items:
+            if tenant.name in self.fail:
+                raise ConnectionError('Произошёл сбой сети')
+            yield record
+
+
+def read_output(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def quiet(tenants):
+    return backfill.Throughput(len(tenants), stream=io.StringIO())
+
+
+class TestBackfill:
+
+    def test_one_request_per_tenant(self, tmp_path):
+        tenants = [tenant('student'), tenant('mentor')]
+        fetch = FakeFetch([item(1, '1970-01-02T00:00:00Z'), item(2, None)])
+        output = str(tmp_path / 'history.jsonl.gz')
+
+        failed = backfill.run(
+            tenants, DAY, output, fetch=fetch, workers=4,
+            report=quiet(tenants),
+        )
+
+        assert failed == 0
+        assert sorted(fetch.calls) == [('mentor', DAY), ('student', DAY)], (
+            'Для пользователя должен выполняться один запрос from_date=since'
+        )
+        records = read_output(output)
+        assert sorted(
+            (record['tenant'], record['id']) for record in records
+        ) == [('mentor', 1), ('mentor', 2), ('student', 1), ('student', 2)]
+
+    def test_interrupted_backfill_resumes(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(backfill.time, 'sleep', lambda seconds: None)
+        tenants = [tenant('student'), tenant('mentor')]
+        items = [item(1, '1970-01-01T12:00:00Z'), item(2, None)]
+        output = str(tmp_path / 'history.jsonl.gz')
+
+        fetch = FakeFetch(items, fail={'mentor'})
+        assert backfill.run(
+            tenants, 0, output, fetch=fetch, report=quiet(tenants)
+        ) == 1
+        assert fetch.calls.count(('mentor', 0)) == backfill.ATTEMPTS
+        assert {record['tenant'] for record in read_output(output)} == {
+            'student'
+        }, 'Оборванный ответ не должен попадать в выгрузку'
+
+        fetch = FakeFetch(items)
+        assert backfill.run(
+            tenants, 0, output, fetch=fetch, report=quiet(tenants)
+        ) == 0
+        assert fetch.calls == [('mentor', 0)], (
+            'Повторный запуск должен запрашивать только невыгруженных'
+        )
+        assert len(read_output(output)) == 4
+
+    def test_torn_tail_is_truncated(self, tmp_path):
+        tenants = [tenant()]
+        output = str(tmp_path / 'history.jsonl.gz')
+        backfill.run(
+            tenants, 0, output,
+            fetch=FakeFetch([item(1, '1970-01-01T12:00:00Z')]),
+            report=quiet(tenants),
+        )
+        with open(output, 'ab') as file:
+            file.write(b'\x1f\x8b\x08 torn')
+
+        backfill.run(
+            tenants, 0, output, fetch=FakeFetch([]), report=quiet(tenants)
+        )
+
+        assert [record['id'] for record in read_output(output)] == [1]
+
+    def test_fetch_tenant_streams_from_since(self, monkeypatch):
+        body = json.dumps({'homeworks': [
+            item(1, '1970-01-01T12:00:00Z'),
+            {'id': 3, 'homework_name': 'hw3', 'status': 'reviewing'},
+        ]}).encode()
+        requested = []
+
+        def stream_api(current_timestamp, headers):
+            requested.append(current_timestamp)
+            return homework_stream.HomeworkStream([body])
+
+        monkeypatch.setattr(homework, 'stream_api', stream_api)
+        records = list(backfill.fetch_tenant(tenant(), DAY))
+
+        assert requested == [DAY]
+        assert [record['id'] for record in records] == [1, 3]
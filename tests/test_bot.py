@@ -1,7 +1,6 @@
 import os
 from http import HTTPStatus
 
-import requests
 import telegram
 import utils
 
@@ -186,7 +185,7 @@ class TestHomework:
                 current_timestamp=current_timestamp, **kwargs
             )
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_requests_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -232,7 +231,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_500_response_get)
+        utils.patch_requests_get(monkeypatch, mock_500_response_get)
 
         import homework
 
@@ -315,7 +314,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_requests_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -352,7 +351,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_requests_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -400,7 +399,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_requests_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -448,7 +447,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_requests_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -484,7 +483,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_no_homeworks_response_get)
+        utils.patch_requests_get(monkeypatch, mock_no_homeworks_response_get)
 
         import homework
 
@@ -525,7 +524,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_requests_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -565,7 +564,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_requests_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -599,7 +598,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_empty_response_get)
+        utils.patch_requests_get(monkeypatch, mock_empty_response_get)
 
         import homework
 
@@ -626,7 +625,7 @@ class TestHomework:
             )
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_requests_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -0,0 +1,125 @@
+import types
+
+import pytest
+
+import breaker
+import exceptions
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, **options):
+    options.setdefault('threshold', 2)
+    return breaker.CircuitBreaker(
+        base_delay=10, max_delay=100, probe_wait=5, clock=clock,
+        rand=lambda: 1.0, **options
+    )
+
+
+def response(status_code, headers=None):
+    return types.SimpleNamespace(
+        status_code=status_code, headers=headers or {}
+    )
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold(self):
+        clock = Clock()
+        switch = make_breaker(clock)
+        switch.record_failure()
+        switch.before_call()
+        switch.record_failure()
+        with pytest.raises(exceptions.CircuitBreakerOpen) as error:
+            switch.before_call()
+        assert error.value.retry_at == 10
+        assert breaker.STATE.values[None] == 2
+
+    def test_single_probe_decides(self):
+        clock = Clock()
+        switch = make_breaker(clock, threshold=1)
+        switch.record_failure()
+        clock.now = 10
+        switch.before_call()
+        with pytest.raises(exceptions.CircuitBreakerOpen):
+            switch.before_call()
+        switch.record_success()
+        assert switch.state == breaker.CLOSED
+        switch.before_call()
+
+    def test_failed_probe_backs_off_exponentially(self):
+        clock = Clock()
+        switch = make_breaker(clock, threshold=1)
+        switch.record_failure()
+        clock.now = 10
+        switch.before_call()
+        switch.record_failure()
+        assert switch.open_until == 30, (
+            'После неудачного пробного запроса пауза должна удваиваться'
+        )
+
+    def test_failures_after_trip_do_not_reopen(self):
+        clock = Clock()
+        switch = make_breaker(clock, threshold=1)
+        switch.record_failure()
+        assert switch.open_until == 10
+        clock.now = 3
+        for _ in range(64):
+            switch.record_failure()
+        assert switch.open_until == 10, (
+            'Ошибки запросов, начатых до размыкания, не должны продлевать '
+            'паузу'
+        )
+        assert switch.openings == 1
+        assert switch.failures == 65
+
+    def test_backoff_exponent_is_bounded(self):
+        switch = breaker.CircuitBreaker(
+            threshold=1, base_delay=10, max_delay=float('inf'),
+            clock=Clock(), rand=lambda: 1.0,
+        )
+        switch.openings = 5000
+        switch.record_failure()
+        assert switch.open_until == 10 * 2 ** breaker.MAX_EXPONENT
+
+    def test_retry_after_is_respected(self):
+        clock = Clock()
+        switch = make_breaker(clock, threshold=5)
+        switch.record_response(response(429, {'Retry-After': '42'}))
+        assert switch.state == breaker.OPEN
+        assert switch.open_until == 42
+
+    def test_switching_clock_keeps_remaining_delay(self):
+        switch = make_breaker(Clock(), threshold=1)
+        switch.record_failure()
+        virtual = Clock()
+        virtual.now = 1000.0
+        switch.set_clock(virtual)
+        with pytest.raises(exceptions.CircuitBreakerOpen) as error:
+            switch.before_call()
+        assert error.value.retry_at == 1010, (
+            'retry_at должен быть в единицах новых часов'
+        )
+        virtual.now = 1010
+        switch.before_call()
+
+    def test_client_errors_do_not_count(self):
+        switch = make_breaker(Clock(), threshold=1)
+        switch.record_response(response(401))
+        assert switch.state == breaker.CLOSED
+
+
+def test_parse_retry_after():
+    assert breaker.parse_retry_after('120') == 120
+    assert breaker.parse_retry_after(
+        'Thu, 01 Jan 1970 00:01:40 GMT', now=40
+    ) == 60
+    assert breaker.parse_retry_after('junk') is None
+    assert breaker.parse_retry_after(None) is None
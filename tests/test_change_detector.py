@@ -0,0 +1,73 @@
+from http import HTTPStatus
+
+import pytest
+
+import change_detector
+import homework
+
+
+class MockResponse:
+
+    def __init__(self, body, status_code=HTTPStatus.OK, headers=None):
+        self.content = body
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.reason = ''
+        self.text = body.decode()
+
+
+@pytest.fixture
+def detector():
+    return change_detector.ChangeDetector(
+        stats=change_detector.DetectorStats()
+    )
+
+
+class TestChangeDetector:
+
+    def test_same_homeworks_are_skipped(self, detector):
+        first = MockResponse(b'{"homeworks": [], "current_date": 1}')
+        second = MockResponse(b'{"homeworks": [], "current_date": 2}')
+
+        assert detector.decode(first) == {'homeworks': [], 'current_date': 1}
+        detector.commit()
+        assert detector.decode(second) is change_detector.UNCHANGED, (
+            'Ответ с тем же списком работ не должен разбираться повторно'
+        )
+        assert detector.stats.snapshot()['skipped'] == 1
+
+    def test_uncommitted_response_is_decoded_again(self, detector):
+        response = MockResponse(b'{"homeworks": [], "current_date": 1}')
+        detector.decode(response)
+        assert detector.decode(response) is not change_detector.UNCHANGED
+
+    def test_not_modified(self, detector):
+        response = MockResponse(
+            b'{"homeworks": []}', headers={'ETag': '"v1"'}
+        )
+        detector.decode(response)
+        detector.commit()
+        headers = detector.conditional_headers({'Authorization': 'OAuth t'})
+        assert headers['If-None-Match'] == '"v1"'
+
+        not_modified = MockResponse(b'', HTTPStatus.NOT_MODIFIED)
+        assert detector.decode(not_modified) is change_detector.UNCHANGED
+        assert detector.stats.snapshot()['not_modified'] == 1
+
+    def test_error_status_raises(self, detector):
+        response = MockResponse(b'', HTTPStatus.INTERNAL_SERVER_ERROR)
+        with pytest.raises(Exception):
+            detector.decode(response)
+
+    def test_fetch_wraps_request_api(self, detector, monkeypatch):
+        calls = []
+
+        def request_api(current_timestamp, headers, decode=None):
+            calls.append((current_timestamp, headers, decode))
+            return {'homeworks': []}
+
+        monkeypatch.setattr(homework, 'request_api', request_api)
+        assert detector.fetch(5, {'Authorization': 'OAuth t'}) == {
+            'homeworks': []
+        }
+        assert calls[0][:2] == (5, {'Authorization': 'OAuth t'})
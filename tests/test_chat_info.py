@@ -0,0 +1,81 @@
+import threading
+import types
+
+import chat_info
+import homework
+
+
+class SlowBot:
+
+    def __init__(self):
+        self.sent = []
+        self.lookups = 0
+        self.release = threading.Event()
+
+    def send_message(self, chat_id=None, text=None):
+        self.sent.append((chat_id, text))
+
+    def get_chat(self, chat_id):
+        self.lookups += 1
+        self.release.wait(timeout=5)
+        return types.SimpleNamespace(username='student')
+
+
+class TestChatInfoCache:
+
+    def test_send_does_not_wait_for_chat_lookup(self, monkeypatch):
+        cache = chat_info.ChatInfoCache()
+        monkeypatch.setattr(chat_info, 'CACHE', cache)
+        bot = SlowBot()
+
+        assert homework.send_chat_message(bot, 1, 'текст')
+        assert bot.sent == [(1, 'текст')], (
+            'Сообщение должно отправляться без ожидания сведений о чате'
+        )
+        bot.release.set()
+        cache.executor.shutdown(wait=True)
+        assert cache.get(1) == 'student'
+        assert bot.lookups == 1
+
+    def test_entries_expire(self):
+        now = [0.0]
+        cache = chat_info.ChatInfoCache(ttl=10, clock=lambda: now[0])
+        cache.entries[1] = ('student', 10)
+        assert cache.describe(None, 1) == '@student'
+        now[0] = 11
+        assert cache.get(1) is chat_info.MISSING
+
+    def test_lookup_failure_is_cached(self):
+        now = [0.0]
+        cache = chat_info.ChatInfoCache(
+            clock=lambda: now[0], failure_ttl=60
+        )
+        cache.refresh(object(), 1)
+        assert cache.get(1) is None, 'Неудачный запрос должен кэшироваться'
+        assert cache.describe(None, 1) == 'чата 1'
+        assert not cache.pending
+        now[0] = 61
+        assert cache.get(1) is chat_info.MISSING
+
+    def test_chat_without_username_is_looked_up_once(self, monkeypatch):
+        cache = chat_info.ChatInfoCache()
+        monkeypatch.setattr(chat_info, 'CACHE', cache)
+        lookups = []
+
+        class GroupBot:
+
+            def send_message(self, chat_id=None, text=None):
+                pass
+
+            def get_chat(self, chat_id):
+                lookups.append(chat_id)
+                return types.SimpleNamespace(username=None)
+
+        bot = GroupBot()
+        homework.send_chat_message(bot, -100, 'текст')
+        cache.executor.shutdown(wait=True)
+        for _ in range(4):
+            homework.send_chat_message(bot, -100, 'текст')
+        assert lookups == [-100], (
+            'Чат без имени пользователя должен запрашиваться один раз'
+        )
@@ -0,0 +1,143 @@
+import asyncio
+import time
+import types
+
+import commands
+import engine
+import storage
+
+
+def update(update_id, chat_id, text):
+    message = types.SimpleNamespace(chat_id=chat_id, text=text)
+    return types.SimpleNamespace(
+        update_id=update_id, effective_message=message
+    )
+
+
+class FakeBot:
+
+    def __init__(self, updates):
+        self.batches = [[], list(updates)]
+
+    def get_updates(self, offset, limit, timeout):
+        time.sleep(0.05)
+        if self.batches:
+            return self.batches.pop(0)
+        return []
+
+
+def serve(tenant, updates, store=None, api_calls=None, others=()):
+    replies = []
+
+    def send(bot, chat_id, message):
+        replies.append((chat_id, message))
+        return True
+
+    def fetch(current_timestamp, headers):
+        api_calls.append(current_timestamp)
+        return {'homeworks': [], 'current_date': current_timestamp}
+
+    poller = engine.Engine(
+        [tenant, *others], bot=None, send=send, fetch=fetch, retry_time=600,
+        store=store,
+    )
+    server = commands.CommandServer(FakeBot(updates), timeout=0)
+    poller.services.append(server.run)
+
+    async def scenario():
+        task = asyncio.ensure_future(poller.run())
+        await asyncio.sleep(0.3)
+        poller.stop()
+        await task
+
+    asyncio.run(scenario())
+    return server, replies
+
+
+class TestCommandServer:
+
+    def test_status_is_served_from_index(self):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+        tenant.index.commit('7', 'reviewing', '2022-01-01', 'hw123')
+        api_calls = []
+        server, replies = serve(
+            tenant, [update(1, 42, '/status')], api_calls=api_calls
+        )
+
+        assert (42, 'hw123: Работа взята на проверку ревьюером.') in replies
+        assert len(api_calls) == 1, (
+            '/status должен отвечать из кэша без запроса к API'
+        )
+        assert len(server.latencies) == 1
+
+    def test_chat_with_several_tokens_gets_all(self):
+        student = engine.Tenant('student', 'a', 42, current_timestamp=1)
+        student.index.commit('7', 'reviewing', '2022-01-01', 'hw1')
+        other = engine.Tenant('other', 'b', 42, current_timestamp=1)
+        other.index.commit('8', 'approved', '2022-01-01', 'hw2')
+        api_calls = []
+        _, replies = serve(
+            student, [update(1, 42, '/status'), update(2, 42, '/refresh')],
+            api_calls=api_calls, others=[other],
+        )
+
+        status = replies[0][1]
+        assert 'student:\nhw1: ' in status and 'other:\nhw2: ' in status, (
+            'Чат, подписанный на несколько токенов, получает статусы всех'
+        )
+        assert len(api_calls) == 4, '/refresh должен опрашивать все токены'
+
+    def test_history_is_read_from_store(self, tmp_path):
+        store = storage.StateStore(str(tmp_path / 'state.sqlite3'))
+        store.save_status('student', '7', 'reviewing', '2022-01-01', 'hw123')
+        store.flush()
+        store.save_status('student', '7', 'approved', '2022-01-02', 'hw123')
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+
+        _, replies = serve(
+            tenant, [update(1, 42, '/history')], store=store, api_calls=[]
+        )
+
+        [(_, text)] = [reply for reply in replies if reply[0] == 42]
+        assert text.splitlines() == [
+            '2022-01-02 hw123: '
+            'Работа проверена: ревьюеру всё понравилось. Ура!',
+            '2022-01-01 hw123: Работа взята на проверку ревьюером.',
+        ]
+
+    def test_refresh_is_rate_limited(self):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+        api_calls = []
+        _, replies = serve(
+            tenant,
+            [update(1, 42, '/refresh'), update(2, 42, '/refresh')],
+            api_calls=api_calls,
+        )
+
+        assert len(api_calls) == 2, '/refresh должен запускать опрос'
+        assert replies[-1][1].startswith('Повторите запрос через')
+
+    def test_unknown_chat(self):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+        _, replies = serve(tenant, [update(1, 7, '/status')], api_calls=[])
+        assert replies == [(7, commands.UNKNOWN_CHAT)]
+
+    def test_failed_command_does_not_stop_engine(self, tmp_path):
+        class BrokenStore(storage.StateStore):
+
+            def history(self, tenant, limit=storage.HISTORY_LIMIT):
+                raise RuntimeError('database is locked')
+
+        store = BrokenStore(str(tmp_path / 'state.sqlite3'))
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+        server, replies = serve(
+            tenant,
+            [update(1, 42, '/history'), update(2, 42, '/status')],
+            store=store, api_calls=[],
+        )
+        assert (42, commands.COMMAND_FAILED) in replies, (
+            'Пользователь должен узнать, что команда не выполнена'
+        )
+        assert (42, commands.NO_HOMEWORKS) in replies, (
+            'Следующие команды должны обрабатываться после ошибки'
+        )
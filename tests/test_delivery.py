@@ -0,0 +1,87 @@
+import asyncio
+
+import delivery
+
+
+class Recorder:
+
+    def __init__(self, result=True):
+        self.result = result
+        self.sent = []
+
+    async def __call__(self, chat_id, text):
+        self.sent.append((chat_id, text))
+        return self.result
+
+
+def run_queue(send, submissions, **options):
+    async def scenario():
+        queue = delivery.DeliveryQueue(send, **options)
+        task = asyncio.ensure_future(queue.run())
+        futures = [
+            queue.submit(chat_id, text) for chat_id, text in submissions
+        ]
+        queue.close()
+        await task
+        return queue, [future.result() for future in futures]
+
+    return asyncio.run(scenario())
+
+
+class TestTokenBucket:
+
+    def test_rate_is_limited(self):
+        bucket = delivery.TokenBucket(rate=2, capacity=1, now=0)
+        assert bucket.delay(0) == 0
+        bucket.consume(0)
+        assert bucket.delay(0) == 0.5
+        assert bucket.delay(0.5) == 0
+
+
+class TestDeliveryQueue:
+
+    def test_messages_for_one_chat_are_merged(self):
+        send = Recorder()
+        queue, results = run_queue(
+            send, [(1, 'a'), (1, 'b'), (2, 'c')], window=0.05
+        )
+
+        assert results == [True, True, True]
+        assert sorted(send.sent) == [(1, 'a\n\nb'), (2, 'c')], (
+            'Сообщения одного чата в пределах окна должны объединяться'
+        )
+        stats = queue.stats.snapshot()
+        assert stats['sent'] == 2
+        assert stats['merged'] == 1
+        assert stats['depth'] == 0
+
+    def test_long_messages_are_split(self):
+        send = Recorder()
+        text = 'x' * (delivery.MAX_MESSAGE_LENGTH - 1)
+        run_queue(send, [(1, text), (1, text)], window=0, chat_rate=1000)
+        assert len(send.sent) == 2
+
+    def test_chat_rate_is_respected(self):
+        async def scenario():
+            queue = delivery.DeliveryQueue(
+                Recorder(), window=0, chat_rate=20, chat_burst=1
+            )
+            task = asyncio.ensure_future(queue.run())
+            await queue.submit(1, 'a')
+            started = queue.clock()
+            await queue.submit(1, 'b')
+            elapsed = queue.clock() - started
+            queue.close()
+            await task
+            return elapsed
+
+        assert asyncio.run(scenario()) >= 0.04, (
+            'Следующее сообщение в чат должно ждать токен'
+        )
+
+    def test_failed_send_is_reported(self):
+        queue, results = run_queue(
+            Recorder(result=False), [(1, 'a')], window=0
+        )
+        assert results == [False]
+        assert queue.stats.snapshot()['failed'] == 1
@@ -0,0 +1,521 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import engine
+import homework
+import homework_stream
+import metrics
+import simulation
+import storage
+import transport
+import validation
+
+
+HOMEWORK = {'homework_name': 'hw123', 'status': 'approved'}
+
+
+class FakeApi:
+
+    def __init__(self, homeworks, current_date=100):
+        self.homeworks = homeworks
+        self.current_date = current_date
+        self.calls = []
+
+    def __call__(self, current_timestamp, headers):
+        self.calls.append((current_timestamp, headers))
+        return {'homeworks': self.homeworks, 'current_date': self.current_date}
+
+
+class FakeSender:
+
+    def __init__(self, result=True):
+        self.result = result
+        self.messages = []
+
+    def __call__(self, bot, chat_id, message):
+        self.messages.append((chat_id, message))
+        return self.result
+
+
+def make_engine(tenants, fetch, send):
+    poller = engine.Engine(tenants, bot=None, fetch=fetch, send=send)
+    poller.executor = None
+    return poller
+
+
+def poll(poller, tenant):
+    """Опрос и отправка записанных в outbox уведомлений."""
+    async def scenario():
+        await poller.poll_once(tenant)
+        await poller.outbox.deliver_due(poller)
+    asyncio.run(scenario())
+
+
+class TestEngine:
+
+    def test_poll_once_sends_changed_status(self):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+        fetch, send = FakeApi([HOMEWORK]), FakeSender()
+        poller = make_engine([tenant], fetch, send)
+
+        poll(poller, tenant)
+        poll(poller, tenant)
+
+        assert fetch.calls[0] == (1, {'Authorization': 'OAuth token'}), (
+            'Запрос должен выполняться с заголовками пользователя'
+        )
+        assert len(send.messages) == 1, (
+            'Неизменившийся статус не должен отправляться повторно'
+        )
+        assert send.messages[0][0] == 42
+        assert 'hw123' in send.messages[0][1]
+        assert tenant.current_timestamp == 100
+
+    def test_all_homeworks_are_notified(self):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+        works = [
+            HOMEWORK,
+            {'homework_name': 'hw456', 'status': 'reviewing'},
+        ]
+        send = FakeSender()
+        poller = make_engine([tenant], FakeApi(works), send)
+
+        poll(poller, tenant)
+
+        assert len(send.messages) == 2, (
+            'Уведомление должно отправляться для каждой изменившейся работы'
+        )
+        assert tenant.index.status('hw456') == 'reviewing'
+
+    def test_failed_send_does_not_block_polling(self):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+        send = FakeSender(False)
+        poller = make_engine([tenant], FakeApi([HOMEWORK]), send)
+
+        poll(poller, tenant)
+        poll(poller, tenant)
+
+        assert tenant.current_timestamp == 100, (
+            'Курсор должен сдвигаться независимо от отправки уведомлений'
+        )
+        [event] = poller.outbox.events.values()
+        assert event.attempts == 1, (
+            'Неотправленное уведомление должно остаться в outbox для повтора'
+        )
+        assert len(send.messages) == 1
+
+    def test_full_history_is_streamed(self, monkeypatch):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=0)
+        requests = []
+
+        def stream_api(current_timestamp, headers):
+            requests.append(current_timestamp)
+            return homework_stream.HomeworkStream([
+                b'{"homeworks": [{"homework_name": "hw123", ',
+                b'"status": "approved"}], "current_date": 100}',
+            ])
+
+        monkeypatch.setattr(homework, 'stream_api', stream_api)
+        send = FakeSender()
+        poller = make_engine([tenant], None, send)
+
+        poll(poller, tenant)
+
+        assert requests == [0], (
+            'Запрос с from_date=0 должен разбираться потоково'
+        )
+        assert len(send.messages) == 1
+        assert tenant.current_timestamp == 100
+
+    def test_token_is_polled_once_for_all_subscribers(self):
+        chats = [
+            engine.Tenant(name, 'token', chat_id, current_timestamp=1)
+            for name, chat_id in (('student', 1), ('mentor', 2), ('group', 3))
+        ]
+        fetch, send = FakeApi([HOMEWORK]), FakeSender()
+        poller = make_engine(chats, fetch, send)
+
+        poll(poller, chats[0])
+
+        assert len(fetch.calls) == 1, (
+            'Токен должен опрашиваться один раз для всех подписчиков'
+        )
+        assert sorted(chat_id for chat_id, _ in send.messages) == [1, 2, 3]
+        assert all(chat.current_timestamp == 100 for chat in chats)
+
+    def test_new_subscriber_gets_earliest_cursor(self):
+        old = engine.Tenant('student', 'token', 1, current_timestamp=50)
+        new = engine.Tenant('mentor', 'token', 2, current_timestamp=10)
+        fetch = FakeApi([HOMEWORK])
+        poller = make_engine([old, new], fetch, FakeSender())
+
+        asyncio.run(poller.poll_once(old))
+
+        assert fetch.calls[0][0] == 10, (
+            'Запрос должен выполняться с самым ранним курсором подписчиков'
+        )
+
+    def test_failed_subscriber_is_retried(self):
+        chats = [
+            engine.Tenant('student', 'token', 1, current_timestamp=1),
+            engine.Tenant('mentor', 'token', 2, current_timestamp=1),
+        ]
+
+        def send(bot, chat_id, message):
+            return chat_id == 1
+
+        poller = make_engine(chats, FakeApi([HOMEWORK]), send)
+
+        poll(poller, chats[0])
+
+        assert [chat.current_timestamp for chat in chats] == [100, 100]
+        assert [
+            event.tenant for event in poller.outbox.events.values()
+        ] == ['mentor'], (
+            'В outbox должно остаться только неотправленное подписчику '
+            'уведомление'
+        )
+
+    def test_invalid_homework_does_not_block_others(self):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+        works = [{'homework_name': 'hw0', 'status': 'unknown'}, HOMEWORK]
+        send = FakeSender()
+        poller = make_engine([tenant], FakeApi(works), send)
+
+        poll(poller, tenant)
+        poll(poller, tenant)
+
+        texts = [message for _, message in send.messages]
+        assert len(texts) == 2
+        assert any('hw123' in text for text in texts), (
+            'Корректные работы должны отправляться несмотря на ошибки в других'
+        )
+        assert any('unknown' in text for text in texts)
+        assert tenant.current_timestamp == 1, (
+            'Курсор не должен сдвигаться, пока в ответе есть ошибки'
+        )
+
+    def test_error_report_is_not_repeated(self, tmp_path):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+        send = FakeSender()
+
+        def fetch(current_timestamp, headers):
+            raise ConnectionError('API недоступен')
+
+        store = storage.StateStore(str(tmp_path / 'state.sqlite3'))
+        poller = engine.Engine(
+            [tenant], bot=None, fetch=fetch, send=send, store=store
+        )
+        poll(poller, tenant)
+        poll(poller, tenant)
+        assert len(send.messages) == 1, (
+            'Одинаковый отчёт об ошибке не должен отправляться повторно'
+        )
+        assert tenant.last_report == engine.report_digest(
+            send.messages[0][1]
+        ), 'Вместо текста отчёта хранится его отпечаток'
+
+        poller.remember(tenant, ())
+        store.flush()
+        restored = engine.Tenant('student', 'token', 42)
+        engine.Engine([restored], bot=None, store=store).restore()
+        assert restored.last_report == tenant.last_report
+
+    def test_error_report_hides_token(self, monkeypatch, caplog):
+        class FailingTransport(transport.Transport):
+
+            def get(self, url, **kwargs):
+                raise OSError('connection reset')
+
+        previous = transport.set_default_transport(FailingTransport())
+        try:
+            owner = engine.Tenant('student', 'SECRET-TOKEN', 1, 1)
+            mentor = engine.Tenant('mentor', 'SECRET-TOKEN', -100, 1)
+            send = FakeSender()
+            poller = engine.Engine([owner, mentor], bot=None, send=send)
+            poll(poller, owner)
+        finally:
+            transport.set_default_transport(previous)
+        assert sorted(chat for chat, _ in send.messages) == [-100, 1]
+        for _, message in send.messages:
+            assert 'SECRET-TOKEN' not in message, (
+                'Токен не должен попадать в сообщения подписчиков'
+            )
+        assert 'SECRET-TOKEN' not in caplog.text, (
+            'Токен не должен попадать в общий лог'
+        )
+        assert 'SECRET' not in engine.sanitize(
+            "headers={'Authorization': 'OAuth SECRET'}"
+        )
+
+    def test_tenants_are_isolated(self):
+        first = engine.Tenant('first', 'one', 1, current_timestamp=1)
+        second = engine.Tenant('second', 'two', 2, current_timestamp=1)
+        send = FakeSender()
+        poller = engine.Engine(
+            [first, second], bot=None, fetch=FakeApi([HOMEWORK]), send=send,
+            retry_time=60,
+        )
+
+        async def run_once():
+            task = asyncio.ensure_future(poller.run())
+            await asyncio.sleep(0.2)
+            poller.stop()
+            await task
+
+        asyncio.run(run_once())
+
+        assert sorted(chat for chat, _ in send.messages) == [1, 2]
+        assert first.polls == second.polls == 1
+
+    def test_refresh_wakes_tenant_early(self):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+        poller = engine.Engine(
+            [tenant], bot=None, fetch=FakeApi([]), send=FakeSender(),
+            retry_time=60,
+        )
+
+        async def run_refreshed():
+            task = asyncio.ensure_future(poller.run())
+            await asyncio.sleep(0.2)
+            poller.refresh(tenant)
+            await asyncio.sleep(0.1)
+            poller.stop()
+            await task
+
+        asyncio.run(run_refreshed())
+
+        assert tenant.polls == 2, (
+            'Внеочередной опрос должен выполняться без ожидания интервала'
+        )
+
+    def test_tenants_are_added_and_removed_at_runtime(self):
+        clock = simulation.VirtualClock()
+        polls = []
+
+        def fetch(current_timestamp, headers):
+            polls.append((headers['Authorization'], clock()))
+            return {'homeworks': [], 'current_date': 100}
+
+        first = engine.Tenant('first', 'shared', 1, current_timestamp=1)
+        second = engine.Tenant('second', 'shared', 2, current_timestamp=1)
+        poller = engine.Engine(
+            [first, second], bot=None, fetch=fetch, send=FakeSender(),
+            retry_time=600, clock=clock,
+            executor=simulation.InlineExecutor(),
+        )
+        added = engine.Tenant('added', 'new', 3, current_timestamp=1)
+
+        async def scenario():
+            task = asyncio.ensure_future(poller.run())
+            await asyncio.sleep(100)
+            await poller.add_tenant(added)
+            await asyncio.sleep(1)
+            assert ('OAuth new', 100) in polls, (
+                'Новый токен должен опрашиваться сразу после добавления'
+            )
+            assert poller.remove_tenant(first)
+            assert poller.remove_tenant(added)
+            removed_at = len(polls)
+            await asyncio.sleep(3600)
+            poller.stop()
+            await task
+            return polls[removed_at:]
+
+        later = simulation.run_virtual(scenario(), clock)
+        assert later and all(token == 'OAuth shared' for token, _ in later), (
+            'Опрос удалённого токена должен прекратиться, а общий токен '
+            'должен опрашиваться оставшимся подписчиком'
+        )
+        assert second.polls == len(later)
+        assert poller.tenants_by_chat(1) == []
+
+    def test_removed_tenant_stops_exporting_metrics(self):
+        tenant = engine.Tenant('removed', 'token', 1, current_timestamp=1)
+        poller = make_engine([tenant], FakeApi([]), FakeSender())
+        poll(poller, tenant)
+        assert 'removed' in metrics.LAST_SUCCESS.values
+        assert poller.remove_tenant(tenant)
+        assert 'removed' not in metrics.LAST_SUCCESS.values, (
+            'Удалённый пользователь не должен оставаться в метриках'
+        )
+
+    def test_removed_tenant_keeps_shared_chat(self):
+        first = engine.Tenant('first', 'a', 1, current_timestamp=1)
+        second = engine.Tenant('second', 'b', 1, current_timestamp=1)
+        poller = engine.Engine([first], bot=None, fetch=FakeApi([]))
+        asyncio.run(poller.add_tenant(second))
+        assert poller.tenants_by_chat(1) == [first, second]
+        assert poller.remove_tenant(first)
+        assert poller.tenants_by_chat(1) == [second], (
+            'Чат должен остаться за другим пользователем'
+        )
+
+    def test_added_subscriber_gets_current_statuses(self):
+        body = json.dumps({
+            'homeworks': [HOMEWORK], 'current_date': 100,
+        }).encode()
+
+        class SameBody(transport.Transport):
+
+            def get(self, url, **kwargs):
+                return transport.StoredResponse(url, 200, {}, body)
+
+        owner = engine.Tenant('student', 'token', 1, current_timestamp=50)
+        poller = engine.Engine([owner], bot=None, send=FakeSender())
+        previous = transport.set_default_transport(SameBody())
+        try:
+            poll(poller, owner)
+            mentor = engine.Tenant('mentor', 'token', 2, current_timestamp=1)
+            asyncio.run(poller.add_tenant(mentor))
+            poll(poller, owner)
+        finally:
+            transport.set_default_transport(previous)
+        assert len(mentor.index) == 1, (
+            'Новый подписчик токена должен получить статусы работ, хотя '
+            'ответ API не изменился'
+        )
+
+    def test_new_tenant_is_synced_from_history(self):
+        since = 1672531200  # 2023-01-01T00:00:00Z
+        old = {'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+               'date_updated': '2022-06-01T00:00:00Z'}
+        new = {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing',
+               'date_updated': '2023-02-01T00:00:00Z'}
+        requests = []
+
+        class History(transport.Transport):
+
+            def get(self, url, params, **kwargs):
+                requests.append((params['from_date'], kwargs.get('stream')))
+                homeworks = [old, new] if not params['from_date'] else [new]
+                return transport.StoredResponse(url, 200, {}, json.dumps({
+                    'homeworks': homeworks, 'current_date': since + 100,
+                }).encode())
+
+        tenant = engine.Tenant('student', 'token', 1, since)
+        send = FakeSender()
+        poller = engine.Engine([tenant], bot=None, send=send)
+        previous = transport.set_default_transport(History())
+        try:
+            poll(poller, tenant)
+            poll(poller, tenant)
+        finally:
+            transport.set_default_transport(previous)
+        assert requests == [(0, True), (since, None), (since + 100, None)], (
+            'История без сохранённого состояния читается потоком один раз'
+        )
+        assert sorted(tenant.index.entries) == ['1', '2']
+        assert [message for _, message in send.messages] == [
+            validation.render(validation.HomeworkRecord(
+                '2', 'hw2', 'reviewing', new['date_updated']
+            ))
+        ], 'Уведомляются только работы, обновлённые после курсора'
+
+    def test_polls_are_bounded_by_workers(self):
+        tenants = [
+            engine.Tenant(f'user{number}', f'token{number}', number, 1)
+            for number in range(6)
+        ]
+        lock = threading.Lock()
+        concurrent = []
+
+        def fetch(current_timestamp, headers):
+            with lock:
+                concurrent.append(len(poller.busy))
+            time.sleep(0.05)
+            return {'homeworks': [], 'current_date': 100}
+
+        poller = engine.Engine(
+            tenants, bot=None, fetch=fetch, send=FakeSender(),
+            retry_time=600, max_workers=2,
+        )
+
+        async def run_once():
+            task = asyncio.ensure_future(poller.run())
+            await asyncio.sleep(0.5)
+            poller.stop()
+            await task
+
+        asyncio.run(run_once())
+        assert len(concurrent) == 6, 'Каждый токен должен быть опрошен'
+        assert max(concurrent) <= 2, (
+            'Одновременных опросов не больше числа обработчиков'
+        )
+
+    def test_tenants_file_is_reloaded(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+
+        def write(records):
+            path.write_text(json.dumps(records), encoding='utf-8')
+
+        write([
+            {'name': 'student', 'practicum_token': 'a', 'chat_id': 1},
+            {'name': 'mentor', 'practicum_token': 'b', 'chat_id': 2},
+        ])
+        default = engine.Tenant('default', 'token', 0)
+        poller = engine.Engine(
+            [default], bot=None, fetch=FakeApi([]), send=FakeSender(),
+            tenants_file=str(path),
+        )
+        assert set(poller.named) == {'default', 'student', 'mentor'}
+        student = poller.named['student']
+        write([
+            {'name': 'student', 'practicum_token': 'a', 'chat_id': 1},
+            {'name': 'mentor', 'practicum_token': 'c', 'chat_id': 2},
+            {'name': 'group', 'practicum_token': 'a', 'chat_id': 3},
+        ])
+        asyncio.run(poller.reload_tenants())
+        assert set(poller.named) == {'default', 'student', 'mentor', 'group'}
+        assert poller.named['student'] is student, (
+            'Неизменившийся пользователь не должен пересоздаваться'
+        )
+        assert poller.named['mentor'].practicum_token == 'c'
+        assert [t.name for t in poller.subscribers['a']] == [
+            'student', 'group'
+        ]
+        assert 'b' not in poller.subscribers
+        write([])
+        asyncio.run(poller.reload_tenants())
+        assert set(poller.named) == {'default'}, (
+            'Пользователи не из файла не должны удаляться'
+        )
+
+    def test_load_tenants(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+        path.write_text(
+            '[{"name": "a", "practicum_token": "t", "chat_id": 7}]',
+            encoding='utf-8',
+        )
+        tenants = engine.load_tenants(str(path))
+        assert [tenant.chat_id for tenant in tenants] == [7]
+        assert engine.load_tenants(str(tmp_path / 'missing.json')) == []
+
+    def test_duplicate_names_are_rejected(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'practicum_token': 'a', 'chat_id': -100},
+            {'practicum_token': 'b', 'chat_id': -100},
+        ]), encoding='utf-8')
+        with pytest.raises(ValueError, match='-100'):
+            engine.load_tenants(str(path))
+
+        path.write_text(json.dumps([
+            {'name': 'default', 'practicum_token': 'a', 'chat_id': 1},
+        ]), encoding='utf-8')
+        default = engine.Tenant('default', 'token', 0)
+        with pytest.raises(ValueError, match='default'):
+            engine.Engine([default], bot=None, tenants_file=str(path))
+
+        poller = engine.Engine(
+            [default], bot=None, tenants_file=str(tmp_path / 'missing.json')
+        )
+        poller.tenants_file = str(path)
+        asyncio.run(poller.reload_tenants())
+        assert poller.named == {'default': default}, (
+            'Файл с занятым именем не должен заменять пользователя'
+        )
@@ -0,0 +1,130 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+import breaker
+import exceptions
+import homework
+import homework_stream
+from tests import utils
+
+HISTORY = {
+    'current_date': 1581604970,
+    'homeworks': [
+        {
+            'id': number,
+            'status': 'approved',
+            'homework_name': f'работа_{number}.zip',
+            'reviewer_comment': 'Всё нравится — "отлично"',
+        }
+        for number in range(50)
+    ],
+}
+
+
+def chunked(body, size):
+    data = body.encode()
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def read(body, size=7):
+    stream = homework_stream.HomeworkStream(chunked(body, size))
+    return list(stream), stream
+
+
+class TestHomeworkStream:
+
+    @pytest.mark.parametrize('size', [1, 3, 64, 1 << 20])
+    def test_matches_json_loads(self, size):
+        items, stream = read(json.dumps(HISTORY, indent=1), size)
+        assert items == HISTORY['homeworks'], (
+            'Работы должны совпадать с разбором json.loads при любом '
+            'разбиении тела на фрагменты'
+        )
+        assert stream.get('current_date') == HISTORY['current_date']
+        assert stream.count == len(HISTORY['homeworks'])
+
+    def test_fields_after_homeworks(self):
+        items, stream = read(
+            '{"homeworks": [{"status": "reviewing"}], "current_date": 12345}',
+            size=2,
+        )
+        assert items == [{'status': 'reviewing'}]
+        assert stream.get('current_date') == 12345
+
+    def test_items_are_yielded_before_body_is_read(self):
+        chunks = iter([b'{"homeworks": [{"id": 1}, ', b'{"id": 2}]}'])
+        stream = iter(homework_stream.HomeworkStream(chunks))
+        assert next(stream) == {'id': 1}
+        assert next(chunks) == b'{"id": 2}]}', (
+            'Первая работа должна отдаваться до чтения остатка ответа'
+        )
+
+    def test_empty_history(self):
+        items, stream = read('{"homeworks": [], "current_date": 1}')
+        assert items == []
+        assert stream.get('current_date') == 1
+
+    @pytest.mark.parametrize('body, error', [
+        ('[]', TypeError),
+        ('{"current_date": 1}', exceptions.EmptyValuesFromAPI),
+        ('{"homeworks": {"id": 1}}', TypeError),
+        ('{"homeworks": [{"id": 1}', ValueError),
+        ('{"homeworks": [] "current_date": 1}', ValueError),
+    ])
+    def test_invalid_body(self, body, error):
+        with pytest.raises(error):
+            read(body)
+
+    def test_stream_api(self, monkeypatch):
+        body = json.dumps(HISTORY).encode()
+        calls = []
+
+        class MockResponse:
+            status_code = HTTPStatus.OK
+            headers = {}
+            closed = False
+
+            def iter_content(self, chunk_size):
+                return iter(chunked(body.decode(), 100))
+
+            def close(self):
+                self.closed = True
+
+        response = MockResponse()
+
+        def mock_get(url, **kwargs):
+            calls.append(kwargs)
+            return response
+
+        utils.patch_requests_get(monkeypatch, mock_get)
+        stream = homework.stream_api(0, homework.build_headers('token'))
+        messages = [homework.parse_status(item) for item in stream]
+
+        assert calls[0]['stream'] is True
+        assert calls[0]['params'] == {'from_date': 0}
+        assert len(messages) == len(HISTORY['homeworks'])
+        assert response.closed, 'Ответ должен закрываться после чтения'
+
+    def test_body_read_error_is_network_error(self, monkeypatch):
+        class BrokenResponse:
+            status_code = HTTPStatus.OK
+            headers = {}
+
+            def iter_content(self, chunk_size):
+                yield b'{"homeworks": ['
+                raise OSError('connection reset')
+
+            def close(self):
+                pass
+
+        utils.patch_requests_get(
+            monkeypatch, lambda url, **kwargs: BrokenResponse()
+        )
+        stream = homework.stream_api(0, homework.build_headers('token'))
+        with pytest.raises(ConnectionError, match='connection reset'):
+            list(stream)
+        assert breaker.PRACTICUM.failures == 1, (
+            'Сбой чтения тела должен учитываться выключателем'
+        )
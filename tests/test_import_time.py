@@ -0,0 +1,44 @@
+import subprocess
+import sys
+from os.path import abspath, dirname
+
+root_dir = dirname(dirname(abspath(__file__)))
+
+# Бюджет холодного импорта homework в микросекундах, с запасом
+# для медленных машин CI: без ленивых импортов выходило около 260 мс.
+IMPORT_BUDGET_US = 150_000
+HEAVY_MODULES = ('asyncio', 'telegram', 'requests', 'dotenv', 'http.server')
+
+
+def run_python(code, *options):
+    return subprocess.run(
+        [sys.executable, *options, '-c', code],
+        cwd=root_dir, capture_output=True, text=True, check=True,
+    )
+
+
+class TestImportTime:
+
+    def test_import_fits_budget(self):
+        result = run_python('import homework', '-X', 'importtime')
+        cumulative = None
+        for line in result.stderr.splitlines():
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() == 'homework':
+                cumulative = int(parts[1])
+        assert cumulative is not None, result.stderr
+        assert cumulative < IMPORT_BUDGET_US, (
+            f'Импорт homework занял {cumulative} мкс, '
+            f'бюджет {IMPORT_BUDGET_US} мкс'
+        )
+
+    def test_heavy_modules_are_lazy(self):
+        result = run_python(
+            'import sys, homework; '
+            f'print(" ".join(m for m in {HEAVY_MODULES!r} '
+            'if m in sys.modules))'
+        )
+        assert result.stdout.split() == [], (
+            'Тяжёлые зависимости должны импортироваться при первом '
+            f'использовании: {result.stdout.strip()}'
+        )
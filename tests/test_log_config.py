@@ -0,0 +1,88 @@
+import atexit
+import logging
+import queue
+import time
+
+import log_config
+
+
+def record(message, level=logging.INFO, args=()):
+    return logging.LogRecord(
+        'root', level, __file__, 1, message, args, None
+    )
+
+
+class TestRateLimitFilter:
+
+    def test_repeated_lines_are_limited(self):
+        now = [0.0]
+        rate_limit = log_config.RateLimitFilter(
+            limit=2, interval=60, clock=lambda: now[0]
+        )
+        passed = [
+            rate_limit.filter(record('Изменений нет')) for _ in range(5)
+        ]
+        assert passed == [True, True, False, False, False], (
+            'Повторяющиеся записи должны ограничиваться по частоте'
+        )
+        assert rate_limit.filter(record('Другая запись'))
+
+        now[0] = 61
+        resumed = record('Изменений нет')
+        assert rate_limit.filter(resumed)
+        assert 'пропущено похожих записей: 3' in resumed.getMessage()
+
+    def test_errors_are_never_limited(self):
+        rate_limit = log_config.RateLimitFilter(limit=0)
+        assert rate_limit.filter(record('Сбой', logging.ERROR))
+
+    def test_template_is_the_key(self):
+        rate_limit = log_config.RateLimitFilter(limit=1)
+        assert rate_limit.filter(record('Запрос %s', args=(1,)))
+        assert not rate_limit.filter(record('Запрос %s', args=(2,)))
+
+
+class TestLazyQueueHandler:
+
+    def test_record_is_not_formatted_on_enqueue(self):
+        records = queue.Queue()
+        handler = log_config.LazyQueueHandler(records)
+        original = record('Запрос %s', args=(1,))
+        handler.emit(original)
+        queued = records.get_nowait()
+        assert queued is original
+        assert queued.msg == 'Запрос %s' and queued.args == (1,)
+
+    def test_full_queue_drops_records(self):
+        records = queue.Queue(maxsize=1)
+        handler = log_config.LazyQueueHandler(records)
+        failures = []
+        handler.handleError = failures.append
+        handler.emit(record('первая'))
+        started = time.monotonic()
+        handler.emit(record('вторая'))
+        assert time.monotonic() - started < 1, (
+            'Запись в переполненную очередь не должна блокироваться'
+        )
+        assert failures == [], 'Переполнение очереди не является ошибкой'
+        assert records.get_nowait().msg == 'первая'
+        assert records.empty(), 'Лишняя запись должна отбрасываться'
+
+
+def test_setup_logging_rotates_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_config, 'LOG_MAX_BYTES', 200)
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    path = tmp_path / 'outlook.log'
+    try:
+        listener = log_config.setup_logging(str(path))
+        for number in range(20):
+            logging.warning('строка номер %d для проверки ротации', number)
+        listener.stop()
+        atexit.unregister(listener.stop)
+    finally:
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+    assert (tmp_path / 'outlook.log.1').exists(), (
+        'Файл лога должен ротироваться по размеру'
+    )
@@ -0,0 +1,57 @@
+import urllib.request
+
+import exceptions
+import metrics
+
+
+class TestMetrics:
+
+    def test_histogram_render(self):
+        histogram = metrics.Histogram(
+            'test_seconds', 'Тест.', (0.1, 1.0), label='stage'
+        )
+        histogram.observe(0.05, 'fetch')
+        histogram.observe(0.5, 'fetch')
+        lines = histogram.samples()
+        assert 'test_seconds_bucket{stage="fetch",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{stage="fetch",le="1.0"} 2' in lines
+        assert 'test_seconds_bucket{stage="fetch",le="+Inf"} 2' in lines
+        assert 'test_seconds_count{stage="fetch"} 2' in lines
+
+    def test_wrapped_errors_are_counted_by_origin(self):
+        counter = metrics.ERRORS
+        before = counter.values.get('NoCorrectCodeRequest', 0)
+        try:
+            try:
+                raise exceptions.NoCorrectCodeRequest('Ошибка: 500')
+            except Exception as error:
+                raise ConnectionError(f'Произошёл сбой сети: {error}')
+        except ConnectionError as error:
+            metrics.count_error(error)
+        assert counter.values['NoCorrectCodeRequest'] == before + 1, (
+            'Исключение должно учитываться по классу исходной ошибки'
+        )
+
+    def test_age_gauge(self):
+        now = [100.0]
+        gauge = metrics.AgeGauge('age', 'Тест.', 'tenant', lambda: now[0])
+        gauge.touch('student')
+        now[0] = 130.0
+        assert gauge.samples() == ['age{tenant="student"} 30.000']
+
+    def test_parse_status_is_timed(self):
+        import homework
+
+        homework.parse_status({'homework_name': 'hw', 'status': 'approved'})
+        assert 'parse_status' in metrics.PARSE_DURATION.series
+
+    def test_server(self):
+        server = metrics.start_server(0, host='127.0.0.1')
+        try:
+            url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+            with urllib.request.urlopen(url) as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert '# TYPE practicum_request_seconds histogram' in body
@@ -0,0 +1,190 @@
+import asyncio
+
+import engine
+import outbox
+import storage
+import validation
+
+RECORD = validation.HomeworkRecord('hw1', 'hw1', 'approved', '2022-01-01')
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeEngine:
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.messages = []
+
+    def may_deliver(self, event):
+        return True
+
+    async def notify(self, chat_id, message):
+        self.messages.append((chat_id, message))
+        return self.results.pop(0)
+
+
+class TestOutbox:
+
+    def test_event_is_written_once(self):
+        box = outbox.Outbox()
+        tenant = engine.Tenant('student', 'token', 1)
+        assert box.put(tenant, RECORD)
+        assert not box.put(tenant, RECORD), (
+            'Ключ идемпотентности не должен пропускать повторную запись'
+        )
+        assert len(box) == 1
+
+    def test_failed_send_is_retried_with_backoff(self):
+        clock = Clock()
+        box = outbox.Outbox(base_delay=5, max_delay=60, clock=clock)
+        sender = FakeEngine([False, False, True])
+        box.put(engine.Tenant('student', 'token', 1), RECORD)
+
+        assert asyncio.run(box.deliver_due(sender)) == 0
+        [event] = box.events.values()
+        assert event.next_attempt_at == 1005
+        assert asyncio.run(box.deliver_due(sender)) == 0, (
+            'Уведомление не должно повторяться до истечения паузы'
+        )
+        clock.now = 1005
+        asyncio.run(box.deliver_due(sender))
+        [event] = box.events.values()
+        assert event.next_attempt_at == 1015, (
+            'Пауза между повторами должна расти экспоненциально'
+        )
+        clock.now = 1015
+        assert asyncio.run(box.deliver_due(sender)) == 1
+        assert len(box) == 0
+        assert [chat for chat, _ in sender.messages] == [1, 1, 1]
+        assert 'hw1' in sender.messages[0][1]
+
+    def test_due_events_come_from_heap(self):
+        clock = Clock()
+        box = outbox.Outbox(clock=clock)
+        for number in range(3):
+            clock.now = 1000.0 + number
+            box.put(engine.Tenant('student', 'token', 1), RECORD._replace(
+                key=f'hw{number}', name=f'hw{number}'
+            ))
+        assert box.next_attempt() == 1000
+        assert [event.name for event in box.due(1001)] == ['hw0', 'hw1']
+        assert box.due(1001) == [], (
+            'Забранные уведомления не должны отдаваться повторно'
+        )
+        assert box.next_attempt() == 1002
+
+    def test_foreign_events_wait_for_resume(self):
+        clock = Clock()
+        box = outbox.Outbox(clock=clock)
+        box.put(engine.Tenant('student', 'token', 1), RECORD)
+        assert box.due(1000, allowed=lambda event: False) == []
+        assert box.next_attempt() == 1000 + outbox.PARKED_RECHECK, (
+            'Чужое уведомление должно проверяться редко, а не при каждом '
+            'пробуждении'
+        )
+        box.resume(['student'])
+        assert [event.key for event in box.due(1000)] == [
+            outbox.event_key('student', RECORD)
+        ]
+
+    def test_event_is_dropped_after_max_attempts(self):
+        box = outbox.Outbox(base_delay=0, max_attempts=2)
+        box.put(engine.Tenant('student', 'token', 1), RECORD)
+        sender = FakeEngine([False, False])
+
+        asyncio.run(box.deliver_due(sender))
+        asyncio.run(box.deliver_due(sender))
+
+        assert len(box) == 0
+        assert box.stats.snapshot()['dropped'] == 1
+
+    def test_stored_retry_time_uses_wall_clock(self, tmp_path):
+        store = storage.StateStore(str(tmp_path / 'state.sqlite3'))
+        clock, wall_clock = Clock(), Clock()
+        wall_clock.now = 50000.0
+        box = outbox.Outbox(
+            store, base_delay=5, clock=clock, wall_clock=wall_clock
+        )
+        box.put(engine.Tenant('student', 'token', 1), RECORD)
+        asyncio.run(box.deliver_due(FakeEngine([False])))
+        store.flush()
+        [row] = store.load_events()
+        assert row[-1] == 50005, (
+            'В хранилище время повтора записывается по настенным часам'
+        )
+
+        restarted = outbox.Outbox(clock=Clock(), wall_clock=wall_clock)
+        restarted.clock.now = 7.0
+        restarted.load(store.load_events())
+        [event] = restarted.events.values()
+        assert event.next_attempt_at == 12, (
+            'Загруженное время повтора переводится на часы движка'
+        )
+
+    def test_pending_events_survive_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = storage.StateStore(path)
+        tenant = engine.Tenant('student', 'token', 1, current_timestamp=1)
+
+        def fetch(current_timestamp, headers):
+            return {
+                'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+                'current_date': 100,
+            }
+
+        poller = engine.Engine([tenant], bot=None, fetch=fetch, store=store)
+        asyncio.run(poller.poll_once(tenant))
+        store.close()
+
+        restarted = engine.Tenant('student', 'token', 1, current_timestamp=1)
+        poller = engine.Engine(
+            [restarted], bot=None, store=storage.StateStore(path)
+        )
+        poller.restore()
+
+        assert restarted.current_timestamp == 100
+        assert [event.name for event in poller.outbox.events.values()] == [
+            'hw1'
+        ], 'Неотправленное уведомление должно сохраняться вместе с курсором'
+
+    def test_polling_continues_while_telegram_is_down(self):
+        tenant = engine.Tenant('student', 'token', 1, current_timestamp=1)
+        calls = []
+
+        def fetch(current_timestamp, headers):
+            calls.append(current_timestamp)
+            return {
+                'homeworks': [
+                    {'homework_name': f'hw{len(calls)}', 'status': 'approved'}
+                ],
+                'current_date': 100 + len(calls),
+            }
+
+        def send(bot, chat_id, message):
+            return False
+
+        poller = engine.Engine(
+            [tenant], bot=None, fetch=fetch, send=send, retry_time=0.02,
+        )
+
+        async def scenario():
+            task = asyncio.ensure_future(poller.run())
+            await asyncio.sleep(0.3)
+            poller.stop()
+            await task
+
+        asyncio.run(scenario())
+
+        assert len(calls) > 5, (
+            'Недоступность Telegram не должна замедлять опрос'
+        )
+        assert tenant.current_timestamp == 100 + len(calls)
+        assert len(poller.outbox) == len(calls)
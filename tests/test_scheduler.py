@@ -0,0 +1,114 @@
+import scheduler
+
+
+def make_schedule(base=600):
+    return scheduler.PollSchedule(base, jitter=0, rand=lambda: 0.5)
+
+
+class TestPollSchedule:
+
+    def test_cadence_does_not_drift(self):
+        schedule = make_schedule()
+        schedule.start(0)
+        assert schedule.next_deadline(now=7) == 600, (
+            'Следующий опрос отсчитывается от запланированного момента, '
+            'а не от окончания предыдущего'
+        )
+        assert schedule.next_deadline(now=612) == 1200
+
+    def test_missed_ticks_are_skipped(self):
+        schedule = make_schedule()
+        schedule.start(0)
+        assert schedule.next_deadline(now=1900) == 2400
+
+    def test_interval_depends_on_status(self):
+        schedule = make_schedule()
+        schedule.record_success(['reviewing'])
+        assert schedule.interval() == 120
+        schedule.record_success(['approved'])
+        assert schedule.interval() == 1200
+        schedule.record_success([])
+        assert schedule.interval() == 1200, (
+            'Пустой список работ не должен сбрасывать известный статус'
+        )
+
+    def test_errors_back_off(self):
+        schedule = make_schedule()
+        schedule.record_error()
+        schedule.record_error()
+        assert schedule.interval() == 2400
+        for _ in range(10):
+            schedule.record_error()
+        assert schedule.interval() == 600 * 2 ** scheduler.MAX_BACKOFF_EXPONENT
+        schedule.record_success()
+        assert schedule.interval() == 600
+
+    def test_jitter_is_bounded(self):
+        schedule = scheduler.PollSchedule(600, jitter=0.1, rand=lambda: 1.0)
+        schedule.start(0)
+        assert schedule.next_deadline(now=0) == 660
+
+    def test_postpone_delays_next_poll_once(self):
+        schedule = make_schedule()
+        schedule.start(0)
+        schedule.postpone(until=5000, spread=100)
+        assert schedule.next_deadline(now=0) == 5050
+        assert schedule.next_deadline(now=5050) == 5400
+
+    def test_idle_deadlines_match_next_deadline(self):
+        stepped, batched = make_schedule(), make_schedule()
+        stepped.start(0)
+        batched.start(0)
+        expected = [stepped.next_deadline(now=0)]
+        while expected[-1] < 3000:
+            expected.append(stepped.next_deadline(expected[-1]))
+
+        assert batched.idle_deadlines(0, 3000) == expected, (
+            'Пачка моментов должна совпадать с пошаговым расписанием'
+        )
+        assert batched.next_deadline(expected[-1]) == (
+            stepped.next_deadline(expected[-1])
+        )
+
+
+class TestTimerHeap:
+
+    def test_due_keys_are_popped_in_order(self):
+        timers = scheduler.TimerHeap()
+        timers.push('b', 20)
+        timers.push('a', 10)
+        timers.push('c', 30)
+        assert timers.earliest() == 10
+        assert timers.pop_due(25) == ['a', 'b']
+        assert len(timers) == 1 and 'c' in timers
+        assert timers.pop_due(25) == []
+
+    def test_push_moves_deadline(self):
+        timers = scheduler.TimerHeap()
+        timers.push('a', 10)
+        timers.push('b', 20)
+        timers.push('a', 30)
+        assert timers.deadline('a') == 30
+        assert timers.pop_due(25) == ['b'], (
+            'Перенесённый момент не должен срабатывать в прежнее время'
+        )
+        assert timers.pop_due(30) == ['a']
+
+    def test_removed_key_is_not_due(self):
+        timers = scheduler.TimerHeap()
+        timers.push('a', 10)
+        timers.push('b', 20)
+        assert timers.remove('a')
+        assert not timers.remove('a')
+        assert timers.earliest() == 20
+        assert timers.pop_due(100) == ['b']
+        assert timers.earliest() is None
+
+    def test_stale_entries_are_compacted(self):
+        timers = scheduler.TimerHeap()
+        for step in range(1000):
+            timers.push('a', step)
+        assert len(timers.heap) < 100, (
+            'Перенесённые записи не должны накапливаться в куче'
+        )
+        assert timers.pop_due(1000) == ['a']
@@ -0,0 +1,222 @@
+import asyncio
+
+import engine
+import sharding
+import validation
+
+KEYS = [sharding.shard_key(f'token{number}') for number in range(200)]
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def lease_table(path, worker, clock):
+    return sharding.LeaseTable(str(path), worker=worker, ttl=15, clock=clock)
+
+
+class TestHashRing:
+
+    def test_keys_are_spread(self):
+        ring = sharding.HashRing(['a', 'b', 'c'])
+        owners = [ring.owner(key) for key in KEYS]
+        assert all(owners.count(worker) > 30 for worker in 'abc')
+
+    def test_only_new_members_share_moves(self):
+        before = sharding.HashRing(['a', 'b', 'c'])
+        after = sharding.HashRing(['a', 'b', 'c', 'd'])
+        moved = [
+            key for key in KEYS if before.owner(key) != after.owner(key)
+        ]
+        assert all(after.owner(key) == 'd' for key in moved), (
+            'При добавлении обработчика ключи должны переходить только к нему'
+        )
+        assert len(moved) < len(KEYS) / 2
+
+
+class TestLeaseTable:
+
+    def test_workers_split_keys(self, tmp_path):
+        clock = Clock()
+        first = lease_table(tmp_path / 'shard.db', 'first', clock)
+        second = lease_table(tmp_path / 'shard.db', 'second', clock)
+
+        first.heartbeat(KEYS)
+        second.heartbeat(KEYS)
+        owned_first, draining = first.heartbeat(KEYS)
+        assert draining, 'Доля нового обработчика должна освобождаться'
+        first.heartbeat(KEYS, release=draining)
+        owned_second, _ = second.heartbeat(KEYS)
+
+        assert not owned_first & owned_second, (
+            'Токен не должен опрашиваться двумя обработчиками'
+        )
+        assert owned_first | owned_second == set(KEYS)
+
+    def test_dead_worker_keys_move(self, tmp_path):
+        clock = Clock()
+        first = lease_table(tmp_path / 'shard.db', 'first', clock)
+        second = lease_table(tmp_path / 'shard.db', 'second', clock)
+        first.heartbeat(KEYS)
+        second.heartbeat(KEYS)
+        _, draining = first.heartbeat(KEYS)
+        first.heartbeat(KEYS, release=draining)
+        second.heartbeat(KEYS)
+
+        clock.now += 20
+        owned, _ = second.heartbeat(KEYS)
+
+        assert owned == set(KEYS), (
+            'Токены остановившегося обработчика должны перейти к живым'
+        )
+
+    def test_release_frees_keys(self, tmp_path):
+        clock = Clock()
+        first = lease_table(tmp_path / 'shard.db', 'first', clock)
+        second = lease_table(tmp_path / 'shard.db', 'second', clock)
+        first.heartbeat(KEYS)
+        first.release()
+
+        owned, _ = second.heartbeat(KEYS)
+
+        assert owned == set(KEYS)
+
+
+class TestShardedEngine:
+
+    def test_foreign_tenants_are_not_polled(self, tmp_path):
+        polled = []
+        mine = engine.Tenant('mine', 'token-a', 1, current_timestamp=1)
+        foreign = engine.Tenant('foreign', 'token-b', 2, current_timestamp=1)
+
+        def fetch(current_timestamp, headers):
+            polled.append(headers['Authorization'])
+            return {'homeworks': [], 'current_date': 1}
+
+        class FakeShard:
+            interval = 1
+
+            def owns_tenant(self, tenant):
+                return tenant is mine
+
+            async def run(self, engine):
+                await asyncio.sleep(0.2)
+                engine.stop()
+
+        poller = engine.Engine(
+            [mine, foreign], bot=None, fetch=fetch, send=lambda *args: True,
+            retry_time=0.05, shard=FakeShard(),
+        )
+        asyncio.run(poller.run())
+
+        assert polled, 'Свой токен должен опрашиваться'
+        assert set(polled) == {'OAuth token-a'}, (
+            'Токен другого обработчика не должен опрашиваться'
+        )
+
+    def test_single_worker_takes_all_and_releases(self, tmp_path):
+        polled = []
+        tenant = engine.Tenant('student', 'token', 1, current_timestamp=1)
+
+        def fetch(current_timestamp, headers):
+            polled.append(current_timestamp)
+            return {'homeworks': [], 'current_date': 1}
+
+        leases = sharding.LeaseTable(str(tmp_path / 'shard.db'), 'only')
+        shard = sharding.Shard(leases, interval=0.05)
+        poller = engine.Engine(
+            [tenant], bot=None, fetch=fetch, send=lambda *args: True,
+            retry_time=60, shard=shard,
+        )
+
+        async def scenario():
+            task = asyncio.ensure_future(poller.run())
+            await asyncio.sleep(0.3)
+            poller.stop()
+            await task
+
+        asyncio.run(scenario())
+
+        assert polled, (
+            'Полученный токен должен опрашиваться сразу, не дожидаясь '
+            'расписания'
+        )
+        assert leases.connection.execute(
+            'SELECT COUNT(*) FROM shard_leases'
+        ).fetchone()[0] == 0, 'Аренды должны освобождаться при остановке'
+
+    def test_nothing_runs_while_handover_reloads(self, tmp_path):
+        tenant = engine.Tenant('student', 'token', 1, current_timestamp=1)
+        polled, sent, during_reload = [], [], []
+
+        def fetch(current_timestamp, headers):
+            polled.append(current_timestamp)
+            return {'homeworks': [], 'current_date': 1}
+
+        def send(bot, chat_id, message):
+            sent.append(message)
+            return True
+
+        leases = sharding.LeaseTable(str(tmp_path / 'shard.db'), 'only')
+        shard = sharding.Shard(leases, interval=0.05)
+        poller = engine.Engine(
+            [tenant], bot=None, fetch=fetch, send=send, retry_time=0.02,
+            shard=shard,
+        )
+        poller.outbox.put(tenant, validation.HomeworkRecord(
+            'hw1', 'hw1', 'approved', None
+        ))
+
+        async def reload(tenants):
+            await asyncio.sleep(0.2)
+            during_reload.append((len(polled), len(sent)))
+
+        poller.reload = reload
+
+        async def scenario():
+            task = asyncio.ensure_future(poller.run())
+            await asyncio.sleep(0.4)
+            poller.stop()
+            await task
+
+        asyncio.run(scenario())
+        leases.close()
+        assert during_reload[0] == (0, 0), (
+            'Пока состояние не перечитано, токен не опрашивается, а его '
+            'уведомления не отправляются'
+        )
+        assert polled and sent
+
+    def test_failed_handover_is_retried(self, tmp_path):
+        tenant = engine.Tenant('student', 'token', 1, current_timestamp=1)
+        leases = sharding.LeaseTable(str(tmp_path / 'shard.db'), 'only')
+        shard = sharding.Shard(leases, interval=0.05)
+        poller = engine.Engine(
+            [tenant], bot=None, fetch=lambda *args: {}, send=None,
+        )
+        failures = []
+
+        async def acquire(leaders):
+            if not failures:
+                failures.append(leaders)
+                raise RuntimeError('database is locked')
+
+        poller.acquire = acquire
+
+        async def scenario():
+            poller.stopping = asyncio.Event()
+            await shard.sync(poller)
+            assert not shard.owns_tenant(tenant), (
+                'Токен без перечитанного состояния нельзя опрашивать'
+            )
+            await shard.sync(poller)
+
+        asyncio.run(scenario())
+        assert failures, 'Ошибка передачи не должна останавливать обработчик'
+        assert shard.owns_tenant(tenant)
+        leases.close()
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import engine
+import simulation
+
+
+class TestVirtualTime:
+
+    def test_engine_runs_in_virtual_time(self):
+        clock = simulation.VirtualClock()
+        tenant = engine.Tenant('student', 'token', 1, current_timestamp=1)
+        polled, sent = [], []
+
+        def fetch(current_timestamp, headers):
+            polled.append(clock())
+            return {
+                'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+                'current_date': 100,
+            }
+
+        def send(bot, chat_id, message):
+            sent.append(clock())
+            return True
+
+        poller = engine.Engine(
+            [tenant], bot=None, fetch=fetch, send=send, retry_time=600,
+            clock=clock, executor=simulation.InlineExecutor(),
+        )
+
+        async def scenario():
+            task = asyncio.ensure_future(poller.run())
+            await asyncio.sleep(6 * 3600)
+            poller.stop()
+            await task
+
+        started = time.perf_counter()
+        simulation.run_virtual(scenario(), clock)
+
+        assert time.perf_counter() - started < 5, (
+            'Часы опроса должны моделироваться без реального ожидания'
+        )
+        assert clock() >= 6 * 3600
+        intervals = [
+            later - earlier for earlier, later in zip(polled, polled[1:])
+        ]
+        assert intervals and all(
+            1200 * 0.8 <= interval <= 1200 * 1.2 for interval in intervals
+        ), 'Принятую работу нужно опрашивать с удвоенным интервалом'
+        assert len(sent) == 1
+
+
+class TestSimulate:
+
+    def test_report_is_reproducible(self):
+        first = simulation.simulate(300, 2, seed=1)
+        second = simulation.simulate(300, 2, seed=1)
+        assert first._replace(wall_seconds=0) == second._replace(
+            wall_seconds=0
+        ), 'Модель с одним зерном должна давать одинаковый отчёт'
+        assert first.changes > 0
+        assert 300 * 2 * 72 <= first.polls <= 300 * 2 * 720
+        assert first.delay_max <= 1200 * 1.2, (
+            'Смену статуса должен увидеть ближайший плановый опрос'
+        )
+
+    def test_homework_changes_follow_review_model(self):
+        import random
+
+        changes = simulation.homework_changes(
+            random.Random(3), 30 * simulation.DAY
+        )
+        assert changes == sorted(changes)
+        first = {}
+        for moment, number, status in changes:
+            first.setdefault(number, status)
+        assert set(first.values()) == {'reviewing'}, (
+            'Работа сначала попадает на ревью'
+        )
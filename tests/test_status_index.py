@@ -0,0 +1,73 @@
+import homework
+import status_index
+import validation
+
+
+def work(name, status, date_updated='2022-01-01', id=None):
+    item = {'homework_name': name, 'status': status,
+            'date_updated': date_updated}
+    if id is not None:
+        item['id'] = id
+    return item
+
+
+def records(*items):
+    records, errors = validation.VALIDATOR.batch(list(items))
+    assert errors == []
+    return records
+
+
+class TestHomeworkIndex:
+
+    def test_every_homework_is_processed(self):
+        index = status_index.HomeworkIndex()
+        [events] = status_index.diff_all([index], records(
+            work('hw1', 'approved'), work('hw2', 'reviewing')
+        ))
+        assert [record.key for record in events] == ['hw1', 'hw2'], (
+            'Должны обрабатываться все работы из ответа API'
+        )
+
+    def test_only_transitions_produce_events(self):
+        index = status_index.HomeworkIndex()
+        index.commit('hw1', 'reviewing', '2022-01-01')
+        assert status_index.diff_all(
+            [index], records(work('hw1', 'reviewing'))
+        ) == [[]]
+        [events] = status_index.diff_all(
+            [index], records(work('hw1', 'approved', '2022-01-02'))
+        )
+        assert [record.status for record in events] == ['approved']
+
+    def test_each_index_gets_its_changes(self):
+        known = status_index.HomeworkIndex()
+        known.commit('7', 'approved', '2022-01-01', 'hw1')
+        fresh = status_index.HomeworkIndex()
+        changes = status_index.diff_all(
+            [known, fresh], records(work('hw1', 'approved', id=7))
+        )
+        assert [len(events) for events in changes] == [0, 1]
+        assert changes[1][0].key == '7', 'Ключом работы должен быть id'
+
+    def test_active_statuses_follow_commits(self):
+        index = status_index.HomeworkIndex({'hw1': ('reviewing', None, 'hw1')})
+        assert index.active_statuses() == ['reviewing']
+        index.commit('hw1', 'approved')
+        assert index.active_statuses() == ['approved']
+        assert index.status('hw1') == 'approved'
+        assert len(index) == 1
+
+    def test_restored_statuses_are_members(self):
+        index = status_index.HomeworkIndex(
+            {'7': (''.join(['review', 'ing']), None, 'hw1')}
+        )
+        assert index.entries['7'].status is homework.Status.REVIEWING, (
+            'Статус из хранилища должен заменяться членом homework.Status'
+        )
+        assert list(index.items()) == [('hw1', 'reviewing', None)]
+
+    def test_committed_name_is_kept(self):
+        index = status_index.HomeworkIndex()
+        index.commit('7', 'reviewing', '2022-01-01', 'hw1')
+        index.commit('7', 'approved', '2022-01-02')
+        assert list(index.items()) == [('hw1', 'approved', '2022-01-02')]
@@ -0,0 +1,67 @@
+import asyncio
+
+import engine
+import storage
+
+
+class TestStateStore:
+
+    def test_state_survives_reopen(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = storage.StateStore(path)
+        store.save_cursor('student', 100, 'Нет новых статусов')
+        store.save_status('student', 'hw1', 'reviewing', '2022-01-01')
+        store.save_status('student', 'hw1', 'approved', '2022-01-02')
+        assert store.flush() == 2, (
+            'Повторные изменения одной записи должны объединяться'
+        )
+        store.close()
+
+        saved = storage.StateStore(path).load()
+        assert saved == {
+            'student': (
+                100, 'Нет новых статусов',
+                {'hw1': ('approved', '2022-01-02', None)},
+            )
+        }
+
+    def test_load_is_filtered_by_tenant(self, tmp_path):
+        store = storage.StateStore(str(tmp_path / 'state.sqlite3'))
+        for number in range(storage.MAX_PARAMETERS + 10):
+            store.save_cursor(f'user{number}', number, None)
+            store.save_status(f'user{number}', 'hw1', 'approved')
+        store.flush()
+        names = ['user3', f'user{storage.MAX_PARAMETERS + 5}', 'missing']
+        saved = store.load(names)
+        assert set(saved) == set(names[:2]), (
+            'Должны читаться только указанные пользователи'
+        )
+        assert saved['user3'] == (3, None, {'hw1': ('approved', None, None)})
+        assert len(store.load()) == storage.MAX_PARAMETERS + 10
+
+    def test_changes_are_written_on_flush(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = storage.StateStore(path)
+        store.save_cursor('student', 100, None)
+        assert storage.StateStore(path).load() == {}, (
+            'Изменения должны записываться пакетом при flush()'
+        )
+        store.flush()
+        assert 'student' in storage.StateStore(path).load()
+
+    def test_engine_restores_cursor(self, tmp_path):
+        store = storage.StateStore(str(tmp_path / 'state.sqlite3'))
+        store.save_cursor('student', 100, 'Нет новых статусов')
+        store.flush()
+        tenant = engine.Tenant('student', 'token', 1, current_timestamp=5)
+        poller = engine.Engine([tenant], bot=None, store=store)
+
+        async def restore():
+            poller.stopping = asyncio.Event()
+            poller.restore()
+
+        asyncio.run(restore())
+        assert tenant.current_timestamp == 100
+        assert tenant.last_report == engine.report_digest(
+            'Нет новых статусов'
+        ), 'Текст отчёта из прежних версий заменяется отпечатком'
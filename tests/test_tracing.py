@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import engine
+import tracing
+
+
+class TestTrace:
+
+    def test_spans_are_recorded_in_cycle(self):
+        with tracing.cycle('poll', 'student') as trace:
+            with tracing.span('fetch'):
+                pass
+            with tracing.span('fetch'):
+                pass
+            tracing.annotate('response', 0.25)
+
+        assert set(trace.spans) == {'fetch', 'response'}
+        assert trace.spans['response'] == 0.25
+        assert trace.duration is not None
+        assert tracing.RECENT[-1] is trace
+
+    def test_span_without_cycle_is_ignored(self):
+        with tracing.span('fetch'):
+            pass
+        assert tracing.CURRENT.get() is None
+
+    def test_engine_poll_records_stages(self):
+        tenant = engine.Tenant('student', 'token', 42, current_timestamp=1)
+
+        def fetch(current_timestamp, headers):
+            with tracing.span('decode'):
+                pass
+            return {
+                'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+                'current_date': 100,
+            }
+
+        poller = engine.Engine(
+            [tenant], bot=None, fetch=fetch, send=lambda *args: True
+        )
+
+        async def scenario():
+            await poller.poll_once(tenant)
+            await poller.outbox.deliver_due(poller)
+
+        asyncio.run(scenario())
+
+        poll, deliver = list(tracing.RECENT)[-2:]
+        assert list(poll.spans) == [
+            'decode', 'fetch', 'validate', 'diff', 'enqueue'
+        ], 'Этапы в пуле потоков должны попадать в запись цикла опроса'
+        assert (deliver.kind, deliver.name) == ('deliver', 'student')
+        assert list(deliver.spans) == ['render', 'send']
+
+
+class TestProfiler:
+
+    def test_sampler_collects_all_threads(self, tmp_path):
+        def busy_worker():
+            deadline = time.monotonic() + 0.2
+            while time.monotonic() < deadline:
+                pass
+
+        sampler = tracing.StackSampler(interval=0.005)
+        sampler.start()
+        busy_worker()
+        sampler.stop()
+        path = sampler.dump(str(tmp_path / 'profile.folded'))
+
+        text = open(path, encoding='utf-8').read()
+        assert sampler.samples > 0
+        assert 'busy_worker (test_tracing.py' in text, (
+            'Профиль должен содержать стеки работающих функций'
+        )
+        assert text.startswith('MainThread;')
+
+    def test_profiler_writes_file(self, tmp_path):
+        profiler = tracing.Profiler(str(tmp_path), seconds=0.05)
+        path = profiler.capture()
+        assert path.endswith('.folded')
+        assert (tmp_path / path.split('/')[-1]).exists()
+        assert not profiler.running
@@ -0,0 +1,159 @@
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import homework
+import transport
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"homeworks": [], "current_date": 1}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}/'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestPooledTransport:
+
+    def test_connection_is_reused(self, server):
+        client = transport.PooledTransport(pool_size=2, retries=0)
+        for _ in range(3):
+            response = client.get(server, params={'from_date': 0})
+            assert response.json()['current_date'] == 1
+        client.close()
+
+        stats = client.stats.snapshot()
+        assert stats['requests'] == 3
+        assert stats['connections'] == 1, (
+            'Повторные запросы должны использовать открытое соединение'
+        )
+        assert stats['reused'] == 2
+
+    def test_default_timeout(self):
+        client = transport.PooledTransport(connect_timeout=1, read_timeout=2)
+        assert client.timeout == (1, 2)
+
+    def test_default_transport_is_shared(self):
+        assert transport.default_transport() is transport.default_transport()
+
+    def test_transport_without_get_cannot_be_created(self):
+        class Incomplete(transport.Transport):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+class FakeTransport(transport.Transport):
+
+    def __init__(self, bodies):
+        self.bodies = list(bodies)
+        self.stats = transport.TransportStats()
+
+    def get(self, url, **kwargs):
+        return transport.StoredResponse(
+            url, 200, {'ETag': '"v1"', 'Set-Cookie': 'secret'},
+            self.bodies.pop(0), 0.05,
+        )
+
+
+@pytest.fixture
+def restore_default_transport():
+    previous = transport.default_transport()
+    yield
+    transport.set_default_transport(previous)
+
+
+class TestCassetteTransport:
+
+    def test_record_then_replay(self, tmp_path):
+        path = str(tmp_path / 'api.cassette.gz')
+        headers = {'Authorization': 'OAuth secret-token'}
+        recorder = transport.CassetteTransport(
+            path, 'record', FakeTransport([b'{"a": 1}', b'{"a": 2}'])
+        )
+        recorder.get('http://api/', params={'from_date': 0}, headers=headers)
+        recorder.get('http://api/', params={'from_date': 5}, headers=headers)
+        recorder.close()
+
+        player = transport.CassetteTransport(path)
+        first = player.get(
+            'http://api/', params={'from_date': 0}, headers=headers
+        )
+        second = player.get(
+            'http://api/', params={'from_date': 5}, headers=headers
+        )
+        assert (first.json(), second.json()) == ({'a': 1}, {'a': 2})
+        assert first.headers['etag'] == '"v1"'
+        assert 'Set-Cookie' not in first.headers
+        assert player.get(
+            'http://api/', params={'from_date': 9}, headers=headers
+        ).json() == {'a': 2}, (
+            'Незаписанный запрос должен получать последний ответ токена'
+        )
+
+        raw = gzip.open(path, 'rb').read()
+        assert b'secret-token' not in raw, 'Токен не должен попадать в кассету'
+
+    def test_unknown_token_is_not_replayed(self, tmp_path):
+        path = str(tmp_path / 'api.cassette.gz')
+        recorder = transport.CassetteTransport(
+            path, 'record', FakeTransport([b'{}'])
+        )
+        recorder.get('http://api/', headers={'Authorization': 'OAuth a'})
+        recorder.close()
+
+        with pytest.raises(LookupError):
+            transport.CassetteTransport(path).get(
+                'http://api/', headers={'Authorization': 'OAuth b'}
+            )
+
+    def test_get_api_answer_uses_default_transport(
+            self, tmp_path, restore_default_transport):
+        path = str(tmp_path / 'api.cassette.gz')
+        body = b'{"homeworks": [], "current_date": 123}'
+        recorder = transport.CassetteTransport(
+            path, 'record', FakeTransport([body])
+        )
+        recorder.get(
+            homework.ENDPOINT, params={'from_date': 0},
+            headers=homework.HEADERS,
+        )
+        recorder.close()
+
+        transport.set_default_transport(transport.CassetteTransport(path))
+        assert homework.get_api_answer(0)['current_date'] == 123
+
+
+class TestAsyncTransport:
+
+    def test_get(self, server):
+        pytest.importorskip('aiohttp')
+        client = transport.AsyncTransport()
+        try:
+            response = client.get(server, params={'from_date': 0})
+        finally:
+            client.close()
+        assert response.status_code == 200
+        assert response.json()['current_date'] == 1
+        assert client.stats.snapshot()['connections'] == 1
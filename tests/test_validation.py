@@ -0,0 +1,78 @@
+import pytest
+
+import exceptions
+import homework
+import validation
+
+
+class TestValidator:
+
+    def test_records_are_typed(self):
+        records, errors = validation.VALIDATOR.batch([
+            {'id': 7, 'homework_name': 'hw1', 'status': 'approved',
+             'date_updated': '2022-01-01T00:00:00Z'},
+            {'homework_name': 'hw2', 'status': 'reviewing'},
+        ])
+        assert errors == []
+        assert records == [
+            ('7', 'hw1', 'approved', '2022-01-01T00:00:00Z'),
+            ('hw2', 'hw2', 'reviewing', None),
+        ]
+        assert records[0].status == 'approved'
+
+    def test_wrong_types_are_item_errors(self):
+        records, errors = validation.VALIDATOR.batch([
+            {'homework_name': 'hw1', 'status': ['approved']},
+            {'homework_name': ['hw2'], 'status': 'approved'},
+            {'id': {'x': 1}, 'homework_name': 'hw3', 'status': 'approved'},
+            {'homework_name': 'hw4', 'status': 'approved',
+             'date_updated': 5},
+            {'id': 5, 'homework_name': 'hw5', 'status': 'approved'},
+        ])
+        assert [error.position for error in errors] == [0, 1, 2, 3], (
+            'Работа с полями неверного типа должна записываться в ошибки, '
+            'не прерывая проверку остальных'
+        )
+        assert [record.key for record in records] == ['5']
+
+    def test_statuses_are_shared_members(self):
+        records, _ = validation.VALIDATOR.batch([
+            {'homework_name': 'hw1', 'status': ''.join(['appr', 'oved'])},
+            {'homework_name': 'hw2', 'status': ''.join(['appro', 'ved'])},
+        ])
+        assert records[0].status is homework.Status.APPROVED, (
+            'Статус записи должен быть членом homework.Status'
+        )
+        assert records[1].status is records[0].status
+        assert f'{records[0].status}' == 'approved'
+
+    def test_errors_are_collected_per_item(self):
+        records, errors = validation.VALIDATOR.batch([
+            {'status': 'approved'},
+            {'homework_name': 'hw1', 'status': 'approved'},
+            {'homework_name': 'hw2'},
+            {'homework_name': 'hw3', 'status': 'unknown'},
+            'hw4',
+        ])
+        assert [record.name for record in records] == ['hw1'], (
+            'Некорректная работа не должна прерывать проверку остальных'
+        )
+        assert [error.position for error in errors] == [0, 2, 3, 4]
+        assert 'homework_name' in errors[0].message
+        assert 'unknown' in errors[2].message
+
+    @pytest.mark.parametrize('response, error', [
+        ([], TypeError),
+        ({}, exceptions.EmptyValuesFromAPI),
+        ({'homeworks': {}}, TypeError),
+    ])
+    def test_response_errors_match_check_response(self, response, error):
+        with pytest.raises(error):
+            validation.VALIDATOR.response(response)
+        with pytest.raises(error):
+            homework.check_response(response)
+
+    def test_render_matches_parse_status(self):
+        item = {'homework_name': 'hw1', 'status': 'rejected'}
+        [record], _ = validation.VALIDATOR.batch([item])
+        assert validation.render(record) == homework.parse_status(item)
@@ -0,0 +1,228 @@
+"""Трассировка этапов цикла опроса и профиль работающего процесса.
+
+Цикл опроса записывается в Trace: время каждого этапа (запрос,
+декодирование, проверка, сравнение, отправка) складывается в запись
+цикла. Текущая запись хранится в contextvars, поэтому этапы внутри
+пула потоков движка попадают в запись вызвавшей их корутины. Без
+активной записи span() ничего не делает.
+"""
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import metrics
+import settings
+
+CURRENT = contextvars.ContextVar('trace', default=None)
+# Циклы дольше стольких секунд записываются в лог с разбивкой по этапам.
+SLOW_CYCLE = float(settings.env('TRACE_SLOW_CYCLE', 5))
+RECENT_LIMIT = 100
+PROFILE_DIR = settings.env('PROFILE_DIR', settings.BASE_DIR)
+PROFILE_SECONDS = float(settings.env('PROFILE_SECONDS', 30))
+PROFILE_INTERVAL = float(settings.env('PROFILE_INTERVAL', 0.005))
+# Снять профиль сразу после запуска, не дожидаясь сигнала.
+PROFILE_ON_START = settings.env('PROFILE_ON_START', '') not in ('', '0')
+
+STAGE_DURATION = metrics.REGISTRY.register(metrics.Histogram(
+    'poll_stage_seconds',
+    'Время этапов цикла опроса и отправки.',
+    metrics.LATENCY_BUCKETS, label='stage',
+))
+
+
+class Trace:
+    """Запись одного цикла: время этапов в секундах."""
+
+    __slots__ = ('kind', 'name', 'started', 'duration', 'spans')
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.started = time.time()
+        self.duration = None
+        self.spans = {}
+
+    def add(self, stage, seconds):
+        """Добавляет время этапа; повторный этап суммируется."""
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+        STAGE_DURATION.observe(seconds, stage)
+
+    def format(self):
+        """Этапы в виде 'fetch=0.120 validate=0.002'."""
+        return ' '.join(
+            f'{stage}={seconds:.3f}' for stage, seconds in self.spans.items()
+        )
+
+    def __repr__(self):
+        return f'Trace({self.kind!r}, {self.name!r}, {self.format()!r})'
+
+
+RECENT = deque(maxlen=RECENT_LIMIT)
+
+
+@contextmanager
+def cycle(kind, name):
+    """Открывает запись цикла kind для пользователя name."""
+    trace = Trace(kind, name)
+    token = CURRENT.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        CURRENT.reset(token)
+        trace.duration = time.perf_counter() - started
+        RECENT.append(trace)
+        if trace.duration >= SLOW_CYCLE:
+            logging.warning(
+                'Медленный цикл %s пользователя %s: %.3f с (%s)',
+                kind, name, trace.duration, trace.format(),
+            )
+
+
+@contextmanager
+def span(stage):
+    """Замеряет этап stage текущего цикла."""
+    trace = CURRENT.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, time.perf_counter() - started)
+
+
+def annotate(stage, seconds):
+    """Добавляет к текущему циклу этап, замеренный в другом месте."""
+    trace = CURRENT.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+def frame_name(frame):
+    """Имя кадра стека: функция (файл:строка начала)."""
+    code = frame.f_code
+    return (
+        f'{code.co_name} '
+        f'({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+    )
+
+
+def collapse(frame):
+    """Стек кадра от корня в формате flamegraph: 'a;b;c'."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик всех потоков процесса.
+
+    Каждые interval секунд запоминает стеки всех потоков, включая пул
+    потоков движка, которые не видит cProfile, и записывает их в
+    формате collapsed stacks для flamegraph.pl и speedscope.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Запускает сбор стеков в фоновом потоке."""
+        self.thread = threading.Thread(
+            target=self.run, name='profiler', daemon=True
+        )
+        self.thread.start()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stopping.wait(self.interval):
+            names = {
+                thread.ident: thread.name for thread in threading.enumerate()
+            }
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                thread = names.get(ident, str(ident))
+                self.stacks[f'{thread};{collapse(frame)}'] += 1
+            self.samples += 1
+
+    def stop(self):
+        """Останавливает сбор стеков."""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def dump(self, path):
+        """Записывает стеки в файл, самые частые первыми."""
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+        return path
+
+
+class Profiler:
+    """Снимает профиль процесса по сигналу или настройке.
+
+    trigger() запускает StackSampler на seconds секунд и записывает
+    результат в directory; повторный вызов во время съёмки
+    игнорируется.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, seconds=PROFILE_SECONDS,
+                 interval=PROFILE_INTERVAL):
+        self.directory = directory
+        self.seconds = seconds
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.running = False
+
+    def trigger(self):
+        """Начинает съёмку профиля в фоновом потоке."""
+        with self.lock:
+            if self.running:
+                logging.info('Профиль уже снимается')
+                return False
+            self.running = True
+        threading.Thread(
+            target=self.capture, name='profile-dump', daemon=True
+        ).start()
+        return True
+
+    def capture(self):
+        """Снимает профиль и возвращает путь к файлу."""
+        sampler = StackSampler(self.interval)
+        path = os.path.join(
+            self.directory,
+            f'profile-{os.getpid()}-{time.strftime("%Y%m%d-%H%M%S")}.folded',
+        )
+        logging.info('Снимаем профиль на %s с', self.seconds)
+        try:
+            sampler.start()
+            time.sleep(self.seconds)
+            sampler.stop()
+            sampler.dump(path)
+            logging.info(
+                'Профиль из %d снимков записан в %s', sampler.samples, path
+            )
+            return path
+        except Exception as error:
+            logging.error('Не удалось снять профиль: %s', error)
+        finally:
+            sampler.stop()
+            with self.lock:
+                self.running = False
+
+
+PROFILER = Profiler()
@@ -0,0 +1,446 @@
+"""Транспорты запросов к API Практикума.
+
+Запрос выполняет transport.default_transport().get(); какой транспорт
+используется, задаёт переменная PRACTICUM_TRANSPORT:
+
+- pooled — сессия requests с пулом соединений (по умолчанию);
+- async — клиент aiohttp в отдельном цикле asyncio;
+- record — pooled, ответы которого записываются в кассету;
+- replay — ответы из кассеты PRACTICUM_CASSETTE без обращения к сети.
+"""
+import abc
+import atexit
+import datetime as dt
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from http import HTTPStatus
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import settings
+
+POOL_SIZE = int(settings.env('HTTP_POOL_SIZE', 64))
+CONNECT_TIMEOUT = float(settings.env('HTTP_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(settings.env('HTTP_READ_TIMEOUT', 10))
+RETRIES = int(settings.env('HTTP_RETRIES', 2))
+BACKOFF_FACTOR = float(settings.env('HTTP_BACKOFF_FACTOR', 0.5))
+# 429 и 503 с Retry-After обрабатывает выключатель breaker.PRACTICUM,
+# чтобы потоки пула не спали внутри urllib3.
+RETRY_STATUSES = (502, 504)
+TRANSPORT = settings.env('PRACTICUM_TRANSPORT', 'pooled')
+CASSETTE = settings.env(
+    'PRACTICUM_CASSETTE',
+    os.path.join(settings.BASE_DIR, 'practicum.cassette.gz'),
+)
+# Заголовки ответа, которые нужны боту и сохраняются в кассете.
+CASSETTE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+
+
+class TransportStats:
+    """Счётчики переиспользования соединений и времени запросов."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.connect_time = 0.0
+        self.total_time = 0.0
+        self.local = threading.local()
+
+    def record_connect(self, seconds):
+        """Учитывает установку нового соединения (DNS, TCP, TLS)."""
+        with self.lock:
+            self.connections += 1
+            self.connect_time += seconds
+        self.local.connect_time = (
+            getattr(self.local, 'connect_time', 0.0) + seconds
+        )
+
+    def start_request(self):
+        """Начинает замер запроса в текущем потоке."""
+        self.local.connect_time = 0.0
+
+    def finish_request(self, seconds):
+        """Завершает замер: возвращает время соединения и чтения."""
+        connect = getattr(self.local, 'connect_time', 0.0)
+        with self.lock:
+            self.requests += 1
+            self.total_time += seconds
+        return connect, seconds - connect
+
+    def snapshot(self):
+        """Возвращает копию счётчиков в виде словаря."""
+        with self.lock:
+            requests_count = self.requests
+            return {
+                'requests': requests_count,
+                'connections': self.connections,
+                'reused': max(requests_count - self.connections, 0),
+                'connect_time': self.connect_time,
+                'read_time': self.total_time - self.connect_time,
+            }
+
+
+def instrument_pool(pool_cls, stats):
+    """Создаёт класс пула, соединения которого замеряют connect()."""
+    class InstrumentedConnection(pool_cls.ConnectionCls):
+
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                stats.record_connect(time.perf_counter() - started)
+
+    return type(
+        f'Instrumented{pool_cls.__name__}',
+        (pool_cls,),
+        {'ConnectionCls': InstrumentedConnection},
+    )
+
+
+class Transport(abc.ABC):
+    """Интерфейс транспорта.
+
+    get(url, **kwargs) принимает аргументы requests.get и возвращает
+    ответ с атрибутами status_code, reason, headers, content, text,
+    elapsed и методами json(), iter_content() и close(). stats —
+    TransportStats для метрик. Транспорт без get() нельзя создать.
+    """
+
+    stats = None
+
+    @abc.abstractmethod
+    def get(self, url, **kwargs):
+        """Выполняет GET запрос."""
+
+    def close(self):
+        """Освобождает соединения и файлы транспорта."""
+
+
+class StoredResponse:
+    """Ответ, полностью прочитанный в память: часть requests.Response."""
+
+    __slots__ = ('url', 'status_code', 'headers', 'content', 'elapsed')
+
+    def __init__(self, url, status_code, headers, content, elapsed=0.0):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.elapsed = dt.timedelta(seconds=elapsed)
+
+    @property
+    def reason(self):
+        try:
+            return HTTPStatus(self.status_code).phrase
+        except ValueError:
+            return ''
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        """Декодирует тело ответа из JSON."""
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        """Отдаёт тело частями по chunk_size байт."""
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        """Тело уже прочитано, закрывать нечего."""
+
+
+class PooledTransport(Transport):
+    """Общая сессия requests с keep-alive, таймаутами и повторами."""
+
+    def __init__(self, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, retries=RETRIES,
+                 backoff_factor=BACKOFF_FACTOR):
+        self.timeout = (connect_timeout, read_timeout)
+        self.stats = TransportStats()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=True,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=RETRY_STATUSES,
+                raise_on_status=False,
+                respect_retry_after_header=False,
+            ),
+        )
+        adapter.poolmanager.pool_classes_by_scheme = {
+            'http': instrument_pool(HTTPConnectionPool, self.stats),
+            'https': instrument_pool(HTTPSConnectionPool, self.stats),
+        }
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, **kwargs):
+        """Выполняет GET запрос через пул соединений."""
+        kwargs.setdefault('timeout', self.timeout)
+        self.stats.start_request()
+        started = time.perf_counter()
+        try:
+            return self.session.get(url, **kwargs)
+        finally:
+            connect, read = self.stats.finish_request(
+                time.perf_counter() - started
+            )
+            logging.debug(
+                'Запрос к %s: соединение %.3f с, ответ %.3f с',
+                url, connect, read,
+            )
+
+    def close(self):
+        """Закрывает все соединения пула."""
+        self.session.close()
+
+
+class AsyncTransport(Transport):
+    """Клиент aiohttp в цикле asyncio фонового потока.
+
+    Запросы всех потоков пула движка выполняются одним циклом и делят
+    его соединения. fetch() — корутина для вызова из этого цикла,
+    get() — синхронная обёртка для homework.request_api. aiohttp
+    не входит в зависимости бота и импортируется при создании.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT):
+        import asyncio
+
+        import aiohttp
+
+        self.stats = TransportStats()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name='async-transport', daemon=True
+        )
+        self.thread.start()
+
+        async def open_session():
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_start.append(self.connect_started)
+            trace.on_connection_create_end.append(self.connect_finished)
+            return aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=pool_size),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=connect_timeout, sock_read=read_timeout
+                ),
+                trace_configs=[trace],
+            )
+
+        self.session = self.submit(open_session())
+
+    async def connect_started(self, session, context, params):
+        context.started = time.perf_counter()
+
+    async def connect_finished(self, session, context, params):
+        self.stats.record_connect(time.perf_counter() - context.started)
+
+    def submit(self, coroutine):
+        """Выполняет корутину в цикле транспорта и ждёт результата."""
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def fetch(self, url, params=None, headers=None):
+        """Выполняет GET запрос и читает тело ответа."""
+        started = time.perf_counter()
+        async with self.session.get(
+            url, params=params, headers=headers
+        ) as response:
+            content = await response.read()
+            return StoredResponse(
+                str(response.url), response.status, dict(response.headers),
+                content, time.perf_counter() - started,
+            )
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        """Выполняет GET запрос из любого потока.
+
+        Тело читается целиком, поэтому stream=True не уменьшает память.
+        """
+        self.stats.start_request()
+        started = time.perf_counter()
+        try:
+            return self.submit(self.fetch(url, params, headers))
+        finally:
+            self.stats.finish_request(time.perf_counter() - started)
+
+    def close(self):
+        """Закрывает сессию и останавливает цикл транспорта."""
+        self.submit(self.session.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def request_key(url, params=None, headers=None):
+    """Ключ запроса в кассете: адрес, параметры и хэш токена.
+
+    Сам токен в кассету не пишется.
+    """
+    authorization = (headers or {}).get('Authorization', '')
+    token = hashlib.blake2b(authorization.encode(), digest_size=6).hexdigest()
+    query = urlencode(sorted((params or {}).items()))
+    return f'{url}?{query}#{token}'
+
+
+def fallback_key(key):
+    """Ключ без параметров: адрес и хэш токена."""
+    return key.split('?', 1)[0] + '#' + key.rsplit('#', 1)[1]
+
+
+def read_cassette(path):
+    """Записи кассеты по порядку: пары (ключ запроса, StoredResponse)."""
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            record = json.loads(line)
+            yield record['key'], StoredResponse(
+                record['url'], record['status'], record['headers'],
+                record['body'].encode(), record['elapsed'],
+            )
+
+
+class CassetteTransport(Transport):
+    """Записывает ответы API в кассету или воспроизводит их.
+
+    Кассета — сжатый JSON Lines: ключ запроса, код, нужные боту
+    заголовки и тело ответа. В режиме record запросы выполняет inner,
+    а ответы дописываются в кассету. В режиме replay ответы берутся из
+    кассеты без задержек: на каждый ключ — в порядке записи, последний
+    повторяется; незаписанный запрос получает последний ответ того же
+    токена на тот же адрес.
+    """
+
+    def __init__(self, path, mode='replay', inner=None):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f'Неизвестный режим кассеты: {mode}')
+        self.path = path
+        self.mode = mode
+        self.inner = inner
+        self.lock = threading.Lock()
+        self.file = None
+        self.responses = {}
+        self.latest = {}
+        if mode == 'record':
+            self.stats = inner.stats
+            self.file = gzip.open(path, 'at', encoding='utf-8')
+        else:
+            self.stats = TransportStats()
+            for key, response in read_cassette(path):
+                self.responses.setdefault(key, []).append(response)
+                self.latest[fallback_key(key)] = key
+            self.positions = dict.fromkeys(self.responses, 0)
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        """Выполняет запрос через inner или отдаёт записанный ответ."""
+        key = request_key(url, params, headers)
+        if self.mode == 'record':
+            return self.record(
+                key, self.inner.get(
+                    url, params=params, headers=headers, **kwargs
+                )
+            )
+        with self.lock:
+            if key not in self.responses:
+                key = self.latest.get(fallback_key(key))
+                if key is None:
+                    raise LookupError(
+                        f'Запрос к {url} не записан в кассете {self.path}'
+                    )
+            responses = self.responses[key]
+            position = self.positions[key]
+            self.positions[key] = min(position + 1, len(responses) - 1)
+        self.stats.start_request()
+        self.stats.finish_request(0.0)
+        return responses[position]
+
+    def record(self, key, response):
+        """Дописывает ответ в кассету и возвращает его прочитанным."""
+        content = response.content
+        headers = {
+            name: response.headers[name] for name in CASSETTE_HEADERS
+            if name in response.headers
+        }
+        line = json.dumps({
+            'key': key,
+            'url': response.url,
+            'status': response.status_code,
+            'headers': headers,
+            'body': content.decode('utf-8', 'replace'),
+            'elapsed': response.elapsed.total_seconds(),
+        }, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + '\n')
+        return StoredResponse(
+            response.url, response.status_code, headers, content,
+            response.elapsed.total_seconds(),
+        )
+
+    def close(self):
+        """Закрывает кассету и транспорт inner."""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        if self.inner is not None:
+            self.inner.close()
+
+
+def make_transport(name=TRANSPORT, cassette=CASSETTE):
+    """Создаёт транспорт по имени из PRACTICUM_TRANSPORT."""
+    if name == 'pooled':
+        return PooledTransport()
+    if name == 'async':
+        return AsyncTransport()
+    if name == 'record':
+        recorder = CassetteTransport(cassette, 'record', PooledTransport())
+        atexit.register(recorder.close)
+        return recorder
+    if name == 'replay':
+        return CassetteTransport(cassette, 'replay')
+    raise ValueError(f'Неизвестный транспорт: {name}')
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_transport():
+    """Возвращает общий для процесса транспорт.
+
+    Транспорт создаётся при первом вызове.
+    """
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = make_transport()
+    return _default
+
+
+def set_default_transport(transport):
+    """Заменяет общий транспорт процесса; возвращает прежний."""
+    global _default
+    with _default_lock:
+        previous, _default = _default, transport
+    return previous
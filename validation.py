@@ -0,0 +1,125 @@
+"""Пакетная проверка ответа API с записью ошибок по каждой работе."""
+import datetime as dt
+from collections import namedtuple
+
+import exceptions
+import homework
+import metrics
+
+
+class HomeworkRecord(namedtuple('HomeworkRecord', (
+    'key', 'name', 'status', 'date_updated',
+))):
+    """Проверенная работа: ключ индекса, название, статус и дата."""
+
+    __slots__ = ()
+
+
+ItemError = namedtuple('ItemError', ('position', 'message'))
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def updated_at(record):
+    """Метка времени date_updated записи или None."""
+    try:
+        moment = dt.datetime.strptime(record.date_updated, DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    return int(moment.replace(tzinfo=dt.timezone.utc).timestamp())
+
+
+def render(record):
+    """Текст уведомления об изменении статуса работы."""
+    return homework.STATUS_IS_CHANGED.format(
+        homework_name=record.name, verdict=homework.VERDICTS[record.status]
+    )
+
+
+class Validator:
+    """Проверка списка работ по схеме ответа API Практикума.
+
+    Схема (обязательные поля и допустимые статусы) разбирается один раз
+    при создании. Статус записи — член homework.Status, общий для всех
+    работ, а не строка из ответа. records() проверяет работы за один
+    проход: вместо исключения на первой некорректной работе её ошибка
+    записывается в errors, а проверка продолжается со следующей.
+    """
+
+    __slots__ = ('statuses',)
+
+    def __init__(self, statuses=homework.VERDICTS):
+        # Строка статуса из ответа -> статус из statuses.
+        self.statuses = {status: status for status in statuses}
+
+    def records(self, homeworks, errors):
+        """Отдаёт HomeworkRecord корректных работ, ошибки — в errors."""
+        canonical = self.statuses.get
+        record = HomeworkRecord
+        for position, item in enumerate(homeworks):
+            try:
+                name = item['homework_name']
+                status = item['status']
+            except KeyError as error:
+                errors.append(ItemError(
+                    position,
+                    f'Отсутствует ключ "{error.args[0]}" в ответе API',
+                ))
+                continue
+            except TypeError:
+                errors.append(ItemError(
+                    position, 'Домашняя работа не является словарём'
+                ))
+                continue
+            known = canonical(status) if isinstance(status, str) else None
+            if known is None:
+                errors.append(ItemError(
+                    position, f'Неожиданный статус работы: {status}'
+                ))
+                continue
+            if not isinstance(name, str):
+                errors.append(ItemError(
+                    position, f'Название работы не является строкой: {name!r}'
+                ))
+                continue
+            key = item.get('id')
+            if key is not None and (
+                isinstance(key, bool) or not isinstance(key, (int, str))
+            ):
+                errors.append(ItemError(
+                    position, f'Некорректный id работы: {key!r}'
+                ))
+                continue
+            date_updated = item.get('date_updated')
+            if date_updated is not None and not isinstance(date_updated, str):
+                errors.append(ItemError(
+                    position,
+                    f'Некорректная дата изменения работы: {date_updated!r}',
+                ))
+                continue
+            yield record(
+                name if key is None else str(key), name, known, date_updated,
+            )
+
+    def batch(self, homeworks):
+        """Пара (записи корректных работ, ошибки некорректных)."""
+        errors = []
+        return list(self.records(homeworks, errors)), errors
+
+    @metrics.PARSE_DURATION.time('validate')
+    def response(self, response):
+        """Проверяет весь ответ API: (записи, ошибки).
+
+        Ошибки формата самого ответа, как и в check_response, прерывают
+        проверку исключением.
+        """
+        if not isinstance(response, dict):
+            raise TypeError('Ответ API отличен от словаря')
+        if 'homeworks' not in response:
+            raise exceptions.EmptyValuesFromAPI('Пустой ответ от API')
+        homeworks = response['homeworks']
+        if not isinstance(homeworks, list):
+            raise TypeError('Список домашних работ не является списком')
+        return self.batch(homeworks)
+
+
+VALIDATOR = Validator()